@@ -484,7 +484,7 @@ class DashApp(ABC):
             If the currently selected scenario is valid, this will be maintained as the selected value.
             Main callback from scenario dropdown (?)
             """
-            options, initial_scenario_name = self.refresh_scenarios_dash_callback(current_scenario_name)
+            options, initial_scenario_name = self.refresh_scenarios_dash_callback(current_scenario_name, n_clicks)
             return [options, initial_scenario_name]
 
         @app.callback(
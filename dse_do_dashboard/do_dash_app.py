@@ -1,19 +1,26 @@
 # Copyright IBM All Rights Reserved.
 # SPDX-License-Identifier: Apache-2.0
+import hashlib
+import json
+import threading
 import time
-from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
 
 import pandas as pd
+import sqlalchemy
+from plotly.io.json import to_json_plotly
 
 from dse_do_dashboard.main_pages.home_page_edit import HomePageEdit
 from dse_do_dashboard.main_pages.prepare_data_page_edit import PrepareDataPageEdit
 from dse_do_dashboard.utils.domodelrunner import DoModelRunner, DoModelRunnerConfig
 from dse_do_utils import DataManager
 from dse_do_utils.datamanager import Inputs, Outputs
-from dse_do_utils.scenariodbmanager import ScenarioDbManager, DatabaseType
+from dse_do_utils.scenariodbmanager import ScenarioDbManager, DatabaseType, AutoScenarioDbTable
 
 from dse_do_dashboard.dash_app import DashApp, HostEnvironment
-from dash import dcc, html, Output, Input, State
+from dash import dcc, html, Output, Input, State, MATCH
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
 
 from dse_do_dashboard.main_pages.explore_solution_page import ExploreSolutionPage
@@ -23,9 +30,20 @@ from dse_do_dashboard.main_pages.not_found import NotFoundPage
 from dse_do_dashboard.main_pages.prepare_data_page import PrepareDataPage
 from dse_do_dashboard.main_pages.run_model_page import RunModelPage
 from dse_do_dashboard.main_pages.visualization_tabs_page import VisualizationTabsPage
-from dse_do_dashboard.utils.dash_common_utils import ScenarioTableSchema, PivotTableConfig
+from dse_do_dashboard.utils.dash_common_utils import ScenarioTableSchema, PivotTableConfig, ScenarioTableChangeToken, \
+    PlotlyManagerCacheKey, get_pivot_table_card_children
+from dse_do_dashboard.utils.lru_cache import SizedLRUCache, estimate_data_size
+from dse_do_dashboard.utils.request_coalescer import RequestCoalescer
+from dse_do_dashboard.utils.export_jobs import ExportJobManager, ExportFileCache, get_export_key
+from dse_do_dashboard.utils.job_scheduler import DoModelJobScheduler
+from dse_do_dashboard.utils.schema_snapshot import SchemaSnapshot, get_schema_snapshot_key, load_schema_snapshot, save_schema_snapshot, \
+    get_schema_snapshot_classes, get_class_path
+from dse_do_dashboard.utils.scenariodbmanager_update import read_scenario_tables_from_db_batched, update_cell_changes_in_db_bulk, \
+    DbCellUpdate
 from dse_do_utils.plotlymanager import PlotlyManager
 from dse_do_dashboard.visualization_pages.visualization_page import VisualizationPage
+from dse_do_dashboard.visualization_pages.visualization_page_registry import VisualizationPageRegistry, VisualizationPageEntry, \
+    import_from_dotted_path
 
 
 
@@ -55,7 +73,7 @@ class DoDashApp(DashApp):
                  logo_file_name: Optional[str] = 'IBM.png',
                  navbar_brand_name: Optional[str] = 'Dashboard',
                  cache_config: Optional[Dict] = {},
-                 visualization_pages: Optional[List[VisualizationPage]]= [],
+                 visualization_pages: Optional[List[VisualizationPageEntry]]= [],
                  database_manager_class=None,
                  data_manager_class=None,
                  plotly_manager_class=None,
@@ -68,6 +86,20 @@ class DoDashApp(DashApp):
                  db_type: DatabaseType = DatabaseType.DB2,
                  db_manager_kwargs: Dict = {},  # Do not set to None,
                  dash_kwargs: Dict = {},
+                 plotly_manager_cache_max_entries: int = 16,
+                 plotly_manager_cache_max_mb: Optional[int] = 1024,
+                 table_read_max_workers: int = 1,
+                 data_table_page_size: Optional[int] = None,
+                 pivot_table_aggregate: bool = False,
+                 pivot_table_max_rows: Optional[int] = None,
+                 upload_parse_max_workers: int = 1,
+                 export_cache_dir: Optional[str] = None,
+                 export_max_workers: int = 1,
+                 job_max_workers: int = 2,
+                 job_db_path: Optional[str] = None,
+                 schema_snapshot_path: Optional[str] = None,
+                 enable_figure_cache: bool = True,
+                 figure_cache_timeout: Optional[int] = None,
                  ):
         """Create a Dashboard app.
 
@@ -77,11 +109,13 @@ class DoDashApp(DashApp):
         Must be in `./assets` folder (where '.' is the directory of the `index.py` file that starts the app.
         :param cache_config: Flask cache configuration. By default will use in-memory caching for 1 hour.
         :param visualization_pages: List of classes that represent the visualization pages.
+        Either VisualizationPage instances or VisualizationPageSpecs. The module of a page declared with a VisualizationPageSpec
+        is only imported (and the page created) on the first navigation to the page. See `VisualizationPageRegistry`.
         :param database_manager_class: class of the ScenarioDbManager.
         Alternatively, override the method `create_database_manager_instance`.
-        :param data_manager_class: class of the DataManager.
+        :param data_manager_class: class of the DataManager, or its dotted path (imported on first use).
         Either specify the `data_manager_class` and the `plotly_manager_class` or override the method `get_plotly_manager`
-        :param plotly_manager_class: class of the PlotlyManager.
+        :param plotly_manager_class: class of the PlotlyManager, or its dotted path (imported on first use).
         Either specify the `data_manager_class` and the `plotly_manager_class` or override the method `get_plotly_manager`
         :param port: Port for DashApp. Default = 8050.
         :param dash_debug: If true, runs dash app server in debug mode.
@@ -89,6 +123,35 @@ class DoDashApp(DashApp):
         generate a requests_pathname_prefix for the Dash app. For use with custom environment in CPD v4.0.02.
         The alternative (None of HostEnvironment.Local) runs the Dash app regularly.
         :param enable_long_running_callbacks. Default = True. Enables the use of Dash long-running callbacks for model runs. If False, it only allows for in-line runs.
+        :param plotly_manager_cache_max_entries: Maximum number of prepared PlotlyManagers (with their DataManagers) kept in memory.
+        Set to 0 to disable, i.e. create a new PlotlyManager on every call of `get_plotly_manager`.
+        :param plotly_manager_cache_max_mb: Maximum total (estimated) size in MB of the DataFrames of the cached PlotlyManagers. None for no limit.
+        :param table_read_max_workers: Maximum number of scenario tables read concurrently from the DB (on cache misses).
+        Default = 1, i.e. the missing tables of a scenario are read in one batch on a single connection. Each worker uses its own connection from the SQLAlchemy connection pool,
+        so keep this at or below the pool size (by default 5 + 10 overflow).
+        :param data_table_page_size: If None (default), the DataTables on the Prepare Data and Explore Solution pages
+        contain all rows and do paging, sorting and filtering in the browser.
+        Otherwise, these are done on the server and only the visible page of this size is sent to the browser. Use for large tables.
+        :param pivot_table_aggregate: If True, the PivotTables on the Prepare Data and Explore Solution pages get data that is
+        pre-aggregated on the server based on the PivotTableConfig of the table, instead of all rows. Tables without (supported) PivotTableConfig get all rows.
+        :param pivot_table_max_rows: Maximum number of rows sent to a PivotTable. If more, sends a random sample. None for no limit.
+        :param upload_parse_max_workers: Number of processes that parse the .xlsx files of an uploaded .zip, while the scenarios are written to the DB.
+        Default = 1, i.e. the files are parsed and written one at a time, streaming in chunks of rows.
+        If > 1, the processes are started with 'spawn' and import the `__main__` module: create the app under `if __name__ == '__main__':`.
+        :param export_cache_dir: Directory for the files of the scenario downloads (see `ExportFileCache`).
+        If None (default), uses a temporary directory.
+        :param export_max_workers: Number of scenario downloads (exports) running concurrently in the background.
+        :param job_max_workers: Maximum number of model runs (jobs) running at the same time, each in its own process. See `DoModelJobScheduler`.
+        :param job_db_path: Path of the SQLite database with the queue and history of the model runs, e.g. './cache/jobs.sqlite'.
+        If None (default), uses a temporary directory, i.e. the history does not survive a restart of the app.
+        :param schema_snapshot_path: Path of the file with the table schemas, pivot table configurations and table names (see `SchemaSnapshot`),
+        e.g. './cache/schema_snapshot.pickle'. If the snapshot matches the code and the arguments (see `get_schema_snapshot_arguments`),
+        the app starts without creating the ScenarioDbManager, which is then created (and connects to the DB) on the first request that needs data.
+        If None (default), always derives these at start-up from the ScenarioDbManager.
+        :param enable_figure_cache: If True, the layout (with the figures) of a VisualizationPage is stored as JSON in the Flask cache,
+        keyed by page, scenario(s) and the change tokens of the tables of the page. See `get_visualization_page_children_cached`.
+        Pages can opt out with `VisualizationPage.enable_figure_cache`.
+        :param figure_cache_timeout: Timeout in seconds of the layouts in the figure cache. If None, uses the default timeout of the cache.
         """
         self.db_credentials = db_credentials
         self.schema = schema
@@ -97,7 +160,10 @@ class DoDashApp(DashApp):
         self.db_manager_kwargs = db_manager_kwargs if db_manager_kwargs is not None else {}  # To ensure no None value
         self.database_manager_class = database_manager_class
         # assert issubclass(self.database_manager_class, ScenarioDbManager)
-        self.dbm = self.create_database_manager_instance()
+        self._database_manager: Optional[ScenarioDbManager] = None  # Created on first use of `self.dbm`
+        self.database_manager_lock = threading.Lock()
+        self.schema_snapshot_path = schema_snapshot_path
+        self.schema_snapshot = self.get_schema_snapshot()
 
         # Initialize main pages:
         self.main_pages = self.create_main_pages()
@@ -112,14 +178,16 @@ class DoDashApp(DashApp):
         # self.explore_solution_page = ExploreSolutionPage(self)
         # self.visualization_tabs_page = VisualizationTabsPage(self)
 
-        self.visualization_pages: List[VisualizationPage] = visualization_pages
+        # VisualizationPages and/or VisualizationPageSpecs. All have a page_name, page_id and url for the menus:
+        self.visualization_pages: List[VisualizationPageEntry] = visualization_pages
+        self.visualization_page_registry = VisualizationPageRegistry(self, visualization_pages)
         # VisualizationPage quick access by URL:
-        self.visualization_pages_dict_by_url_page_name: Dict[str, VisualizationPage] = {
+        self.visualization_pages_dict_by_url_page_name: Dict[str, VisualizationPageEntry] = {
             f"visualization/{vp.url}": vp for vp in
             self.visualization_pages}
 
-        self.table_pivot_configs = self.get_pivot_table_configs() # table_pivot_config
-        self.table_schemas = self.get_table_schemas()
+        self.table_pivot_configs = self.schema_snapshot.pivot_table_configs # table_pivot_config
+        self.table_schemas = self.schema_snapshot.table_schemas
 
         self.data_manager_class = data_manager_class
         self.plotly_manager_class = plotly_manager_class
@@ -135,8 +203,25 @@ class DoDashApp(DashApp):
 
         self.read_scenario_table_from_db_callback = None  # For Flask caching
         self.read_scenarios_table_from_db_callback = None # For Flask caching
-
-        self.job_queue: List[DoModelRunner] = []  # TODO: migrate to Store. Using global variables is dangerous
+        self.change_tokens_lock = threading.Lock()  # Guards the read-modify-write of the change tokens in the cache
+        self.plotly_manager_cache = SizedLRUCache(
+            max_entries=plotly_manager_cache_max_entries,
+            max_bytes=(plotly_manager_cache_max_mb * 1024 * 1024 if plotly_manager_cache_max_mb is not None else None))
+        self.table_read_max_workers = table_read_max_workers
+        self.data_table_page_size = data_table_page_size
+        self.pivot_table_aggregate = pivot_table_aggregate
+        self.pivot_table_max_rows = pivot_table_max_rows
+        self.upload_parse_max_workers = upload_parse_max_workers
+        self.export_jobs = ExportJobManager(ExportFileCache(export_cache_dir), max_workers=export_max_workers)
+        self.pivot_table_cache = SizedLRUCache(max_entries=32)  # (scenario_name, table_name, change token) -> pivot card children
+        self.request_coalescer = RequestCoalescer()  # Shares PlotlyManagers and figures between concurrent identical requests
+        self.enable_figure_cache = enable_figure_cache
+        self.figure_cache_timeout = figure_cache_timeout
+        self.table_read_executor: Optional[ThreadPoolExecutor] = (
+            ThreadPoolExecutor(max_workers=table_read_max_workers, thread_name_prefix='table_read')
+            if table_read_max_workers > 1 else None)
+
+        self.job_scheduler = DoModelJobScheduler(self, self.get_do_model_runner_configs(), db_path=job_db_path, max_workers=job_max_workers)
 
 
 
@@ -147,6 +232,51 @@ class DoDashApp(DashApp):
                          enable_long_running_callbacks=enable_long_running_callbacks,
                          dash_kwargs=dash_kwargs)
 
+    @property
+    def dbm(self) -> ScenarioDbManager:
+        """The ScenarioDbManager. Created by `create_database_manager_instance` on first use,
+        so the app does not connect to the DB before a request needs data (see `schema_snapshot_path`)."""
+        if self._database_manager is None:
+            with self.database_manager_lock:
+                if self._database_manager is None:
+                    self._database_manager = self.create_database_manager_instance()
+        return self._database_manager
+
+    @dbm.setter
+    def dbm(self, dbm: ScenarioDbManager):
+        self._database_manager = dbm
+
+    def get_schema_snapshot(self) -> SchemaSnapshot:
+        """Returns the table schemas, pivot table configurations and table names.
+        Loaded from the file `schema_snapshot_path` if it matches the code (see `get_schema_snapshot_key`).
+        Otherwise derived from the ScenarioDbManager (see `get_table_schemas` and `get_pivot_table_configs`) and stored in the file.
+        Not stored if any table is an AutoScenarioDbTable, since then the schema is read from the DB,
+        or if any of the classes has no source file."""
+        if self.schema_snapshot_path is not None:
+            snapshot = load_schema_snapshot(self.schema_snapshot_path, type(self), self.database_manager_class,
+                                            arguments=self.get_schema_snapshot_arguments())
+            if snapshot is not None:
+                print(f"Loaded schema snapshot {self.schema_snapshot_path}")
+                return snapshot
+        classes = get_schema_snapshot_classes(type(self), self.dbm)
+        key = get_schema_snapshot_key(*classes, arguments=self.get_schema_snapshot_arguments())
+        snapshot = SchemaSnapshot(key=key,
+                                  class_paths=[get_class_path(cls) for cls in classes],
+                                  table_schemas=self.get_table_schemas(),
+                                  pivot_table_configs=self.get_pivot_table_configs(),
+                                  input_table_names=list(self.dbm.input_db_tables.keys()),
+                                  output_table_names=list(self.dbm.output_db_tables.keys()))
+        if (self.schema_snapshot_path is not None and key is not None
+                and not any(isinstance(db_table, AutoScenarioDbTable) for db_table in self.dbm.db_tables.values())):
+            save_schema_snapshot(self.schema_snapshot_path, snapshot)
+        return snapshot
+
+    def get_schema_snapshot_arguments(self) -> Dict:
+        """The arguments of the app that change the tables of the ScenarioDbManager, as part of the key of the SchemaSnapshot.
+        By default the `db_manager_kwargs` (e.g. `enable_scenario_seq`, or tables passed to the ScenarioDbManager) and the `db_type`.
+        Override to add anything else that changes the tables at runtime, e.g. a configuration read by `create_database_manager_instance`."""
+        return {'db_manager_kwargs': self.db_manager_kwargs, 'db_type': self.db_type}
+
     def create_database_manager_instance(self) -> ScenarioDbManager:
         """Create an instance of a ScenarioDbManager.
         The default implementation uses the database_manager_class from the constructor.
@@ -282,17 +412,23 @@ class DoDashApp(DashApp):
         ], style=sidebar_style)
         return sidebar
 
-    def refresh_scenarios_dash_callback(self, current_scenario_name: str):
+    def refresh_scenarios_dash_callback(self, current_scenario_name: str, n_clicks: Optional[int] = None):
         """Reads the currently selected scenario-name. Reloads the scenario names from DB.
         If the currently selected scenario is valid, this will be maintained as the selected value.
+        Evicts the cached scenario tables that changed in the DB (see `refresh_scenario_table_change_tokens`).
+        On an explicit click of the refresh button, evicts all cached scenario tables.
+
+        :param current_scenario_name: Currently selected scenario
+        :param n_clicks: Clicks of the refresh button. None or 0 on the initial call, i.e. on a page load.
         """
-        print(f"Scenario refresh button. Reload scenario table. Clears cache. current-scenario={current_scenario_name}")
-        self.cache.init_app(self.app.server, config=self.cache_config)
-        # with app.app_context():
-        self.cache.clear()
+        evict_all = n_clicks is not None and n_clicks > 0
+        print(f"Scenario refresh. Reload scenario table. Evict {'all' if evict_all else 'changed'} tables from cache. current-scenario={current_scenario_name}")
+        if self.read_scenarios_table_from_db_callback is not None and hasattr(self.read_scenarios_table_from_db_callback, 'uncached'):
+            self.cache.delete_memoized(self.read_scenarios_table_from_db_callback)
 
         # scenarios_df = get_scenarios_df_cached_proc().reset_index()
         scenarios_df = self.read_scenarios_table_from_db_cached().reset_index()
+        self.refresh_scenario_table_change_tokens(list(scenarios_df.scenario_name), evict_all=evict_all)
         if scenarios_df.shape[0] > 0:
             if current_scenario_name in list(scenarios_df.scenario_name):
                 initial_scenario_name = current_scenario_name
@@ -306,6 +442,217 @@ class DoDashApp(DashApp):
         ]
         return options, initial_scenario_name
 
+    def clear_cache(self):
+        """Clears the whole Flask cache, i.e. all tables of all scenarios.
+        Not used by the refresh button anymore, see `refresh_scenario_table_change_tokens`."""
+        with self.app.server.app_context():
+            self.cache.clear()
+
+    ########################################################################################
+    # Change tokens: versioned invalidation of cached scenario tables
+    ########################################################################################
+    def get_scenario_table_change_tokens(self) -> Dict[str, Dict[str, ScenarioTableChangeToken]]:
+        """Returns the change tokens of all scenario tables as known by the app, by scenario_name and scenario_table_name.
+        Stored in the Flask cache (without timeout), so they are shared between workers if the cache is shared."""
+        tokens = self.cache.get('scenario_table_change_tokens')
+        return tokens if tokens is not None else {}
+
+    def set_scenario_table_change_tokens(self, tokens: Dict[str, Dict[str, ScenarioTableChangeToken]]):
+        self.cache.set('scenario_table_change_tokens', tokens, timeout=0)
+
+    def get_scenario_table_change_token(self, scenario_name: str, scenario_table_name: str) -> ScenarioTableChangeToken:
+        """Returns the change token of a scenario table. Can be used as part of a cache key for data derived from the table."""
+        tokens = self.get_scenario_table_change_tokens()
+        return tokens.get(scenario_name, {}).get(scenario_table_name, ScenarioTableChangeToken(None, 0))
+
+    def get_change_stamp_aggregates(self, t: sqlalchemy.Table) -> List:
+        """Returns the aggregate expressions that make up the change stamp of a table: the row count,
+        the sum of every numeric column and the sum of the lengths of every string column.
+        A change of values in the DB (e.g. outside the app) that keeps all of these the same is not detected.
+        Override to use e.g. a last-modified column of the table.
+
+        :param t: SQLAlchemy table
+        """
+        aggregates = [sqlalchemy.func.count()]
+        for column in t.columns:
+            if column.name in ('scenario_name', 'scenario_seq'):
+                continue
+            if isinstance(column.type, (sqlalchemy.Integer, sqlalchemy.Numeric, sqlalchemy.Float)):
+                aggregates.append(sqlalchemy.func.sum(sqlalchemy.cast(column, sqlalchemy.Float)))
+            elif isinstance(column.type, sqlalchemy.String):
+                aggregates.append(sqlalchemy.func.sum(sqlalchemy.func.length(column)))
+        return aggregates
+
+    def read_scenario_table_change_stamps_from_db(self, scenario_name: Optional[str] = None,
+                                                  scenario_table_names: Optional[List[str]] = None) -> Dict[str, Dict[str, tuple]]:
+        """Reads the change stamps of the tables of all scenarios, see `get_change_stamp_aggregates`.
+        One (grouped) aggregate query per table, which is a lot cheaper than reading the tables.
+        The first value of a stamp is the row count.
+
+        :param scenario_name: If not None, only reads the stamps of this scenario.
+        :param scenario_table_names: If not None, only reads the stamps of these tables.
+        :returns: change stamps by scenario_name and scenario_table_name. Tables without rows are omitted.
+        """
+        stamps: Dict[str, Dict[str, tuple]] = {}
+        with self.dbm.engine.begin() as connection:
+            for scenario_table_name, db_table in self.dbm.db_tables.items():
+                if scenario_table_name == 'Scenario':
+                    continue
+                if scenario_table_names is not None and scenario_table_name not in scenario_table_names:
+                    continue
+                t: sqlalchemy.Table = db_table.get_sa_table()
+                if t is None:
+                    continue
+                aggregates = self.get_change_stamp_aggregates(t)
+                if self.dbm.enable_scenario_seq:
+                    s: sqlalchemy.Table = self.dbm.get_scenario_sa_table()
+                    sql = (sqlalchemy.select(s.c.scenario_name, *aggregates)
+                           .select_from(t.join(s, t.c.scenario_seq == s.c.scenario_seq))
+                           .group_by(s.c.scenario_name))
+                    if scenario_name is not None:
+                        sql = sql.where(s.c.scenario_name == scenario_name)
+                else:
+                    sql = sqlalchemy.select(t.c.scenario_name, *aggregates).group_by(t.c.scenario_name)
+                    if scenario_name is not None:
+                        sql = sql.where(t.c.scenario_name == scenario_name)
+                for row in connection.execute(sql):
+                    stamps.setdefault(row[0], {})[scenario_table_name] = (row[1],) + tuple(
+                        None if value is None else float(f"{float(value):.12g}") for value in row[2:])  # Round off summation-order noise
+        return stamps
+
+    def refresh_scenario_table_change_tokens(self, scenario_names: List[str], evict_all: bool = False):
+        """Compares the change stamps in the DB with the change tokens known by the app.
+        Evicts only the cached tables that are stale, i.e. where the change stamp has changed, or where the scenario no longer exists.
+        Changes made through the app itself are handled by `invalidate_scenario_tables_cache`.
+        A change token only changes if the change stamp of its table changed.
+
+        :param scenario_names: Names of the scenarios in the DB
+        :param evict_all: If True, also evicts the cached tables that did not change, e.g. on a manual refresh. Does not change their tokens.
+        """
+        stamps = self.read_scenario_table_change_stamps_from_db()
+        table_names = self.get_input_table_names() + self.get_output_table_names()
+        now = time.time()
+        with self.change_tokens_lock:
+            tokens = self.get_scenario_table_change_tokens()
+            new_tokens = {}
+            for scenario_name in scenario_names:
+                scenario_tokens = tokens.get(scenario_name, {})
+                new_scenario_tokens = {}
+                for scenario_table_name in table_names:
+                    stamp = stamps.get(scenario_name, {}).get(scenario_table_name, (0,))
+                    if evict_all:
+                        self._evict_scenario_table_from_cache(scenario_name, scenario_table_name)
+                    new_scenario_tokens[scenario_table_name] = self._refresh_scenario_table_change_token(
+                        scenario_name, scenario_table_name, scenario_tokens.get(scenario_table_name), stamp, now)
+                new_tokens[scenario_name] = new_scenario_tokens
+            for scenario_name in tokens.keys() - new_tokens.keys():  # Deleted outside the app
+                for scenario_table_name in tokens[scenario_name].keys():
+                    self._evict_scenario_table_from_cache(scenario_name, scenario_table_name)
+            self.set_scenario_table_change_tokens(new_tokens)
+
+    def check_scenario_table_change_tokens(self, scenario_name: str, scenario_table_names: List[str]) -> Dict[str, tuple]:
+        """Like `refresh_scenario_table_change_tokens`, but for a set of tables of one scenario.
+        Evicts the cached tables where the change stamp in the DB differs from the change token. Leaves other scenarios alone.
+
+        :param scenario_name: Name of scenario
+        :param scenario_table_names: Names of the scenario tables
+        :returns: change stamps in the DB by scenario_table_name
+        """
+        scenario_stamps = self.read_scenario_table_change_stamps_from_db(scenario_name, scenario_table_names).get(scenario_name, {})
+        stamps = {scenario_table_name: scenario_stamps.get(scenario_table_name, (0,)) for scenario_table_name in scenario_table_names}
+        now = time.time()
+        with self.change_tokens_lock:
+            tokens = self.get_scenario_table_change_tokens()
+            scenario_tokens = tokens.setdefault(scenario_name, {})
+            for scenario_table_name, stamp in stamps.items():
+                scenario_tokens[scenario_table_name] = self._refresh_scenario_table_change_token(
+                    scenario_name, scenario_table_name, scenario_tokens.get(scenario_table_name), stamp, now)
+            self.set_scenario_table_change_tokens(tokens)
+        return stamps
+
+    def _refresh_scenario_table_change_token(self, scenario_name: str, scenario_table_name: str,
+                                             token: Optional[ScenarioTableChangeToken], db_stamp: tuple,
+                                             now: float) -> ScenarioTableChangeToken:
+        """Returns the new change token of a table given the change stamp in the DB. Evicts the table from the cache if stale.
+        Returns the same token if the stamp did not change."""
+        if token is None:
+            token = ScenarioTableChangeToken(db_stamp, 0)
+        elif token.db_stamp != db_stamp:
+            print(f"Scenario table changed in DB: {scenario_name} - {scenario_table_name}. Evict from cache.")
+            self._evict_scenario_table_from_cache(scenario_name, scenario_table_name)
+            token = ScenarioTableChangeToken(db_stamp, now)
+        return token
+
+    def ensure_scenario_table_change_tokens(self, scenario_names: List[str],
+                                            scenario_table_names: List[str]) -> Dict[str, Dict[str, ScenarioTableChangeToken]]:
+        """Creates the change tokens of the tables that have none yet, e.g. of a scenario created outside the app after the last refresh.
+        So a cache key that includes the change tokens does not change when the data is read.
+
+        :param scenario_names: Names of the scenarios
+        :param scenario_table_names: Names of the scenario tables
+        :returns: the change tokens of all scenario tables, see `get_scenario_table_change_tokens`
+        """
+        tokens = self.get_scenario_table_change_tokens()
+        scenario_table_names = [t for t in scenario_table_names if t in self.dbm.db_tables]
+        for scenario_name in scenario_names:
+            scenario_tokens = tokens.get(scenario_name, {})
+            missing_table_names = [t for t in scenario_table_names if t not in scenario_tokens]
+            if len(missing_table_names) > 0:
+                self.check_scenario_table_change_tokens(scenario_name, missing_table_names)
+                tokens = self.get_scenario_table_change_tokens()
+        return tokens
+
+    def invalidate_scenario_tables_cache(self, scenario_name: str, scenario_table_names: Optional[List[str]] = None):
+        """To be called after the app made a change to a scenario in the DB, e.g. an edit, a model run or an upload.
+        Evicts the cached tables and stamps their change token as modified, with the change stamp as now in the DB.
+        The token changes even if the change is not visible in the change stamp.
+
+        :param scenario_name: Name of the changed scenario.
+        :param scenario_table_names: Names of the changed tables. If None, all tables.
+        """
+        if scenario_table_names is None:
+            scenario_table_names = self.get_input_table_names() + self.get_output_table_names()
+        scenario_stamps = self.read_scenario_table_change_stamps_from_db(scenario_name, scenario_table_names).get(scenario_name, {})
+        now = time.time()
+        with self.change_tokens_lock:
+            tokens = self.get_scenario_table_change_tokens()
+            scenario_tokens = tokens.setdefault(scenario_name, {})
+            for scenario_table_name in scenario_table_names:
+                self._evict_scenario_table_from_cache(scenario_name, scenario_table_name)
+                scenario_tokens[scenario_table_name] = ScenarioTableChangeToken(scenario_stamps.get(scenario_table_name, (0,)), now)
+            self.set_scenario_table_change_tokens(tokens)
+
+    def get_scenarios_export_key(self, export_type: str, scenario_names: List[str]) -> str:
+        """Returns the key of an export of a set of scenarios in the `ExportFileCache`.
+        Based on the change tokens of all tables of the scenarios, so the key changes if the data of any of the scenarios changes.
+
+        :param export_type: Type of export, e.g. 'xlsx' or 'xlsx_zip'
+        :param scenario_names: Names of the exported scenarios
+        """
+        tokens = self.get_scenario_table_change_tokens()
+        table_names = self.get_input_table_names() + self.get_output_table_names()
+        versions = [(scenario_name, [(scenario_table_name, tokens.get(scenario_name, {}).get(scenario_table_name, ScenarioTableChangeToken(None, 0)))
+                                     for scenario_table_name in table_names])
+                    for scenario_name in scenario_names]
+        return get_export_key(export_type, versions)
+
+    def update_cell_changes_in_db(self, db_cell_updates: List[DbCellUpdate]):
+        """Applies the cell edits of the Prepare Data page in the DB in one transaction (see `update_cell_changes_in_db_bulk`)
+        and invalidates the cache of only the touched scenario tables."""
+        update_cell_changes_in_db_bulk(self.dbm, db_cell_updates)
+        for scenario_name in {u.scenario_name for u in db_cell_updates}:
+            table_names = list({u.table_name for u in db_cell_updates if u.scenario_name == scenario_name})
+            self.invalidate_scenario_tables_cache(scenario_name, table_names)
+
+    def _evict_scenario_table_from_cache(self, scenario_name: str, scenario_table_name: str):
+        """Deletes the memoized table. Only applies if the table read callback is memoized by the Flask cache.
+        Also drops the PlotlyManagers based on the scenario and the PivotTables of the table.
+        (Their key no longer matches anyway, but this frees memory.)"""
+        self.plotly_manager_cache.remove_if(lambda key: key.includes_scenario(scenario_name))
+        self.pivot_table_cache.remove_if(lambda key: key[0] == scenario_name and key[1] == scenario_table_name)
+        if self.read_scenario_table_from_db_callback is not None and hasattr(self.read_scenario_table_from_db_callback, 'uncached'):
+            self.cache.delete_memoized(self.read_scenario_table_from_db_callback, scenario_name, scenario_table_name)
+
     ########################################################################################
     # DB caching callbacks
     ########################################################################################
@@ -374,18 +721,138 @@ class DoDashApp(DashApp):
         if output_table_names is None:  # load all tables by default
             output_table_names = self.dbm.output_db_tables.keys()
 
-        inputs = {}
-        for scenario_table_name in input_table_names:
-            # print(f"read input table {scenario_table_name}")
-            if scenario_table_name in self.dbm.input_db_tables.keys():
+        input_table_names = [t for t in input_table_names if t in self.dbm.input_db_tables.keys()]
+        output_table_names = [t for t in output_table_names if t in self.dbm.output_db_tables.keys()]
+        dfs = self.read_scenario_tables_from_db_cached_by_name(scenario_name, input_table_names + output_table_names)
+        inputs = {scenario_table_name: dfs[scenario_table_name] for scenario_table_name in input_table_names}
+        outputs = {scenario_table_name: dfs[scenario_table_name] for scenario_table_name in output_table_names}
+        return inputs, outputs
+
+    def read_multi_scenario_tables_from_db_cached(self, scenario_names: List[str],
+                                                  input_table_names: List[str] = None,
+                                                  output_table_names: List[str] = None) -> (Inputs, Outputs):
+        """For use with Flask caching. Same result as `dbm.read_multi_scenario_tables_from_db`,
+        but assembled from the cached tables of the individual scenarios.
+        I.e. only the tables of scenarios that are not yet in the cache are read from the DB.
+        Like the DB version, the tables include the `scenario_seq` (or `scenario_name`) column
+        and the inputs include the 'Scenario' table with the selected scenarios.
+
+        :param scenario_names: names of the scenarios. Scenarios that do not exist are skipped.
+        :param input_table_names: names of input tables
+        :param output_table_names: names of output tables. If None, all output tables.
+        """
+        input_table_names = list(input_table_names) if input_table_names is not None else []
+        if 'Scenario' not in input_table_names:
+            input_table_names.append('Scenario')
+        key_column = 'scenario_seq' if self.dbm.enable_scenario_seq else 'scenario_name'
+
+        ms_inputs_list: Dict[str, List[pd.DataFrame]] = {}
+        ms_outputs_list: Dict[str, List[pd.DataFrame]] = {}
+        for scenario_name in scenario_names:
+            inputs, outputs = self.read_scenario_tables_from_db_cached(scenario_name, input_table_names, output_table_names)
+            scenario_df = inputs['Scenario']
+            key = scenario_df[key_column].iloc[0] if scenario_df.shape[0] > 0 else None
+            for tables, ms_tables in [(inputs, ms_inputs_list), (outputs, ms_outputs_list)]:
+                for scenario_table_name, df in tables.items():
+                    if scenario_table_name != 'Scenario':
+                        df = df.copy(deep=False)  # Do not modify the cached DataFrame
+                        df.insert(0, key_column, key)
+                    ms_tables.setdefault(scenario_table_name, []).append(df)
+
+        def concat(dfs: List[pd.DataFrame]) -> pd.DataFrame:
+            # Skip empty tables (e.g. from scenarios that do not exist), since these can change the dtypes
+            non_empty_dfs = [df for df in dfs if df.shape[0] > 0]
+            return pd.concat(non_empty_dfs if len(non_empty_dfs) > 0 else dfs[:1], ignore_index=True)
+
+        ms_inputs = {scenario_table_name: concat(dfs) for scenario_table_name, dfs in ms_inputs_list.items()}
+        ms_outputs = {scenario_table_name: concat(dfs) for scenario_table_name, dfs in ms_outputs_list.items()}
+        return ms_inputs, ms_outputs
+
+    def read_scenario_tables_from_db_cached_by_name(self, scenario_name: str, scenario_table_names: List[str]) -> Dict[str, pd.DataFrame]:
+        """Reads multiple tables of a scenario through the cache.
+        Tables already in the cache are served inline. The cache misses are either:
+        - read from the DB concurrently in the `table_read_executor`, if enabled (i.e. `table_read_max_workers` > 1), or
+        - read in one batch on a single connection, see `read_scenario_tables_from_db_batched_cached`.
+
+        :param scenario_name: name of scenario
+        :param scenario_table_names: names of the scenario tables
+        :return: dict of table name -> DataFrame
+        """
+        dfs = {}
+        misses = []
+        for scenario_table_name in scenario_table_names:
+            if self.is_scenario_table_cached(scenario_name, scenario_table_name):
+                dfs[scenario_table_name] = self.read_scenario_table_from_db_cached(scenario_name, scenario_table_name)
+            else:
+                misses.append(scenario_table_name)
+
+        if len(misses) == 1:  # Nothing to batch or to hand-off to the pool
+            dfs[misses[0]] = self.read_scenario_table_from_db_cached(scenario_name, misses[0])
+        elif len(misses) > 1 and self.table_read_executor is not None:
+            futures = {scenario_table_name: self.table_read_executor.submit(self._read_scenario_table_from_db_cached_in_app_context,
+                                                                            scenario_name, scenario_table_name)
+                       for scenario_table_name in misses}
+            for scenario_table_name, future in futures.items():
+                dfs[scenario_table_name] = future.result()
+        elif len(misses) > 1:
+            dfs.update(self.read_scenario_tables_from_db_batched_cached(scenario_name, misses))
+        return {scenario_table_name: dfs[scenario_table_name] for scenario_table_name in scenario_table_names}
+
+    def read_scenario_input_tables_from_db_cached(self, scenario_name: str) -> Inputs:
+        """Same result as `dbm.read_scenario_input_tables_from_db`, but through the cache, e.g. to load the inputs of a model run.
+        The tables are first checked against the DB with `check_scenario_table_change_tokens` (one aggregate query per table),
+        so stale tables are re-read while the tables already in the cache are not.
+        A table with a different number of rows than in its change stamp (i.e. changed while reading) is read again from the DB.
+
+        :param scenario_name: Name of scenario
+        :return: dict of input table name -> DataFrame
+        """
+        input_table_names = self.get_input_table_names()
+        stamps = self.check_scenario_table_change_tokens(scenario_name, input_table_names)
+        inputs = self.read_scenario_tables_from_db_cached_by_name(scenario_name, input_table_names)
+        for scenario_table_name, df in inputs.items():
+            if df.shape[0] != stamps[scenario_table_name][0]:
+                print(f"Scenario table changed while reading: {scenario_name} - {scenario_table_name}. Read again.")
+                self.invalidate_scenario_tables_cache(scenario_name, [scenario_table_name])
                 inputs[scenario_table_name] = self.read_scenario_table_from_db_cached(scenario_name, scenario_table_name)
+        return inputs
 
-        outputs = {}
-        for scenario_table_name in output_table_names:
-            # print(f"read output table {scenario_table_name}")
-            if scenario_table_name in self.dbm.output_db_tables.keys():
-                outputs[scenario_table_name] = self.read_scenario_table_from_db_cached(scenario_name, scenario_table_name)
-        return inputs, outputs
+    def read_scenario_tables_from_db_batched_cached(self, scenario_name: str, scenario_table_names: List[str]) -> Dict[str, pd.DataFrame]:
+        """Reads a set of tables of one scenario from the DB in one batch on a single connection/transaction,
+        and stores each table individually in the cache, so that later single-table reads are cache hits.
+        Does NOT check the cache first, see `read_scenario_tables_from_db_cached_by_name`.
+
+        :param scenario_name: name of scenario
+        :param scenario_table_names: names of the scenario tables
+        :return: dict of table name -> DataFrame
+        """
+        dfs = read_scenario_tables_from_db_batched(self.dbm, scenario_name, scenario_table_names)
+        for scenario_table_name, df in dfs.items():
+            print(f"DB read {scenario_name} - {scenario_table_name} - {df.shape[0]} rows (batched)")
+            self._set_scenario_table_in_cache(scenario_name, scenario_table_name, df)
+        return dfs
+
+    def _set_scenario_table_in_cache(self, scenario_name: str, scenario_table_name: str, df: pd.DataFrame):
+        """Stores the table under the same key as the memoized `read_scenario_table_from_db_callback`."""
+        callback = self.read_scenario_table_from_db_callback
+        if callback is None or not hasattr(callback, 'make_cache_key'):
+            return
+        cache_key = callback.make_cache_key(callback.uncached, scenario_name, scenario_table_name)
+        self.cache.set(cache_key, df, timeout=callback.cache_timeout)
+
+    def _read_scenario_table_from_db_cached_in_app_context(self, scenario_name: str, scenario_table_name: str) -> pd.DataFrame:
+        """Worker thread version of `read_scenario_table_from_db_cached`.
+        The Flask cache needs an application context, which is not inherited by the worker threads."""
+        with self.app.server.app_context():
+            return self.read_scenario_table_from_db_cached(scenario_name, scenario_table_name)
+
+    def is_scenario_table_cached(self, scenario_name: str, scenario_table_name: str) -> bool:
+        """Returns True if the table is in the Flask cache, i.e. `read_scenario_table_from_db_cached` will not hit the DB."""
+        callback = self.read_scenario_table_from_db_callback
+        if callback is None or not hasattr(callback, 'make_cache_key'):
+            return False
+        cache_key = callback.make_cache_key(callback.uncached, scenario_name, scenario_table_name)
+        return self.cache.has(cache_key)
 
     ########################################################################################
     # End DB caching callbacks
@@ -418,7 +885,7 @@ class DoDashApp(DashApp):
             page = self.main_pages_dict_by_url_page_name[page_name]
             layout = page.get_layout(scenario_name, reference_scenario_name, multi_scenario_names)
         elif page_name in self.visualization_pages_dict_by_url_page_name:
-            vp = self.visualization_pages_dict_by_url_page_name[page_name]
+            vp = self.get_visualization_page(self.visualization_pages_dict_by_url_page_name[page_name].page_id)
             layout = vp.get_layout(scenario_name, reference_scenario_name, multi_scenario_names)
         else:
             layout = self.get_not_found_page().get_layout(f"Page '{pathname}' not found")
@@ -427,6 +894,22 @@ class DoDashApp(DashApp):
     def get_not_found_page(self) -> NotFoundPage:
         return NotFoundPage(self)
 
+    def get_visualization_page(self, page_id: str) -> Optional[VisualizationPage]:
+        """Returns the VisualizationPage. Imports and creates the page on first use if declared by a VisualizationPageSpec."""
+        return self.visualization_page_registry.get_page(page_id)
+
+    def get_data_manager_class(self):
+        """Returns the `data_manager_class`, importing it if specified by its dotted path."""
+        if isinstance(self.data_manager_class, str):
+            self.data_manager_class = import_from_dotted_path(self.data_manager_class)
+        return self.data_manager_class
+
+    def get_plotly_manager_class(self):
+        """Returns the `plotly_manager_class`, importing it if specified by its dotted path."""
+        if isinstance(self.plotly_manager_class, str):
+            self.plotly_manager_class = import_from_dotted_path(self.plotly_manager_class)
+        return self.plotly_manager_class
+
     ###########################################################################################################
     #
     ###########################################################################################################
@@ -440,6 +923,8 @@ class DoDashApp(DashApp):
                            enable_multi_scenario: bool = False) -> PlotlyManager:
         """Creates the PlotlyManager based on the plotly_manager_class and the data_manager_class.
         Loads data for selected input and output tables from the DB, creates a DataManager and embeds into a PlotlyManager.
+        Prepared PlotlyManagers are kept in the `plotly_manager_cache`, keyed by scenario(s), tables and the change tokens of those tables.
+        So the `prepare_data_frames()` is only done again when the underlying tables change.
 
         :param scenario_name: Name of scenario.
         :param input_table_names: List of input table names to load. Use ['*'] for all input tables.
@@ -447,43 +932,153 @@ class DoDashApp(DashApp):
         :return: A PlotlyManager, or None if plotly_manager_class and the data_manager_class have not been defined.
         """
         if self.data_manager_class is not None and self.plotly_manager_class is not None:
-            inputs, outputs = self.read_scenario_tables_from_db_cached(scenario_name, input_table_names, output_table_names)
-            dm = self.data_manager_class(inputs, outputs)
-            dm.prepare_data_frames()
-            pm = self.plotly_manager_class(dm)
-
-            # print(f"get_plotly_manager. Input tables = {input_table_names}")
-            if enable_reference_scenario and reference_scenario_name is not None:
-                inputs, outputs = self.read_scenario_tables_from_db_cached(reference_scenario_name, input_table_names, output_table_names)
-                ref_dm = self.data_manager_class(inputs, outputs)
-                ref_dm.prepare_data_frames()
-                pm.ref_dm = ref_dm  # TODO: add to pm via constructor
-            else:
-                pm.ref_dm = None
-
-            if enable_multi_scenario and multi_scenario_names is not None:
-                # TODO: this is not (yet) cached. Add caching.
-                ms_inputs, ms_outputs = self.dbm.read_multi_scenario_tables_from_db(multi_scenario_names, input_table_names, output_table_names)
-                # TODO: for now just add as properties of the pm, since the dm is for one scenario. Maybe we'll need a `MultiScenarioDataManager`?
-                pm.ms_inputs = ms_inputs
-                pm.ms_outputs = ms_outputs
-            else:
-                pm.ms_inputs = None
-                pm.ms_outputs = None
+            key = self.get_plotly_manager_cache_key(scenario_name, input_table_names, output_table_names,
+                                                    reference_scenario_name=(reference_scenario_name if enable_reference_scenario else None),
+                                                    multi_scenario_names=(multi_scenario_names if enable_multi_scenario else None))
+            pm = self.plotly_manager_cache.get(key)
+            if pm is None:
+                def create_plotly_manager() -> PlotlyManager:
+                    pm = self.plotly_manager_cache.get(key)  # Created by a request that just finished
+                    if pm is None:
+                        pm = self.create_plotly_manager(scenario_name, input_table_names, output_table_names,
+                                                        reference_scenario_name=reference_scenario_name,
+                                                        multi_scenario_names=multi_scenario_names,
+                                                        enable_reference_scenario=enable_reference_scenario,
+                                                        enable_multi_scenario=enable_multi_scenario)
+                        if self.plotly_manager_cache.enabled:
+                            self.plotly_manager_cache.put(key, pm, estimate_data_size(pm))
+                    return pm
+                # Concurrent requests for the same PlotlyManager (e.g. the content and the visualization tab callbacks,
+                # or the figures of an incremental page) wait for one to create it, instead of each reading and preparing the data:
+                pm = self.request_coalescer.run(key, create_plotly_manager)
         else:
             print("Error: either specify the `data_manager_class` and the `plotly_manager_class` or override the method `get_plotly_manager`.")
             pm = None
         return pm
 
+    def get_plotly_manager_cache_key(self, scenario_name: str,
+                                     input_table_names: List[str] = None,
+                                     output_table_names: List[str] = None,
+                                     reference_scenario_name: str = None,
+                                     multi_scenario_names: List[str] = None) -> PlotlyManagerCacheKey:
+        """Key of a PlotlyManager in the `plotly_manager_cache`.
+        Includes the change tokens of all tables involved, so a key of a PlotlyManager based on stale data will not match."""
+        input_table_names = tuple(sorted(input_table_names if input_table_names is not None else []))
+        output_table_names = tuple(sorted(output_table_names if output_table_names is not None else self.get_output_table_names()))
+        multi_scenario_names = tuple(sorted(multi_scenario_names)) if multi_scenario_names is not None else None
+        scenario_names = [scenario_name]
+        if reference_scenario_name is not None:
+            scenario_names.append(reference_scenario_name)
+        scenario_names.extend(multi_scenario_names or [])
+        tokens = self.ensure_scenario_table_change_tokens(scenario_names, list(input_table_names + output_table_names))
+        data_version = tuple(tokens.get(s, {}).get(t) for s in scenario_names for t in (input_table_names + output_table_names))
+        return PlotlyManagerCacheKey(scenario_name, input_table_names, output_table_names,
+                                     reference_scenario_name, multi_scenario_names, data_version)
+
+    def get_figure_cache_key(self, vp: VisualizationPage, scenario_name: str,
+                             reference_scenario_name: str = None, multi_scenario_names: List[str] = None) -> str:
+        """Key of the layout of a VisualizationPage in the figure cache: the page, the (reference and multi) scenarios
+        and the change tokens of the tables of the page (see `get_plotly_manager_cache_key`), and the code (see `SchemaSnapshot.key`).
+        Creates the change tokens that do not exist yet (see `ensure_scenario_table_change_tokens`),
+        so the key can be used both to look up and to store the layout."""
+        pm_key = self.get_plotly_manager_cache_key(scenario_name, vp.get_input_table_names(), vp.get_output_table_names(),
+                                                   reference_scenario_name=(reference_scenario_name if vp.enable_reference_scenario else None),
+                                                   multi_scenario_names=(multi_scenario_names if vp.enable_multi_scenario else None))
+        key = (vp.page_id, type(vp).__module__, type(vp).__qualname__, self.schema_snapshot.key, pm_key)
+        return f"figure_cache_{hashlib.sha256(repr(key).encode('utf-8')).hexdigest()}"
+
+    def get_visualization_page_children_cached(self, vp: VisualizationPage, scenario_name: str,
+                                               reference_scenario_name: str = None, multi_scenario_names: List[str] = None) -> List:
+        """Returns the layout children of the VisualizationPage, i.e. `vp.get_layout_children(pm)`, through the figure cache.
+        The cache holds the serialized JSON of the layout (not the Dash components and Plotly figures),
+        so a cache hit (also from another worker if the Flask cache is shared) does no pandas or Plotly work.
+        The returned children are the deserialized JSON, which Dash renders the same as the components."""
+        key = self.get_figure_cache_key(vp, scenario_name, reference_scenario_name, multi_scenario_names)
+        children_json = self.cache.get(key)
+        if children_json is None:
+            def create_children_json() -> str:
+                pm = vp.get_plotly_manager(scenario_name,
+                                           reference_scenario_name=reference_scenario_name,
+                                           multi_scenario_names=multi_scenario_names,
+                                           enable_reference_scenario=vp.enable_reference_scenario,
+                                           enable_multi_scenario=vp.enable_multi_scenario)
+                children_json = to_json_plotly(vp.get_layout_children(pm))
+                # Under the key of the lookup: if a table changed meanwhile, the key no longer matches its change token
+                self.cache.set(key, children_json, timeout=self.figure_cache_timeout)
+                return children_json
+            # E.g. the content and the visualization tab callbacks for the same page and scenario share one layout:
+            children_json = self.request_coalescer.run(key, create_children_json)
+        return json.loads(children_json)
+
+    def async_figure_callback(self, page_id: str, index: int, request: Optional[Dict]):
+        """Returns figure `index` of the VisualizationPage, as created by `VisualizationPage.get_async_figure`.
+        Uses the figure cache per figure if the page uses the figure cache (see `get_visualization_page_children_cached`).
+
+        :param request: scenario_name, reference_scenario_name and multi_scenario_names of the page
+        """
+        vp = self.get_visualization_page(page_id)
+        if vp is None or request is None:
+            raise PreventUpdate
+        scenario_name = request.get('scenario_name')
+        reference_scenario_name = request.get('reference_scenario_name')
+        multi_scenario_names = request.get('multi_scenario_names')
+        key = self.get_figure_cache_key(vp, scenario_name, reference_scenario_name, multi_scenario_names) if vp.use_figure_cache() else None
+        if key is not None:
+            figure_json = self.cache.get(f"{key}_{index}")
+            if figure_json is not None:
+                return json.loads(figure_json)
+        # Concurrent figure requests of the page share one PlotlyManager (see `get_plotly_manager`):
+        pm = vp.get_plotly_manager(scenario_name,
+                                   reference_scenario_name=reference_scenario_name,
+                                   multi_scenario_names=multi_scenario_names,
+                                   enable_reference_scenario=vp.enable_reference_scenario,
+                                   enable_multi_scenario=vp.enable_multi_scenario)
+        figure = vp.get_async_figure(pm, index)
+        if key is not None:
+            self.cache.set(f"{key}_{index}", to_json_plotly(figure), timeout=self.figure_cache_timeout)
+        return figure
+
+    def create_plotly_manager(self, scenario_name: str,
+                              input_table_names: List[str] = None,
+                              output_table_names: List[str] = None,
+                              reference_scenario_name: str = None,
+                              multi_scenario_names: List[str] = None,
+                              enable_reference_scenario: bool = False,
+                              enable_multi_scenario: bool = False) -> PlotlyManager:
+        """Creates a new PlotlyManager, i.e. without the `plotly_manager_cache`. See `get_plotly_manager`."""
+        inputs, outputs = self.read_scenario_tables_from_db_cached(scenario_name, input_table_names, output_table_names)
+        dm = self.get_data_manager_class()(inputs, outputs)
+        dm.prepare_data_frames()
+        pm = self.get_plotly_manager_class()(dm)
+
+        # print(f"get_plotly_manager. Input tables = {input_table_names}")
+        if enable_reference_scenario and reference_scenario_name is not None:
+            inputs, outputs = self.read_scenario_tables_from_db_cached(reference_scenario_name, input_table_names, output_table_names)
+            ref_dm = self.get_data_manager_class()(inputs, outputs)
+            ref_dm.prepare_data_frames()
+            pm.ref_dm = ref_dm  # TODO: add to pm via constructor
+        else:
+            pm.ref_dm = None
+
+        if enable_multi_scenario and multi_scenario_names is not None:
+            ms_inputs, ms_outputs = self.read_multi_scenario_tables_from_db_cached(multi_scenario_names, input_table_names, output_table_names)
+            # TODO: for now just add as properties of the pm, since the dm is for one scenario. Maybe we'll need a `MultiScenarioDataManager`?
+            pm.ms_inputs = ms_inputs
+            pm.ms_outputs = ms_outputs
+        else:
+            pm.ms_inputs = None
+            pm.ms_outputs = None
+        return pm
+
     def get_input_table_names(self) -> List[str]:
-        """Return list of valid table names based on self.input_db_tables"""
-        names = list(self.dbm.input_db_tables.keys())
+        """Return list of valid table names based on self.input_db_tables (as in the `schema_snapshot`)"""
+        names = list(self.schema_snapshot.input_table_names)
         if 'Scenario' in names: names.remove('Scenario')
         return names
 
     def get_output_table_names(self) -> List[str]:
-        """Return list of valid table names based on self.input_db_tables"""
-        names = list(self.dbm.output_db_tables.keys())
+        """Return list of valid table names based on self.output_db_tables (as in the `schema_snapshot`)"""
+        names = list(self.schema_snapshot.output_table_names)
         return names
 
     def get_pivot_table_config(self, table_name) -> Optional[PivotTableConfig]:
@@ -491,6 +1086,25 @@ class DoDashApp(DashApp):
         pivot_config = (self.table_pivot_configs[table_name] if table_name in self.table_pivot_configs else None)
         return pivot_config
 
+    def get_pivot_table_card_children_cached(self, scenario_name: str, table_name: str,
+                                             get_df: Callable[[], pd.DataFrame]) -> List:
+        """Children of the pivot table card of the Prepare Data and Explore Solution pages.
+        Kept in the `pivot_table_cache` per scenario table and its change token,
+        so the conversion of the DataFrame to PivotTable data is only done once.
+
+        :param scenario_name: name of scenario
+        :param table_name: name of table
+        :param get_df: function that returns the DataFrame. Only called if not in the cache.
+        """
+        key = (scenario_name, table_name, self.get_scenario_table_change_token(scenario_name, table_name))
+        children = self.pivot_table_cache.get(key)
+        if children is None:
+            df = get_df()
+            children = get_pivot_table_card_children(df, scenario_name, table_name, self.get_pivot_table_config(table_name),
+                                                     aggregate=self.pivot_table_aggregate, max_rows=self.pivot_table_max_rows)
+            self.pivot_table_cache.put(key, children, estimate_data_size(df))
+        return children
+
     def get_table_by_name(self, dm: DataManager,
                           table_name: str,
                           index: Optional[bool] = False,
@@ -619,8 +1233,8 @@ class DoDashApp(DashApp):
         for main_page in self.main_pages:
             main_page.set_dash_callbacks()
 
-        for vp in self.visualization_pages:
-            vp.set_dash_callbacks()
+        # Does not import the pages declared by a VisualizationPageSpec, only registers their callback stubs:
+        self.visualization_page_registry.set_dash_callbacks()
 
         # Set any globally defined callbacks
         app = self.app
@@ -635,6 +1249,15 @@ class DoDashApp(DashApp):
                 return not is_open
             return is_open
 
+        @app.callback(
+            Output({'type': 'async_figure', 'page_id': MATCH, 'index': MATCH}, 'figure'),
+            Input({'type': 'async_figure_request', 'page_id': MATCH, 'index': MATCH}, 'data'),
+            State({'type': 'async_figure_request', 'page_id': MATCH, 'index': MATCH}, 'id'),
+            )
+        def async_figure_callback(request, request_id):
+            """Creates one figure of a VisualizationPage with placeholders (see `VisualizationPage.get_async_figure_graph`)."""
+            return self.async_figure_callback(request_id['page_id'], request_id['index'], request)
+
         if self.enable_long_running_callbacks:
             app = self.app
             runner_config_dict = {config.runner_id: config for config in self.get_do_model_runner_configs()}
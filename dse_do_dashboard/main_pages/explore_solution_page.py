@@ -5,15 +5,16 @@ from typing import Optional, List
 from dash.exceptions import PreventUpdate
 
 from dse_do_dashboard.main_pages.main_page import MainPage
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
 from dash import dcc, html
 import dash_bootstrap_components as dbc
 
-from dse_do_dashboard.utils.dash_common_utils import get_data_table_card_children, get_pivot_table_card_children
+from dse_do_dashboard.utils.dash_common_utils import get_data_table_card_children, get_data_table_page
 
 
 class ExploreSolutionPage(MainPage):
     def __init__(self, dash_app):
+        self.data_table_id = 'output_data_table'
         super().__init__(dash_app,
                          page_name='Explore Solution',
                          page_id='explore-solution',
@@ -43,8 +44,10 @@ class ExploreSolutionPage(MainPage):
             ], style = {'width': '80vw'}),
 
             dbc.Card([
-
-                dbc.CardBody(id = 'output_pivot_table_card',style = {'width': '79vw'}),
+                dbc.CardHeader(dbc.Button('Pivot Table', id='output_pivot_table_toggle', color='link', n_clicks=0)),
+                dbc.Collapse(  # Collapsed by default: the PivotTable is only created when opened
+                    dbc.CardBody(id = 'output_pivot_table_card',style = {'width': '79vw'}),
+                    id='output_pivot_table_collapse', is_open=False),
                 html.Div(id="output_pivot_table_div"),
             ], style = {'width': '80vw'})
 
@@ -70,19 +73,45 @@ class ExploreSolutionPage(MainPage):
                 return [data_table_children, pivot_table_children]
 
         """
+        data_table_children = self.update_data_output_table_callback(scenario_name, table_name)
+        pivot_table_children = self.update_pivot_output_table_callback(scenario_name, table_name, is_open=True)
+        return data_table_children, pivot_table_children
+
+    def update_data_output_table_callback(self, scenario_name, table_name: Optional[str]):
+        """Body for the Dash callback that updates the data table card."""
         if table_name is None:
             # In case there are no output tables
             raise PreventUpdate
+        df = self.get_output_table_df(scenario_name, table_name)
+        table_schema = self.dash_app.get_table_schema(table_name)
+        data_table_children = get_data_table_card_children(df, table_name, table_schema, data_table_id=self.data_table_id,
+                                                           page_size=self.dash_app.data_table_page_size)
+        return data_table_children
+
+    def update_pivot_output_table_callback(self, scenario_name, table_name: Optional[str], is_open: bool):
+        """Body for the Dash callback that updates the pivot table card.
+        Only creates the PivotTable if the card is open. The result is cached, see `DoDashApp.get_pivot_table_card_children_cached`."""
+        if table_name is None:
+            raise PreventUpdate
+        if not is_open:
+            return []  # Removes the (large) PivotTable data from the browser
+        return self.dash_app.get_pivot_table_card_children_cached(scenario_name, table_name,
+                                                                  lambda: self.get_output_table_df(scenario_name, table_name))
+
+
+    def get_output_table_df(self, scenario_name: str, table_name: str):
         output_table_names = [table_name]
         pm = self.dash_app.get_plotly_manager(scenario_name, [], output_table_names)
         dm = pm.dm
-        df = dm.outputs[table_name]
-        table_schema = self.dash_app.get_table_schema(table_name)
-        pivot_table_config = self.dash_app.get_pivot_table_config(table_name)
-        data_table_children = get_data_table_card_children(df, table_name, table_schema)
-        pivot_table_children = get_pivot_table_card_children(df, scenario_name, table_name, pivot_table_config)
-        return data_table_children, pivot_table_children
+        return dm.outputs[table_name]
 
+    def update_data_table_page_callback(self, page_current, page_size, sort_by, filter_query, scenario_name, table_name: Optional[str]):
+        """Body for the Dash callback of the DataTable with server-side paging, sorting and filtering.
+        Only used if `dash_app.data_table_page_size` is not None."""
+        if table_name is None:
+            raise PreventUpdate
+        df = self.get_output_table_df(scenario_name, table_name)
+        return get_data_table_page(df, page_current, page_size, sort_by, filter_query)
 
     def set_dash_callbacks(self):
         """Define Dash callbacks for this page
@@ -92,11 +121,36 @@ class ExploreSolutionPage(MainPage):
         """
         app = self.dash_app.app
 
-        @app.callback([Output('output_data_table_card', 'children'),
-                       Output('output_pivot_table_card', 'children'),
-                       ],
+        @app.callback(Output('output_data_table_card', 'children'),
                       [Input('top_menu_scenarios_drpdwn', 'value'),
                        Input('output_table_drpdwn', 'value')])
-        def update_data_and_pivot_output_table(scenario_name, table_name):
-            data_table_children, pivot_table_children = self.update_data_and_pivot_output_table_callback(scenario_name, table_name)
-            return [data_table_children, pivot_table_children]
\ No newline at end of file
+        def update_data_output_table(scenario_name, table_name):
+            return self.update_data_output_table_callback(scenario_name, table_name)
+
+        @app.callback(Output('output_pivot_table_collapse', 'is_open'),
+                      Input('output_pivot_table_toggle', 'n_clicks'),
+                      State('output_pivot_table_collapse', 'is_open'),
+                      prevent_initial_call=True)
+        def toggle_output_pivot_table(n_clicks, is_open):
+            return not is_open
+
+        @app.callback(Output('output_pivot_table_card', 'children'),
+                      [Input('output_pivot_table_collapse', 'is_open'),
+                       Input('top_menu_scenarios_drpdwn', 'value'),
+                       Input('output_table_drpdwn', 'value')])
+        def update_pivot_output_table(is_open, scenario_name, table_name):
+            return self.update_pivot_output_table_callback(scenario_name, table_name, is_open)
+
+        if self.dash_app.data_table_page_size is not None:
+            @app.callback([Output(self.data_table_id, 'data'),
+                           Output(self.data_table_id, 'page_count')],
+                          [Input(self.data_table_id, 'page_current'),
+                           Input(self.data_table_id, 'page_size'),
+                           Input(self.data_table_id, 'sort_by'),
+                           Input(self.data_table_id, 'filter_query')],
+                          [State('top_menu_scenarios_drpdwn', 'value'),
+                           State('output_table_drpdwn', 'value')],
+                          prevent_initial_call=True)
+            def update_output_data_table_page(page_current, page_size, sort_by, filter_query, scenario_name, table_name):
+                data, page_count = self.update_data_table_page_callback(page_current, page_size, sort_by, filter_query, scenario_name, table_name)
+                return [data, page_count]
@@ -2,12 +2,14 @@
 # SPDX-License-Identifier: Apache-2.0
 import ast
 import base64
+import importlib.util
 import io
 import os
 import pathlib
 import tempfile
+import uuid
 import zipfile
-from typing import List
+from typing import List, Optional
 
 import flask
 import pandas as pd
@@ -16,10 +18,16 @@ import dash
 from dse_do_utils import ScenarioManager
 
 from dse_do_dashboard.main_pages.main_page import MainPage
+from dse_do_dashboard.utils.scenario_upload import decode_upload_contents_to_file, replace_scenario_in_db_from_excel, \
+    replace_scenarios_in_db_from_zip, ScenarioUploadResult, ScenarioUploadProgress
+from dse_do_dashboard.utils.scenario_export import iter_all_scenarios_zip, EXPORT_FILE_FORMATS
+from dse_do_dashboard.utils.export_jobs import ExportJob, export_scenario_to_excel, export_scenarios_to_excel_zip
 from dash import dcc, html, Output, Input, State, ALL, MATCH
 import dash_daq as daq
 import dash_bootstrap_components as dbc
 
+EXPORT_SESSION_COOKIE = 'dse_do_dashboard_export_session'  # Id of the browser session that owns the export jobs
+
 
 class HomePageEdit(MainPage):
     """
@@ -99,11 +107,15 @@ class HomePageEdit(MainPage):
             ], # style={'width': '80vw'}
             ),
 
+            html.Div(id='export_jobs_status'),
+            dcc.Store(id='export_jobs_version'),
+            dcc.Interval(id='export_jobs_interval', interval=1000, disabled=not self.has_pending_export_jobs()),  # Enabled while exporting
+
             dbc.Accordion(
                 [
                     dbc.AccordionItem(
                         [
-                            html.P("Download all scenarios in a .zip archive. May take a long time."),
+                            html.P("Download all scenarios in a .zip archive. May take a long time. Runs in the background and shows the progress above."),
                             html.Hr(),
                             dbc.Button(
                                 "Download all scenarios",
@@ -113,6 +125,12 @@ class HomePageEdit(MainPage):
                                 n_clicks=0,
                             ),
                             dcc.Download(id='download_scenarios_download'),
+                            html.Hr(),
+                            html.P("Or download all scenarios as one file per table (with a column scenario_name) in a .zip archive. "
+                                   "Much faster for many scenarios."),
+                            *[html.A(dbc.Button(f"Download all scenarios as {file_format.upper()}", className="mb-3 me-2", color="secondary"),
+                                     href=self.dash_app.app.get_relative_path(f'/download_all_scenarios/{file_format}'))
+                              for file_format in self.get_export_file_formats()],
                         ],
                         title="Download All Scenarios",
                     ),
@@ -140,6 +158,9 @@ class HomePageEdit(MainPage):
                                 # Allow multiple files to be uploaded
                                 multiple=True
                             ),
+                            dcc.Store(id='upload_scenario_id', data=uuid.uuid4().hex),  # Per browser session, keys the upload progress
+                            html.Div(id='upload_scenario_progress'),
+                            dcc.Interval(id='upload_scenario_progress_interval', interval=1000, disabled=True),  # Enabled while uploading
                             html.Div(id='output_data_upload'),
                         ],
                         title="Upload Scenarios",
@@ -318,11 +339,17 @@ class HomePageEdit(MainPage):
         )
         return modal
 
-    def parse_scenario_upload_contents_callback(self, contents, filename, date):
-        """Called for each uploaded scenario"""
+    def parse_scenario_upload_contents_callback(self, contents, filename, date, upload_id: Optional[str] = None):
+        """Called for each uploaded scenario.
+        The upload is spooled to a temporary file and the sheets are inserted in chunks of rows,
+        see `scenario_upload.replace_scenario_in_db_from_excel`.
+        The progress of a zip upload is added to the progress in the Flask cache under the `upload_id`, see `upload_scenarios_callback`.
+
+        Limitation: the `contents` of the dcc.Upload is the whole file as a base64 string, received in memory by the callback,
+        i.e. about 1.33 times the size of the file (plus the request body held by Flask).
+        Only the decoding, the parsing and the DB insert are done in chunks. Very large files need to be imported outside the UI."""
         content_type, content_string = contents.split(',')
         print(f"Upload file. filename={filename}, content_type={content_type}")
-        decoded = base64.b64decode(content_string)
         # root, file_extension = os.path.splitext(filename)
         file_extension = pathlib.Path(filename).suffix
         scenario_name = pathlib.Path(filename).stem
@@ -330,41 +357,27 @@ class HomePageEdit(MainPage):
         print(f"scenario_name = {scenario_name}, extension = {file_extension}")
         try:
             if file_extension == '.xlsx':
-                # pass
-                # Assume that the user uploaded an excel file
-                # df = pd.read_excel(io.BytesIO(decoded))
-                xl = pd.ExcelFile(io.BytesIO(decoded))
-                # Read data from Excel
-                inputs, outputs = ScenarioManager.load_data_from_excel_s(xl)
-                # s = f"inputs = {inputs.keys()}, outputs = {outputs.keys()}"
-                # print(s)
-                print("Input tables: {}".format(", ".join(inputs.keys())))
-                print("Output tables: {}".format(", ".join(outputs.keys())))
-                self.dash_app.dbm.replace_scenario_in_db(scenario_name=scenario_name, inputs=inputs, outputs=outputs)
+                with tempfile.TemporaryDirectory() as tmpdir:
+                    filepath = os.path.join(tmpdir, 'upload.xlsx')
+                    with open(filepath, 'wb') as f:
+                        decode_upload_contents_to_file(content_string, f)
+                    input_table_names, output_table_names = replace_scenario_in_db_from_excel(self.dash_app.dbm, scenario_name, filepath)
+                self.dash_app.invalidate_scenario_tables_cache(scenario_name)
                 child = html.Div([
                     html.P(f"Uploaded scenario: '{scenario_name}' from '{filename}'"),
-                    html.P(f"Input tables: {', '.join(inputs.keys())}"),
-                    html.P(f"Output tables: {', '.join(outputs.keys())}"),
+                    html.P(f"Input tables: {', '.join(input_table_names)}"),
+                    html.P(f"Output tables: {', '.join(output_table_names)}"),
                 ])
                 return child
             elif file_extension == '.zip':
-                zip_file = zipfile.ZipFile(io.BytesIO(decoded))
-                # unzip_results = [html.P(f"Support for zip archives (of .xslx) is pending: {filename}")]
-                unzip_results = []
-                for info in zip_file.infolist():
-                    scenario_name = pathlib.Path(info.filename).stem
-                    file_extension = pathlib.Path(info.filename).suffix
-                    if file_extension == '.xlsx':
-                        print(f"file in zip : {info.filename}")
-                        filecontents = zip_file.read(info)
-                        xl = pd.ExcelFile(filecontents)
-                        inputs, outputs = ScenarioManager.load_data_from_excel_s(xl)
-                        print("Input tables: {}".format(", ".join(inputs.keys())))
-                        print("Output tables: {}".format(", ".join(outputs.keys())))
-                        self.dash_app.dbm.replace_scenario_in_db(scenario_name=scenario_name, inputs=inputs, outputs=outputs)  #
-                        unzip_results.append(html.P(f"Uploaded scenario: '{scenario_name}' from '{info.filename}'"),)
-                    else:
-                        unzip_results.append(html.P(f"File: '{info.filename}' is not a .xlsx. Skipped."),)
+                with tempfile.TemporaryDirectory() as tmpdir:
+                    zip_filepath = os.path.join(tmpdir, 'upload.zip')
+                    with open(zip_filepath, 'wb') as f:
+                        decode_upload_contents_to_file(content_string, f)
+                    results = replace_scenarios_in_db_from_zip(self.dash_app.dbm, zip_filepath, tmpdir,
+                                                               max_workers=self.dash_app.upload_parse_max_workers,
+                                                               progress_callback=lambda result: self._upload_progress_callback(upload_id, result))
+                unzip_results = [self.get_upload_result_child(result) for result in results]
                 child = html.Div(unzip_results)
                 return child
             else:
@@ -377,25 +390,183 @@ class HomePageEdit(MainPage):
 
         return html.P(f"Uploaded scenario {filename}")
 
+    def upload_scenarios_callback(self, list_of_contents, list_of_names, list_of_dates, upload_id: Optional[str]):
+        """Body for the Dash callback that uploads a set of scenarios.
+        Marks the upload as in progress while it runs, see `update_upload_progress_callback`."""
+        self.set_upload_progress(upload_id, ScenarioUploadProgress(True, []))
+        try:
+            return [
+                self.parse_scenario_upload_contents_callback(c, n, d, upload_id) for c, n, d in zip(list_of_contents, list_of_names, list_of_dates)
+            ]
+        finally:
+            self.set_upload_progress(upload_id, ScenarioUploadProgress(False, []))
+
+    def _upload_progress_callback(self, upload_id: Optional[str], result: ScenarioUploadResult):
+        """Called by `replace_scenarios_in_db_from_zip` for each file in the zip when done."""
+        if result.status == 'uploaded':
+            self.dash_app.invalidate_scenario_tables_cache(result.scenario_name)
+        progress = self.get_upload_progress(upload_id)
+        if progress is not None:
+            self.set_upload_progress(upload_id, progress._replace(results=[*progress.results, result]))
+
+    @staticmethod
+    def get_upload_progress_cache_key(upload_id: str) -> str:
+        return f"upload_progress_{upload_id}"
+
+    def get_upload_progress(self, upload_id: Optional[str]) -> Optional[ScenarioUploadProgress]:
+        """Returns the progress of the upload of a browser session. Stored in the Flask cache, so shared between workers."""
+        if upload_id is None:
+            return None
+        return self.dash_app.cache.get(self.get_upload_progress_cache_key(upload_id))
+
+    def set_upload_progress(self, upload_id: Optional[str], progress: Optional[ScenarioUploadProgress]):
+        """Stores the progress of the upload of a browser session. None deletes it."""
+        if upload_id is None:
+            return
+        if progress is None:
+            self.dash_app.cache.delete(self.get_upload_progress_cache_key(upload_id))
+        else:
+            self.dash_app.cache.set(self.get_upload_progress_cache_key(upload_id), progress)
+
+    @staticmethod
+    def get_upload_result_child(result: ScenarioUploadResult):
+        if result.status == 'uploaded':
+            return html.P(f"Uploaded scenario: '{result.scenario_name}' from '{result.filename}'")
+        elif result.status == 'skipped':
+            return html.P(f"File: '{result.filename}' is not a .xlsx. Skipped.")
+        return html.P(f"There was an error processing '{result.filename}': {result.message}")
+
+    def update_upload_progress_callback(self, upload_id: Optional[str], progress_children):
+        """Body for the Dash callback that shows the progress of a zip upload while it runs.
+        Polled by the `upload_scenario_progress_interval`, which is enabled when an upload starts.
+        When the upload has finished, clears the progress and disables the interval.
+
+        :param upload_id: Id of the upload of this browser session, from the `upload_scenario_id` store
+        :return: children of the `upload_scenario_progress` and `disabled` of the interval
+        """
+        progress = self.get_upload_progress(upload_id)
+        if progress is None:  # Upload not started yet on the server
+            raise PreventUpdate
+        if not progress.in_progress:
+            self.set_upload_progress(upload_id, None)
+            return [], True
+        results = progress.results
+        return [html.P(f"Upload in progress: {len(results)} files processed"),
+                *[self.get_upload_result_child(result) for result in results]], dash.no_update
+
+    @staticmethod
+    def get_export_file_formats() -> List[str]:
+        """File formats for the 'Download all scenarios' per table. Parquet only if pyarrow is installed."""
+        return [file_format for file_format in EXPORT_FILE_FORMATS
+                if file_format != 'parquet' or importlib.util.find_spec('pyarrow') is not None]
+
+    def download_all_scenarios_stream_callback(self, file_format: str):
+        """Body for the Flask route that streams a zip of all scenarios with one file per table.
+        See `scenario_export.iter_all_scenarios_zip`."""
+        if file_format not in self.get_export_file_formats():
+            flask.abort(404)
+        print(f"Download all scenarios as {file_format}")
+        return flask.Response(iter_all_scenarios_zip(self.dash_app.dbm, file_format),
+                              mimetype='application/zip',
+                              headers={'Content-Disposition': f'attachment; filename=scenarios_{file_format}.zip'})
+
+    @staticmethod
+    def get_export_session_id(create: bool = False) -> Optional[str]:
+        """Id of the browser session, which owns the export jobs it submits. Kept in a cookie, since the download route is a plain link.
+
+        :param create: If True and the session has no id yet, creates one and sets the cookie on the response of the Dash callback.
+        """
+        if not flask.has_request_context():
+            return None
+        session_id = flask.request.cookies.get(EXPORT_SESSION_COOKIE)
+        if session_id is None and create:
+            session_id = uuid.uuid4().hex
+            dash.callback_context.response.set_cookie(EXPORT_SESSION_COOKIE, session_id, httponly=True, samesite='Lax')
+        return session_id
+
+    def has_pending_export_jobs(self) -> bool:
+        """True if an export job of this browser session is queued or running."""
+        session_id = self.get_export_session_id()
+        return session_id is not None and self.dash_app.export_jobs.has_pending_jobs(session_id)
+
+    @staticmethod
+    def get_export_job_download_data(job: ExportJob):
+        """Data for a dcc.Download if the export job is done, i.e. was served from the cache. Else no update."""
+        if job.status == 'done':
+            return dcc.send_file(job.filepath, filename=job.filename)
+        return dash.no_update
+
+    def update_export_jobs_status_callback(self, version, download_clicked: bool = False):
+        """Body for the Dash callback that shows the progress of the export jobs of this browser session
+        and a link to download the finished ones.
+        Polled by the `export_jobs_interval`, which is only enabled while a job of the session is queued or running.
+        Only sends an update if any job has changed.
+
+        :param download_clicked: If True, triggered by a download button, i.e. a job may be being submitted: keeps polling.
+        :return: children of the `export_jobs_status`, version and `disabled` of the interval
+        """
+        export_jobs = self.dash_app.export_jobs
+        session_id = self.get_export_session_id()
+        disabled = not download_clicked and not self.has_pending_export_jobs()
+        if version == export_jobs.version:
+            return dash.no_update, dash.no_update, disabled
+        version = export_jobs.version
+        rows = []
+        for job in (export_jobs.get_jobs(session_id) if session_id is not None else []):
+            if job.status == 'done':
+                status = html.A(f"Download {job.filename}", href=self.dash_app.app.get_relative_path(f'/download_export/{job.job_id}'))
+            elif job.status == 'error':
+                status = f"Error: {job.message}"
+            else:
+                status = dbc.Progress(value=int(job.progress * 100), label=job.message, style={'height': '1.5rem'})
+            rows.append(html.Tr([html.Td(f"Export {job.description}"), html.Td(job.status), html.Td(status, style={'width': '50%'})]))
+        if len(rows) == 0:
+            return [], version, disabled
+        return dbc.Table(html.Tbody(rows), size='sm'), version, disabled
+
+    def download_export_callback(self, job_id: str):
+        """Body for the Flask route that serves the file of a finished export job of this browser session.
+        Supports HTTP range requests, so an interrupted download can be resumed."""
+        job = self.dash_app.export_jobs.get_job(job_id)
+        if job is None or job.owner is None or job.owner != self.get_export_session_id():
+            flask.abort(404)
+        if job.status != 'done' or not os.path.exists(job.filepath):
+            flask.abort(404)
+        return flask.send_file(job.filepath, as_attachment=True, download_name=job.filename, conditional=True)
+
     def set_dash_callbacks(self):
         app = self.dash_app.app
 
+        @app.server.route(f"{app.config.routes_pathname_prefix}download_all_scenarios/<file_format>")
+        def download_all_scenarios_stream(file_format):
+            return self.download_all_scenarios_stream_callback(file_format)
+
         #############################################################################
         # Scenario operations callbacks
         #############################################################################
         @app.callback(Output('output_data_upload', 'children'),
                       Input('upload_scenario', 'contents'),
                       State('upload_scenario', 'filename'),
-                      State('upload_scenario', 'last_modified'))
-        def update_output(list_of_contents, list_of_names, list_of_dates):
+                      State('upload_scenario', 'last_modified'),
+                      State('upload_scenario_id', 'data'))
+        def update_output(list_of_contents, list_of_names, list_of_dates, upload_id):
             """Supports uploading a set of scenarios"""
             if list_of_contents is not None:
-                children = [
-                    # f"{n}, {d}" for c, n, d in zip(list_of_contents, list_of_names, list_of_dates)
-                    self.parse_scenario_upload_contents_callback(c, n, d) for c, n, d in zip(list_of_contents, list_of_names, list_of_dates)
-                ]
-                return children
-
+                return self.upload_scenarios_callback(list_of_contents, list_of_names, list_of_dates, upload_id)
+
+        @app.callback([Output('upload_scenario_progress', 'children'),
+                       Output('upload_scenario_progress_interval', 'disabled')],
+                      [Input('upload_scenario_progress_interval', 'n_intervals'),
+                       Input('upload_scenario', 'contents')],
+                      State('upload_scenario_id', 'data'),
+                      State('upload_scenario_progress', 'children'),
+                      prevent_initial_call=True)
+        def update_upload_progress(n_intervals, list_of_contents, upload_id, progress_children):
+            """Triggered by the start of an upload (runs concurrently with `update_output`) and by the interval."""
+            triggered_component_id = dash.callback_context.triggered[0]['prop_id'].split('.')[0]
+            if triggered_component_id == 'upload_scenario':
+                return dash.no_update, list_of_contents is None  # Start polling
+            return self.update_upload_progress_callback(upload_id, progress_children)
 
         @app.callback([
             Output('download_scenarios_button', 'n_clicks'),
@@ -406,26 +577,18 @@ class HomePageEdit(MainPage):
         )
         def download_scenarios_callback(n_clicks):
             """Download all scenarios in a zip file.
+            Runs as a background export job. If the (unchanged) scenarios were exported before, downloads immediately.
             TODO: download selected set of scenarios
             """
             print("Download all scenarios")
             scenarios_df = self.dash_app.read_scenarios_table_from_db_cached()
-            data = None
-            with tempfile.TemporaryDirectory() as tmpdir:
-                zip_filepath = os.path.join(tmpdir, 'scenarios.zip')
-                with zipfile.ZipFile(zip_filepath, 'w') as zipMe:
-                    for scenario_name in scenarios_df.index:
-                        print(f"Download scenario {scenario_name}")
-                        inputs, outputs = self.dash_app.dbm.read_scenario_from_db(scenario_name)
-                        filename = f'{scenario_name}.xlsx'
-                        filepath = os.path.join(tmpdir, filename)
-                        with pd.ExcelWriter(filepath) as writer:
-                            ScenarioManager.write_data_to_excel_s(writer, inputs=inputs, outputs=outputs)
-                            writer.save()
-                            zipMe.write(filepath, arcname=filename, compress_type=zipfile.ZIP_DEFLATED)
-                data = dcc.send_file(zip_filepath)
-
-            return 0, data
+            scenario_names = list(scenarios_df.index)
+            key = self.dash_app.get_scenarios_export_key('xlsx_zip', scenario_names)
+            job = self.dash_app.export_jobs.submit(
+                key, 'scenarios.zip', 'All scenarios',
+                lambda filepath, progress_callback: export_scenarios_to_excel_zip(self.dash_app.dbm, scenario_names, filepath, progress_callback),
+                owner=self.get_export_session_id(create=True))
+            return 0, self.get_export_job_download_data(job)
 
         @app.callback([
             Output({'type': 'download_scenario_mi', 'index': MATCH}, 'n_clicks'),
@@ -437,35 +600,34 @@ class HomePageEdit(MainPage):
             )
         def download_scenario_callback(n_clicks, id):
             """We need the `n_clicks` as input. Only the `id` will not be triggered when a user selects the menu option.
-            See https://community.plotly.com/t/excel-writer-to-dcc-download/54132/5 for use of tempfile.TemporaryDirectory()
+            Runs as a background export job. If the (unchanged) scenario was exported before, downloads immediately.
             """
             scenario_name = id['index']
             print(f"Download scenario {scenario_name}")
-            # df = pd.DataFrame({'dropdown_value': [1, 2, 3]})
-            # relative_filename = os.path.join(
-            #     'downloads',
-            #     '{}-download.xlsx'.format(scenario_name)
-            # )
-            # absolute_filename = os.path.join(os.getcwd(), relative_filename)
-            # writer = pd.ExcelWriter(absolute_filename)
-            # df.to_excel(writer, 'Sheet1')
-            # writer.save()
-            # href = './{}'.format(relative_filename)
-
-            multi_threaded = False  # Enabling multi-threading does NOT result in speedup. In fact for small scenarios it is slower!
-            inputs, outputs = self.dash_app.dbm.read_scenario_from_db(scenario_name, multi_threaded)
-            #TODO: inputs include a scenario table. Remove.
-
-            data = None
-            with tempfile.TemporaryDirectory() as tmpdir:
-                filename = f'{scenario_name}.xlsx'
-                filepath = os.path.join(tmpdir, filename)
-                with pd.ExcelWriter(filepath) as writer:
-                    ScenarioManager.write_data_to_excel_s(writer, inputs=inputs, outputs=outputs)
-                    writer.save()
-                    data = dcc.send_file(filepath)
-
-            return 0, data
+            key = self.dash_app.get_scenarios_export_key('xlsx', [scenario_name])
+            job = self.dash_app.export_jobs.submit(
+                key, f'{scenario_name}.xlsx', f"Scenario '{scenario_name}'",
+                lambda filepath, progress_callback: export_scenario_to_excel(self.dash_app.dbm, scenario_name, filepath, progress_callback),
+                owner=self.get_export_session_id(create=True))
+            return 0, self.get_export_job_download_data(job)
+
+        @app.callback([Output('export_jobs_status', 'children'),
+                       Output('export_jobs_version', 'data'),
+                       Output('export_jobs_interval', 'disabled')],
+                      [Input('export_jobs_interval', 'n_intervals'),
+                       Input('download_scenarios_button', 'n_clicks'),
+                       Input({'type': 'download_scenario_mi', 'index': ALL}, 'n_clicks')],
+                      State('export_jobs_version', 'data'))
+        def update_export_jobs_status(n_intervals, download_scenarios_n_clicks, download_scenario_n_clicks, version):
+            """Also triggered by the download buttons, to start polling, and again when their callback resets the n_clicks."""
+            triggered_component_id = dash.callback_context.triggered[0]['prop_id'].split('.')[0] if dash.callback_context.triggered else ''
+            download_clicked = triggered_component_id != 'export_jobs_interval' and (
+                    bool(download_scenarios_n_clicks) or any(download_scenario_n_clicks or []))
+            return self.update_export_jobs_status_callback(version, download_clicked)
+
+        @app.server.route(f"{app.config.routes_pathname_prefix}download_export/<job_id>")
+        def download_export(job_id):
+            return self.download_export_callback(job_id)
 
         # @app.server.route('/downloads/<path:path>')
         # def serve_static(path):
@@ -506,6 +668,7 @@ class HomePageEdit(MainPage):
                 if ctx_type == 'delete_scenario_modal_rename':
                     print(f"Deleting scenario from {current_scenario_name}")
                     self.dash_app.dbm.delete_scenario_from_db(current_scenario_name)
+                    self.dash_app.invalidate_scenario_tables_cache(current_scenario_name)
 
                 return not is_open
             return is_open
@@ -543,6 +706,7 @@ class HomePageEdit(MainPage):
                     if new_scenario_name != current_scenario_name:
                         print(f"Duplicating scenario from {current_scenario_name} to {new_scenario_name}")
                         self.dash_app.dbm.duplicate_scenario_in_db(current_scenario_name, new_scenario_name)
+                        self.dash_app.invalidate_scenario_tables_cache(new_scenario_name)
 
                 return not is_open
             return is_open
@@ -581,6 +745,8 @@ class HomePageEdit(MainPage):
                     if new_scenario_name != current_scenario_name:
                         print(f"Renaming scenario from {current_scenario_name} to {new_scenario_name}")
                         self.dash_app.dbm.rename_scenario_in_db(current_scenario_name, new_scenario_name)
+                        self.dash_app.invalidate_scenario_tables_cache(current_scenario_name)
+                        self.dash_app.invalidate_scenario_tables_cache(new_scenario_name)
 
                 return not is_open
             return is_open
@@ -11,7 +11,7 @@ from dash import dcc, html
 import dash_bootstrap_components as dbc
 import pprint
 
-from dse_do_dashboard.utils.dash_common_utils import get_data_table_card_children, get_pivot_table_card_children
+from dse_do_dashboard.utils.dash_common_utils import get_data_table_card_children, get_data_table_page
 
 
 class PrepareDataPage(MainPage):
@@ -19,6 +19,7 @@ class PrepareDataPage(MainPage):
                  page_name: str = 'Prepare Data',
                  page_id: str = 'prepare-data',
                  url: str = 'prepare-data'):
+        self.data_table_id = 'input_data_table'
         super().__init__(dash_app,
                          page_name=page_name,
                          page_id=page_id,
@@ -73,8 +74,12 @@ class PrepareDataPage(MainPage):
         return card
 
     def get_pivot_table_card(self):
+        """Pivot table card. Collapsed by default: the PivotTable is only created when the card is opened."""
         card = dbc.Card([
-            dbc.CardBody(id='input_pivot_table_card', style={'width': '79vw'}),
+            dbc.CardHeader(dbc.Button('Pivot Table', id='input_pivot_table_toggle', color='link', n_clicks=0)),
+            dbc.Collapse(
+                dbc.CardBody(id='input_pivot_table_card', style={'width': '79vw'}),
+                id='input_pivot_table_collapse', is_open=False),
             html.Div(id="input_pivot_table_div"),
         ], style={'width': '80vw'})
         return card
@@ -97,18 +102,81 @@ class PrepareDataPage(MainPage):
 
         """
         # print(f"update_data_and_pivot_input_table for {table_name} in {scenario_name}")
+        data_table_children = self.update_data_input_table_callback(scenario_name, table_name)
+        pivot_table_children = self.update_pivot_input_table_callback(scenario_name, table_name, is_open=True)
+        return data_table_children, pivot_table_children
+
+    def update_data_input_table_callback(self, scenario_name: str, table_name: Optional[str]):
+        """Body for the Dash callback that updates the data table card."""
         if table_name is None:
             # In case there are no input tables (rare)
             raise PreventUpdate
+        df = self.get_input_table_df(scenario_name, table_name)
+        table_schema = self.dash_app.get_table_schema(table_name)
+        data_table_children = get_data_table_card_children(df, table_name, table_schema, editable=True, data_table_id=self.data_table_id,
+                                                           page_size=self.dash_app.data_table_page_size)
+        return data_table_children
+
+    def update_pivot_input_table_callback(self, scenario_name: str, table_name: Optional[str], is_open: bool):
+        """Body for the Dash callback that updates the pivot table card.
+        Only creates the PivotTable if the card is open. The result is cached, see `DoDashApp.get_pivot_table_card_children_cached`."""
+        if table_name is None:
+            raise PreventUpdate
+        if not is_open:
+            return []  # Removes the (large) PivotTable data from the browser
+        return self.dash_app.get_pivot_table_card_children_cached(scenario_name, table_name,
+                                                                  lambda: self.get_input_table_df(scenario_name, table_name))
+
+    def get_input_table_df(self, scenario_name: str, table_name: str) -> pd.DataFrame:
         input_table_names = [table_name]
         pm = self.dash_app.get_plotly_manager(scenario_name, input_table_names, [])
         dm = pm.dm
-        df = self.dash_app.get_table_by_name(dm=dm, table_name=table_name, index=False, expand=False)
-        table_schema = self.dash_app.get_table_schema(table_name)
-        pivot_table_config = self.dash_app.get_pivot_table_config(table_name)
-        data_table_children = get_data_table_card_children(df, table_name, table_schema, editable=True)
-        pivot_table_children = get_pivot_table_card_children(df, scenario_name, table_name, pivot_table_config)
-        return data_table_children, pivot_table_children
+        return self.dash_app.get_table_by_name(dm=dm, table_name=table_name, index=False, expand=False)
+
+    def update_data_table_page_callback(self, page_current, page_size, sort_by, filter_query, scenario_name, table_name: Optional[str]):
+        """Body for the Dash callback of the DataTable with server-side paging, sorting and filtering.
+        Only used if `dash_app.data_table_page_size` is not None."""
+        if table_name is None:
+            raise PreventUpdate
+        df = self.get_input_table_df(scenario_name, table_name)
+        return get_data_table_page(df, page_current, page_size, sort_by, filter_query)
+
+    def set_pivot_table_callbacks(self):
+        """Registers the callbacks to open/close the pivot table card and to (lazily) create the PivotTable."""
+        app = self.dash_app.app
+
+        @app.callback(Output('input_pivot_table_collapse', 'is_open'),
+                      Input('input_pivot_table_toggle', 'n_clicks'),
+                      State('input_pivot_table_collapse', 'is_open'),
+                      prevent_initial_call=True)
+        def toggle_input_pivot_table(n_clicks, is_open):
+            return not is_open
+
+        @app.callback(Output('input_pivot_table_card', 'children'),
+                      [Input('input_pivot_table_collapse', 'is_open'),
+                       Input('top_menu_scenarios_drpdwn', 'value'),
+                       Input('input_table_drpdwn', 'value')])
+        def update_pivot_input_table(is_open: bool, scenario_name: str, table_name: str):
+            return self.update_pivot_input_table_callback(scenario_name, table_name, is_open)
+
+    def set_data_table_page_callback(self):
+        """Registers the callback for server-side paging, sorting and filtering of the DataTable, if enabled."""
+        if self.dash_app.data_table_page_size is None:
+            return
+        app = self.dash_app.app
+
+        @app.callback([Output(self.data_table_id, 'data'),
+                       Output(self.data_table_id, 'page_count')],
+                      [Input(self.data_table_id, 'page_current'),
+                       Input(self.data_table_id, 'page_size'),
+                       Input(self.data_table_id, 'sort_by'),
+                       Input(self.data_table_id, 'filter_query')],
+                      [State('top_menu_scenarios_drpdwn', 'value'),
+                       State('input_table_drpdwn', 'value')],
+                      prevent_initial_call=True)
+        def update_input_data_table_page(page_current, page_size, sort_by, filter_query, scenario_name, table_name):
+            data, page_count = self.update_data_table_page_callback(page_current, page_size, sort_by, filter_query, scenario_name, table_name)
+            return [data, page_count]
 
     def set_dash_callbacks(self):
         """Define Dash callbacks for this page
@@ -118,11 +186,11 @@ class PrepareDataPage(MainPage):
         """
         app = self.dash_app.app
 
-        @app.callback([Output('input_data_table_card', 'children'),
-                       Output('input_pivot_table_card', 'children')],
+        @app.callback(Output('input_data_table_card', 'children'),
                       [Input('top_menu_scenarios_drpdwn', 'value'),
                        Input('input_table_drpdwn', 'value')])
-        def update_data_and_pivot_input_table(scenario_name:str, table_name:str):
-            data_table_children, pivot_table_children = self.update_data_and_pivot_input_table_callback(scenario_name, table_name)
-            return [data_table_children, pivot_table_children]
+        def update_data_input_table(scenario_name:str, table_name:str):
+            return self.update_data_input_table_callback(scenario_name, table_name)
 
+        self.set_pivot_table_callbacks()
+        self.set_data_table_page_callback()
@@ -16,8 +16,8 @@ import pprint
 from dash import dash_table
 
 from dse_do_dashboard.main_pages.prepare_data_page import PrepareDataPage
-from dse_do_dashboard.utils.dash_common_utils import get_data_table_card_children, get_pivot_table_card_children, \
-    diff_dashtable_mi, ScenarioTableSchema, table_type
+from dse_do_dashboard.utils.dash_common_utils import get_data_table_card_children, \
+    diff_dashtable_mi, ScenarioTableSchema, table_type, get_data_table_server_side_props, apply_dashtable_diffs, get_data_table_page
 from dse_do_dashboard.utils.scenariodbmanager_update import DbCellUpdate
 
 
@@ -71,32 +71,38 @@ class PrepareDataPageEdit(PrepareDataPage):
         TODO: share parts with parent
         """
         # print(f"update_data_and_pivot_input_table for {table_name} in {scenario_name}")
-        input_table_names = [table_name]
-        pm = self.dash_app.get_plotly_manager(scenario_name, input_table_names, [])
-        dm = pm.dm
-        df = self.dash_app.get_table_by_name(dm=dm, table_name=table_name, index=False, expand=False)
-        table_schema = self.dash_app.get_table_schema(table_name)
-        pivot_table_config = self.dash_app.get_pivot_table_config(table_name)
-        data_table_children = self.get_data_table_card_children(df, table_name, table_schema, editable=True, data_table_id=self.data_table_id, diff_store_data=diff_store_data)
-        pivot_table_children = get_pivot_table_card_children(df, scenario_name, table_name, pivot_table_config)
+        data_table_children = self.update_data_input_table_callback(scenario_name, table_name, diff_store_data)
+        pivot_table_children = self.update_pivot_input_table_callback(scenario_name, table_name, is_open=True)
         return data_table_children, pivot_table_children
 
+    def update_data_input_table_callback(self, scenario_name, table_name, diff_store_data=None):
+        """Body for the Dash callback that updates the (editable) data table card.
+        Shows the edits that are not yet committed (see `apply_dashtable_diffs`)."""
+        df = apply_dashtable_diffs(self.get_input_table_df(scenario_name, table_name), diff_store_data, scenario_name, table_name)
+        table_schema = self.dash_app.get_table_schema(table_name)
+        data_table_children = self.get_data_table_card_children(df, table_name, table_schema, editable=True, data_table_id=self.data_table_id, diff_store_data=diff_store_data,
+                                                                page_size=self.dash_app.data_table_page_size)
+        return data_table_children
+
     def get_data_table_card_children(self, df, table_name:str, table_schema: Optional[ScenarioTableSchema] = None,
-                                     editable: bool = False, data_table_id:str=None, diff_store_data=None):
+                                     editable: bool = False, data_table_id:str=None, diff_store_data=None, page_size: Optional[int] = None):
         return [
             dbc.CardHeader(
                 table_name
                 # title=table_name,
                 # fullscreen=True
             ),
-            self.get_data_table(df, table_schema, editable, data_table_id, diff_store_data)
+            self.get_data_table(df, table_schema, editable, data_table_id, diff_store_data, page_size)
         ]
 
-    def get_data_table(self, df, table_schema: Optional[ScenarioTableSchema] = None, editable: bool = False, data_table_id=None, diff_store_data=None) -> dash_table.DataTable:
+    def get_data_table(self, df, table_schema: Optional[ScenarioTableSchema] = None, editable: bool = False, data_table_id=None, diff_store_data=None,
+                       page_size: Optional[int] = None) -> dash_table.DataTable:
         """
         Generates a DataTable for a DataFrame. For use in 'Prepare Data' and 'Explore Solution' pages.
         :param df:
         :param table_schema:
+        :param page_size: If not None, uses server-side paging, sorting and filtering with this page size.
+        Edits of cells that are not yet committed are carried across pages, see `update_data_table_page_callback`.
         :return:
         """
         if data_table_id is None:
@@ -109,18 +115,15 @@ class PrepareDataPageEdit(PrepareDataPage):
             index_columns = table_schema.index_columns
         return dash_table.DataTable(
             id=data_table_id,
-            data=df.to_dict('records'),
             columns=[
                 {'name': i, 'id': i, 'type': table_type(df[i])}
                 for i in df.columns
             ],
             fixed_rows={'headers': True},
             editable=editable,
-            virtualization=True,
             # fixed_columns={'headers': False, 'data': 0}, # Does NOT create a horizontal scroll bar
-            filter_action="native",
-            sort_action="native",
             sort_mode="multi",
+            **get_data_table_server_side_props(df, page_size),
             style_cell={
                 'textOverflow': 'ellipsis',  # See https://dash.plotly.com/datatable/width to control column-name width
                 'maxWidth': 0,               # Needs to be here for the 'ellipsis' option to work
@@ -205,6 +208,36 @@ class PrepareDataPageEdit(PrepareDataPage):
                 db_cell_updates.append(db_cell_update)
         return db_cell_updates
 
+    def update_data_table_page_callback(self, page_current, page_size, sort_by, filter_query, scenario_name, table_name: Optional[str],
+                                        diff_store_data=None):
+        """Body for the Dash callback of the DataTable with server-side paging, sorting and filtering.
+        Applies the edits in the diff store that are not yet committed, so they show on every page (and in sorting and filtering)."""
+        if table_name is None:
+            raise PreventUpdate
+        df = apply_dashtable_diffs(self.get_input_table_df(scenario_name, table_name), diff_store_data, scenario_name, table_name)
+        return get_data_table_page(df, page_current, page_size, sort_by, filter_query)
+
+    def set_data_table_page_callback(self):
+        """Like `PrepareDataPage.set_data_table_page_callback`, with the diff store as state."""
+        if self.dash_app.data_table_page_size is None:
+            return
+        app = self.dash_app.app
+
+        @app.callback([Output(self.data_table_id, 'data'),
+                       Output(self.data_table_id, 'page_count')],
+                      [Input(self.data_table_id, 'page_current'),
+                       Input(self.data_table_id, 'page_size'),
+                       Input(self.data_table_id, 'sort_by'),
+                       Input(self.data_table_id, 'filter_query')],
+                      [State('top_menu_scenarios_drpdwn', 'value'),
+                       State('input_table_drpdwn', 'value'),
+                       State("my_data_table_diff_store", "data")],
+                      prevent_initial_call=True)
+        def update_input_data_table_page(page_current, page_size, sort_by, filter_query, scenario_name, table_name, diff_store_data):
+            data, page_count = self.update_data_table_page_callback(page_current, page_size, sort_by, filter_query, scenario_name, table_name,
+                                                                    diff_store_data)
+            return [data, page_count]
+
     def capture_diffs_callback(self, ts, data, data_previous, diff_store_data, table_name: str, scenario_name: str):
         """Capture diffs and store in my_data_table_diff_store."""
         if ts is None:
@@ -233,7 +266,7 @@ class PrepareDataPageEdit(PrepareDataPage):
             output = "No Changes to DataTable"
 
         db_cell_updates = self.get_db_cell_updates(diff_store_data)
-        self.dash_app.dbm.update_cell_changes_in_db(db_cell_updates)
+        self.dash_app.update_cell_changes_in_db(db_cell_updates)  # Also invalidates the cache of the touched tables
 
         return output
 
@@ -247,14 +280,14 @@ class PrepareDataPageEdit(PrepareDataPage):
         # super().set_dash_callbacks()
         app = self.dash_app.app
 
-        @app.callback([Output('input_data_table_card', 'children'),
-                       Output('input_pivot_table_card', 'children')],
+        @app.callback(Output('input_data_table_card', 'children'),
                       [Input('top_menu_scenarios_drpdwn', 'value'),
                        Input('input_table_drpdwn', 'value')],
                       State("my_data_table_diff_store", "data"))
-        def update_data_and_pivot_input_table_edit(scenario_name:str, table_name:str, diff_store_data):
-            data_table_children, pivot_table_children = self.update_data_and_pivot_input_table_callback(scenario_name, table_name, diff_store_data)
-            return [data_table_children, pivot_table_children]
+        def update_data_input_table_edit(scenario_name:str, table_name:str, diff_store_data):
+            return self.update_data_input_table_callback(scenario_name, table_name, diff_store_data)
+
+        self.set_pivot_table_callbacks()
 
         @app.callback([Output('commit_changes_button', 'style'),
                        Output('commit_changes_button', 'children')
@@ -334,6 +367,8 @@ class PrepareDataPageEdit(PrepareDataPage):
 
             return diff_store_data, commit_button_disabled
 
+        self.set_data_table_page_callback()
+
 
         # @app.callback(
         #     [Output("my_data_table_diff_store", "data"),
@@ -3,13 +3,14 @@ from typing import List, Dict
 
 import pandas as pd
 import dash
-from dash import dcc, html, Output, Input, State, dash_table
+from dash import dcc, html, Output, Input, State, dash_table, Patch
 import dash_bootstrap_components as dbc
 from dash.exceptions import PreventUpdate
 
 
 from dse_do_dashboard.main_pages.main_page import MainPage
 from dse_do_dashboard.utils.domodelrunner import DoModelRunnerConfig
+from dse_do_dashboard.utils.job_scheduler import JOB_FINAL_STATUSES
 
 
 class RunModelPage(MainPage):
@@ -60,15 +61,41 @@ class RunModelPage(MainPage):
                          # 'background-color': '#FF4136'
                          }),
             dbc.Button('Run Model inline', id='run_model_inline', n_clicks=0, color="primary", className="me-1"),
+            dbc.Button('Run Model in background', id='run_model_job', n_clicks=0, color="primary", className="me-1"),
             dbc.Button('Run Model LRC', id='run_model_lrc', n_clicks=0, color="primary", className="me-1", disabled=(not self.dash_app.enable_long_running_callbacks)),
             dbc.Button('Update JobQueue', id='refresh_queue_inline', n_clicks=0, color="primary", className="me-1"),
+            dbc.Button('Cancel selected jobs', id='cancel_jobs', n_clicks=0, color="secondary", className="me-1"),
+            html.Div(id='job_message'),
+            dcc.Interval(id='job_queue_interval', interval=2000),
 
             # html.H1("------------------------"),
             dbc.Card([
-                dbc.CardHeader('Job Queue (in-line)'),
+                dbc.CardHeader('Job Queue'),
                 dbc.CardBody(
                     children=[
-                        self.get_job_queue_data_table(id = 'job_queue_table_inline'),
+                        self.get_job_queue_data_table(id = 'job_queue_table_inline', row_selectable='multi'),
+                    ]
+                ),
+            ]),
+            dbc.Card([
+                dbc.CardHeader('Job Progress (selected job)'),
+                dbc.CardBody(
+                    children=[
+                        html.Div(id='job_progress'),
+                        dcc.Store(id='job_progress_store'),
+                    ]
+                ),
+            ]),
+            dbc.Card([
+                dbc.CardHeader('Job Log (selected job)'),
+                dbc.CardBody(
+                    children=[
+                        dcc.Textarea(id='log_job',
+                                     value='',
+                                     readOnly =True,
+                                     style={'width': '100%', 'height': 200},
+                                     ),
+                        dcc.Store(id='log_job_cursor'),
                     ]
                 ),
             ]),
@@ -147,7 +174,7 @@ class RunModelPage(MainPage):
             print(f"Runner class = {runner_class}")
             runner = runner_class(scenario_name, dash_app=self.dash_app)
             # runner = FruitClassRunner(scenario_name)
-            runner.run()
+            self.dash_app.job_scheduler.run_inline(do_model_class_name, runner)
             # time.sleep(4)
 
             log = f"Run {do_model_class_name} with scenario {scenario_name}\n" \
@@ -172,11 +199,52 @@ class RunModelPage(MainPage):
             return data
 
         @app.callback(Output('job_queue_table_inline', 'data'),
-                      Input('refresh_queue_inline', 'n_clicks'),
+                      [Input('refresh_queue_inline', 'n_clicks'),
+                       Input('job_queue_interval', 'n_intervals'),
+                       Input('job_message', 'children')],
                       )
-        def refresh_job_queue_inline(n_clicks):
+        def refresh_job_queue_inline(n_clicks, n_intervals, job_message):
             return self.get_job_queue_data()
 
+        @app.callback(Output('job_message', 'children'),
+                      [Input('run_model_job', 'n_clicks'),
+                       Input('cancel_jobs', 'n_clicks')],
+                      [State('top_menu_scenarios_drpdwn', 'value'),
+                       State('do_model_class_drpdwn', 'value'),
+                       State('job_queue_table_inline', 'selected_row_ids')],
+                      prevent_initial_call=True,
+                      )
+        def submit_or_cancel_job(run_n_clicks, cancel_n_clicks, scenario_name: str, do_model_class_name: str, selected_job_ids):
+            if dash.callback_context.triggered_id == 'cancel_jobs':
+                return self.cancel_jobs_callback(selected_job_ids)
+            return self.submit_job_callback(scenario_name, do_model_class_name)
+
+        @app.callback([Output('log_job', 'value'),
+                       Output('log_job_cursor', 'data')],
+                      [Input('job_queue_table_inline', 'selected_row_ids'),
+                       Input('job_queue_interval', 'n_intervals')],
+                      [State('log_job_cursor', 'data')],
+                      )
+        def update_job_log(selected_job_ids, n_intervals, cursor):
+            return self.update_job_log_callback(selected_job_ids, cursor)
+
+        @app.callback(Output('job_progress_store', 'data'),
+                      [Input('job_queue_table_inline', 'selected_row_ids'),
+                       Input('job_queue_interval', 'n_intervals')],
+                      [State('job_progress_store', 'data')],
+                      )
+        def update_job_progress_store(selected_job_ids, n_intervals, data):
+            progress = self.dash_app.job_scheduler.get_job_progress(selected_job_ids[0]) if selected_job_ids else None
+            if progress == data:
+                raise PreventUpdate
+            return progress
+
+        @app.callback(Output('job_progress', 'children'),
+                      [Input('job_progress_store', 'data')],
+                      )
+        def update_job_progress(data):
+            return self.get_job_progress_children(data)
+
 
         @app.callback(Output('lrc_job_trigger_store', 'data'),
                       Input('run_model_lrc', 'n_clicks'),
@@ -208,16 +276,93 @@ class RunModelPage(MainPage):
                 raise PreventUpdate
             return data
 
+    def submit_job_callback(self, scenario_name: str, do_model_class_name: str):
+        """Adds a model run to the queue of the DoModelJobScheduler."""
+        if do_model_class_name == 'None' or scenario_name is None:
+            raise PreventUpdate
+        job_id = self.dash_app.job_scheduler.submit(do_model_class_name, scenario_name)
+        return f"Job {job_id} queued: {do_model_class_name} with scenario {scenario_name}"
+
+    def cancel_jobs_callback(self, job_ids: List[str]):
+        """Cancels the selected queued or running jobs."""
+        if not job_ids:
+            raise PreventUpdate
+        cancelled = [job_id for job_id in job_ids if self.dash_app.job_scheduler.cancel(job_id)]
+        return f"Cancelled {len(cancelled)} job(s)"
+
+    def update_job_log_callback(self, job_ids: List[str], cursor: Dict):
+        """Updates the log of the first selected job.
+        While the job runs, only appends the new log lines (see `DoModelJobScheduler.get_job_log_lines`).
+        The cursor keeps the job_id and the number of the next log line, or 'final' once the complete log of a finished job is shown."""
+        if not job_ids:
+            return "", None
+        job_id = job_ids[0]
+        if cursor is not None and cursor['job_id'] == job_id and cursor.get('final', False):
+            raise PreventUpdate
+        job = self.dash_app.job_scheduler.get_job(job_id)
+        log_lines = self.dash_app.job_scheduler.get_job_log_lines(job_id, cursor['next'] if cursor is not None and cursor['job_id'] == job_id else 0)
+        if job is None or job['status'] in JOB_FINAL_STATUSES or log_lines is None:
+            final = job is None or job['status'] in JOB_FINAL_STATUSES
+            return self.get_job_log(job_ids), {'job_id': job_id, 'final': final, 'next': 0}
+        lines, next_line = log_lines
+        if cursor is None or cursor['job_id'] != job_id:
+            header = f"Run {job['runner_id']} with scenario {job['scenario_name']}: {job['status']}\n" \
+                     "Log: \n"
+            return header + "".join(lines), {'job_id': job_id, 'final': False, 'next': next_line}
+        if len(lines) == 0:
+            raise PreventUpdate
+        log = Patch()
+        log.__iadd__("".join(lines))  # Appends to the text in the browser. Note `log += ...` would re-bind `log` for a Patch at the root
+        return log, {'job_id': job_id, 'final': False, 'next': next_line}
+
+    def get_job_progress_children(self, progress: Dict):
+        """Renders a `RunProgress.to_dict()`: duration per phase, row counts, solver progress and peak memory."""
+        if progress is None:
+            return html.Div("No progress available")
+        rows = []
+        phases = [f"{phase['name']} {phase['duration']:.1f}s{' (running)' if phase['running'] else ''}" for phase in progress['phases']]
+        total_duration = sum(phase['duration'] for phase in progress['phases'])
+        rows.append(('Phases', f"{' | '.join(phases)} (total {total_duration:.1f}s)"))
+        for category, row_counts in progress['row_counts'].items():
+            rows.append((f"Rows {category}", f"{sum(row_counts.values()):,} in {len(row_counts)} tables: " +
+                         ", ".join(f"{table_name} {row_count:,}" for table_name, row_count in row_counts.items())))
+        solver = progress['solver']
+        if len(solver) > 0:
+            values = [f"objective {solver['objective']:,.4g}" if solver['objective'] is not None else "no solution yet",
+                      f"best bound {solver['best_bound']:,.4g}" if solver['best_bound'] is not None else None,
+                      f"gap {solver['gap']:.2%}" if solver['gap'] is not None else None,
+                      f"at {solver['solve_time']:.1f}s" if solver['solve_time'] is not None else None,
+                      f"{solver['updates']} updates"]
+            rows.append(('Solver', ", ".join(value for value in values if value is not None)))
+        if progress['memory_mb'] is not None:
+            rows.append(('Peak memory', f"{progress['memory_mb']:,.0f} MB"))
+        return dbc.Table(html.Tbody([html.Tr([html.Th(label), html.Td(value)]) for label, value in rows]),
+                         size='sm', bordered=False, style={'fontSize': '12px'})
+
+    def get_job_log(self, job_ids: List[str]) -> str:
+        """Log (or error message) of the first selected job."""
+        if not job_ids:
+            return ""
+        job = self.dash_app.job_scheduler.get_job(job_ids[0])
+        if job is None:
+            return ""
+        return f"Run {job['runner_id']} with scenario {job['scenario_name']}: {job['status']}\n" \
+               f"{job['message'] or ''}\n" \
+               "Log: \n" \
+               f"{job['log'] or ''}"
+
     def get_job_queue_data(self) -> List[Dict]:
-        """Return a List[Dict] with job DoModelRunner queue data.
-        As in df.to_dict('records')
+        """Return a List[Dict] with the jobs of the DoModelJobScheduler, most recent first.
+        As in df.to_dict('records'). The 'id' is the job_id (i.e. the DataTable row id).
         """
         rows = []
-        for job in self.dash_app.job_queue:
-            row = {'id' : job.id,
-                   'model': job.__class__.__name__,
-                   'scenario' : job.scenario_name,
-                   'run_status' : job.run_status}
+        for job in self.dash_app.job_scheduler.get_jobs():
+            row = {'id' : job['job_id'],
+                   'model': job['runner_id'],
+                   'scenario' : job['scenario_name'],
+                   'status': job['status'],
+                   'run_status' : job['run_status'],
+                   'submitted': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(job['submit_time']))}
             rows.append(row)
         # if len(rows) > 0:
         #     df = pd.DataFrame(rows)
@@ -225,13 +370,16 @@ class RunModelPage(MainPage):
         #     df = pd.DataFrame(columns=['id', 'runner_class', 'scenario_name', 'run_status'])
         return rows
 
-    def get_job_queue_data_table(self, id: str) -> dash_table.DataTable:
+    def get_job_queue_data_table(self, id: str, row_selectable=False) -> dash_table.DataTable:
         return dash_table.DataTable(
             id=id,
             columns=[{'name': 'scenario', 'id': 'scenario'},
                      {'name': 'model', 'id': 'model'},
-                     {'name': 'run_status', 'id': 'run_status'}
+                     {'name': 'status', 'id': 'status'},
+                     {'name': 'run_status', 'id': 'run_status'},
+                     {'name': 'submitted', 'id': 'submitted'},
                      ],
+            row_selectable=row_selectable,
             fixed_rows={'headers': True},
             editable=True,
             # fixed_columns={'headers': False, 'data': 0}, # Does NOT create a horizontal scroll bar
@@ -1,7 +1,7 @@
 # Copyright IBM All Rights Reserved.
 # SPDX-License-Identifier: Apache-2.0
 
-from typing import Dict, List
+from typing import List, Optional
 
 from dse_do_dashboard.main_pages.main_page import MainPage
 from dash import dcc, html, Output, Input, State
@@ -58,9 +58,8 @@ class VisualizationTabsPage(MainPage):
 
         """
         print(f"get_visualization_tab_layout_callback for {page_id}")
-        visualization_pages_dict: Dict[str, VisualizationPage] = {vp.page_id: vp for vp in self.dash_app.visualization_pages}
-        if page_id in visualization_pages_dict:
-            vp = visualization_pages_dict[page_id]
+        vp: Optional[VisualizationPage] = self.dash_app.get_visualization_page(page_id)  # Imports the page on first use
+        if vp is not None:
             try:
                 print(f"Getting layout for {page_id}")
                 # tab_layout = getattr(sys.modules[f"visualization_pages.{vp.module_name}"], 'layout')
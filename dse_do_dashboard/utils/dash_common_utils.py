@@ -4,7 +4,10 @@
 """
 Common functions for generating Dash components
 """
-from typing import Optional, NamedTuple, List, Dict
+import math
+import re
+from typing import Optional, NamedTuple, List, Dict, Any, Tuple
+import numpy as np
 import pandas as pd
 
 import dash_bootstrap_components as l
@@ -41,6 +44,27 @@ class PivotTableConfig(NamedTuple):
     rendererName: str
     aggregatorName: str
 
+
+class ScenarioTableChangeToken(NamedTuple):
+    """Version of the data of one table in one scenario.
+    If the token changes, any cached data of that scenario table is stale."""
+    db_stamp: Optional[tuple]  # Row count and aggregates of the table in the DB, see DoDashApp.get_change_stamp_aggregates. None if unknown.
+    last_modified: float  # time.time() of the last change detected or made by the app. 0 if unknown.
+
+
+class PlotlyManagerCacheKey(NamedTuple):
+    """Identifies a prepared PlotlyManager (and its DataManagers) in the DoDashApp.plotly_manager_cache."""
+    scenario_name: str
+    input_table_names: tuple
+    output_table_names: tuple
+    reference_scenario_name: Optional[str]
+    multi_scenario_names: Optional[tuple]
+    data_version: tuple  # The ScenarioTableChangeTokens of all scenario tables involved
+
+    def includes_scenario(self, scenario_name: str) -> bool:
+        return (scenario_name == self.scenario_name or scenario_name == self.reference_scenario_name
+                or scenario_name in (self.multi_scenario_names or ()))
+
 ##########################################################################
 #  VisualizationPage classes
 ##########################################################################
@@ -82,11 +106,143 @@ def table_type(df_column):
         return 'any'
 
 
-def get_data_table(df, table_schema: Optional[ScenarioTableSchema] = None, editable: bool = False, data_table_id=None) -> dash_table.DataTable:
+##########################################################################
+#  Server-side paging, sorting and filtering of a DataTable
+##########################################################################
+# Operators of the DataTable filter query. Optional prefix 'i' (case-insensitive) or 's' (case-sensitive)
+_FILTER_PART_REGEX = re.compile(
+    r"^\s*\{(?P<column>[^}]+)\}\s+(?P<case>[is]?)(?P<operator>contains|datestartswith|eq|ne|lt|le|gt|ge|=|!=|<=|>=|<|>)\s+(?P<value>.+?)\s*$")
+_FILTER_OPERATOR_SYMBOLS = {'=': 'eq', '!=': 'ne', '<': 'lt', '<=': 'le', '>': 'gt', '>=': 'ge'}
+
+
+def split_filter_part(filter_part: str) -> Tuple[Optional[str], Optional[str], Any]:
+    """Parses one part of a DataTable `filter_query`, e.g. `{price} > 10` or `{name} icontains "abc"`.
+
+    :param filter_part: one part of the filter query, i.e. split on ' && '
+    :returns (column, operator, value): operator is one of 'eq', 'ne', 'lt', 'le', 'gt', 'ge', 'contains', 'icontains', 'datestartswith', etc.
+    Value is a float if it can be parsed as a number and is not quoted. (None, None, None) if it cannot be parsed.
+    """
+    m = _FILTER_PART_REGEX.match(filter_part)
+    if m is None:
+        return None, None, None
+    operator = _FILTER_OPERATOR_SYMBOLS.get(m.group('operator'), m.group('operator'))
+    if m.group('case') == 'i':
+        operator = 'i' + operator
+    value_part = m.group('value')
+    v0 = value_part[0]
+    if len(value_part) > 1 and v0 == value_part[-1] and v0 in ("'", '"', '`'):
+        value = value_part[1:-1].replace('\\' + v0, v0)
+    else:
+        try:
+            value = float(value_part)
+        except ValueError:
+            value = value_part
+    return m.group('column'), operator, value
+
+
+def filter_dataframe(df: pd.DataFrame, filter_query: Optional[str]) -> pd.DataFrame:
+    """Applies a DataTable `filter_query` to a DataFrame using vectorized pandas operations.
+    Parts of the query that cannot be parsed, or refer to unknown columns, are ignored.
+
+    :param df: DataFrame
+    :param filter_query: DataTable filter query, e.g. `{price} > 10 && {name} contains "abc"`
+    :return: filtered DataFrame
+    """
+    if not filter_query:
+        return df
+    mask = pd.Series(True, index=df.index)
+    for filter_part in filter_query.split(' && '):
+        column, operator, value = split_filter_part(filter_part)
+        if column not in df.columns:
+            continue
+        case_insensitive = operator.startswith('i')
+        operator = operator[1:] if case_insensitive else operator
+        series = df[column]
+        if operator in ('contains', 'datestartswith') or not isinstance(value, float) or not pd.api.types.is_numeric_dtype(series):
+            # Compare as text
+            series = series.astype(str)
+            value = str(value) if not isinstance(value, float) or not value.is_integer() else str(int(value))
+            if case_insensitive:
+                series = series.str.lower()
+                value = value.lower()
+        if operator == 'contains':
+            mask &= series.str.contains(value, regex=False, na=False)
+        elif operator == 'datestartswith':
+            mask &= series.str.startswith(value, na=False)
+        elif operator == 'eq':
+            mask &= (series == value)
+        elif operator == 'ne':
+            mask &= (series != value)
+        elif operator == 'lt':
+            mask &= (series < value)
+        elif operator == 'le':
+            mask &= (series <= value)
+        elif operator == 'gt':
+            mask &= (series > value)
+        elif operator == 'ge':
+            mask &= (series >= value)
+    return df[mask]
+
+
+def sort_dataframe(df: pd.DataFrame, sort_by: Optional[List[Dict]]) -> pd.DataFrame:
+    """Applies a DataTable `sort_by`, e.g. [{'column_id': 'price', 'direction': 'desc'}], to a DataFrame."""
+    sort_by = [s for s in (sort_by or []) if s['column_id'] in df.columns]
+    if len(sort_by) == 0:
+        return df
+    return df.sort_values([s['column_id'] for s in sort_by],
+                          ascending=[s['direction'] == 'asc' for s in sort_by],
+                          kind='stable')
+
+
+def get_data_table_page(df: pd.DataFrame, page_current: Optional[int], page_size: int,
+                        sort_by: Optional[List[Dict]] = None, filter_query: Optional[str] = None) -> Tuple[List[Dict], int]:
+    """Body of the callback of a DataTable with server-side (i.e. 'custom') paging, sorting and filtering.
+    The DataFrame stays on the server. Only the records of the visible page are sent to the browser.
+
+    :param df: full DataFrame, as used by `get_data_table`
+    :param page_current: DataTable property, 0-based
+    :param page_size: DataTable property
+    :param sort_by: DataTable property
+    :param filter_query: DataTable property
+    :returns (records, page_count): the records of the page and the number of pages after filtering
+    """
+    df = sort_dataframe(filter_dataframe(df, filter_query), sort_by)
+    page_count = max(1, math.ceil(df.shape[0] / page_size))
+    page_current = min(page_current or 0, page_count - 1)
+    records = df.iloc[page_current * page_size: (page_current + 1) * page_size].to_dict('records')
+    return records, page_count
+
+
+def get_data_table_server_side_props(df: pd.DataFrame, page_size: Optional[int] = None) -> Dict:
+    """Properties of a DataTable for either native (page_size is None) or server-side paging, sorting and filtering.
+    For server-side, only the first page of data is included. The other pages need a callback using `get_data_table_page`."""
+    if page_size is None:
+        return dict(data=df.to_dict('records'),
+                    virtualization=True,
+                    filter_action="native",
+                    sort_action="native",
+                    )
+    records, page_count = get_data_table_page(df, 0, page_size)
+    return dict(data=records,
+                page_action="custom",
+                page_current=0,
+                page_size=page_size,
+                page_count=page_count,
+                filter_action="custom",
+                filter_query='',
+                sort_action="custom",
+                sort_by=[],
+                )
+
+
+def get_data_table(df, table_schema: Optional[ScenarioTableSchema] = None, editable: bool = False, data_table_id=None,
+                   page_size: Optional[int] = None) -> dash_table.DataTable:
     """
     Generates a DataTable for a DataFrame. For use in 'Prepare Data' and 'Explore Solution' pages.
     :param df:
     :param table_schema:
+    :param page_size: If not None, uses server-side paging, sorting and filtering with this page size.
+    Requires a callback that uses `get_data_table_page`.
     :return:
     """
     if data_table_id is None:
@@ -98,18 +254,15 @@ def get_data_table(df, table_schema: Optional[ScenarioTableSchema] = None, edita
         index_columns = table_schema.index_columns
     return dash_table.DataTable(
         id=data_table_id,
-        data=df.to_dict('records'),
         columns=[
             {'name': i, 'id': i, 'type': table_type(df[i])}  # TODO: format 'thousands' separator with: 'format':Format().group(True) or ,  'format': Format(group=',', precision=0)
             for i in df.columns
         ],
         fixed_rows={'headers': True},
         editable=editable,
-        virtualization=True,
         # fixed_columns={'headers': False, 'data': 0}, # Does NOT create a horizontal scroll bar
-        filter_action="native",
-        sort_action="native",
         sort_mode="multi",
+        **get_data_table_server_side_props(df, page_size),
         style_cell={
             'textOverflow': 'ellipsis',  # See https://dash.plotly.com/datatable/width to control column-name width
             'maxWidth': 0,               # Needs to be here for the 'ellipsis' option to work
@@ -194,14 +347,106 @@ def get_editable_data_table(df, table_schema: Optional[ScenarioTableSchema]=None
         ]),
     )
 
-def get_pivot_table(df, scenario_name, table_name, pivot_config) -> dash_pivottable.PivotTable:
+##########################################################################
+#  Server-side aggregation of a PivotTable
+##########################################################################
+# PivotTable aggregatorName -> (pandas aggregation, aggregatorName to re-aggregate the pre-aggregated data in the browser)
+# Re-aggregation in the browser is needed for the row/column totals.
+_PIVOT_PRE_AGGREGATIONS = {
+    'Sum': ('sum', 'Sum'),
+    'Integer Sum': ('sum', 'Integer Sum'),
+    'Sum as Fraction of Total': ('sum', 'Sum as Fraction of Total'),
+    'Sum as Fraction of Rows': ('sum', 'Sum as Fraction of Rows'),
+    'Sum as Fraction of Columns': ('sum', 'Sum as Fraction of Columns'),
+    'Minimum': ('min', 'Minimum'),
+    'Maximum': ('max', 'Maximum'),
+    'Count': ('size', 'Integer Sum'),
+    'Count as Fraction of Total': ('size', 'Sum as Fraction of Total'),
+    'Count as Fraction of Rows': ('size', 'Sum as Fraction of Rows'),
+    'Count as Fraction of Columns': ('size', 'Sum as Fraction of Columns'),
+    'Average': ('mean', 'Sum over Sum'),
+}
+
+
+def aggregate_pivot_table_data(df: pd.DataFrame, pivot_config: PivotTableConfig) -> Optional[Tuple[pd.DataFrame, str, List[str]]]:
+    """Pre-aggregates the data of a PivotTable on the server, grouped by the rows and cols of the `pivot_config`.
+    The result has one row per cell of the PivotTable, instead of one row per record of the DataFrame.
+    The browser re-aggregates the cells for the totals, so the aggregator in the PivotTable may differ from the pivot_config:
+    - Count is sent as a count column, re-aggregated with a sum
+    - Average is sent as a sum and a count column, re-aggregated with 'Sum over Sum'
+
+    Note that in the UI, the PivotTable only has the columns of the pivot_config and changing the aggregator can give wrong results.
+
+    :param df: DataFrame
+    :param pivot_config: PivotTableConfig
+    :returns (df, aggregatorName, vals): aggregated data and the aggregator and vals for the PivotTable.
+    None if the configuration is not supported, i.e. no rows and cols, unknown columns or an unsupported aggregator.
+    """
+    group_columns = list(pivot_config.rows or []) + list(pivot_config.cols or [])
+    vals = list(pivot_config.vals or [])
+    if pivot_config.aggregatorName not in _PIVOT_PRE_AGGREGATIONS or len(group_columns) == 0:
+        return None
+    if any(c not in df.columns for c in group_columns + vals):
+        return None
+    agg_func, aggregator_name = _PIVOT_PRE_AGGREGATIONS[pivot_config.aggregatorName]
+    grouped = df.groupby(group_columns, dropna=False, observed=True, sort=False)
+    if agg_func == 'size':
+        count_column = 'Count' if 'Count' not in group_columns else 'Count of records'
+        agg_df = grouped.size().reset_index(name=count_column)
+        vals = [count_column]
+    elif len(vals) == 0:
+        return None
+    elif agg_func == 'mean':
+        value_column = vals[0]
+        count_column = f"{value_column} (count)"
+        agg_df = grouped[value_column].agg(['sum', 'count']).rename(columns={'sum': value_column, 'count': count_column}).reset_index()
+        vals = [value_column, count_column]
+    else:
+        agg_df = grouped[vals[0]].agg(agg_func).reset_index()
+        vals = vals[:1]
+    return agg_df, aggregator_name, vals
+
+
+def get_pivot_table_data(df: pd.DataFrame, pivot_config: Optional[PivotTableConfig] = None, aggregate: bool = False,
+                         max_rows: Optional[int] = None) -> Tuple[pd.DataFrame, Optional[str], Optional[List[str]], Optional[str]]:
+    """Data to send to the PivotTable.
+
+    :param df: DataFrame
+    :param pivot_config: PivotTableConfig
+    :param aggregate: if True, pre-aggregate the data on the server, see `aggregate_pivot_table_data`.
+    Falls back to the raw data if there is no (supported) pivot_config.
+    :param max_rows: maximum number of rows sent. If more, sends a random sample.
+    :returns (df, aggregatorName, vals, note): aggregatorName and vals are None if not pre-aggregated.
+    The note is a message for the user if the data is sampled, otherwise None.
+    """
+    aggregator_name, vals, note = None, None, None
+    if aggregate and pivot_config is not None:
+        aggregated = aggregate_pivot_table_data(df, pivot_config)
+        if aggregated is not None:
+            df, aggregator_name, vals = aggregated
+    if max_rows is not None and df.shape[0] > max_rows:
+        note = f"Showing a random sample of {max_rows:,} of {df.shape[0]:,} {'aggregated ' if vals is not None else ''}rows"
+        df = df.sample(n=max_rows, random_state=0)
+    return df, aggregator_name, vals, note
+
+
+def get_pivot_table(df, scenario_name, table_name, pivot_config, aggregate: bool = False, max_rows: Optional[int] = None) -> dash_pivottable.PivotTable:
     """
     Generates a PivotTable for a DataFrame. For use in 'Prepare Data' and 'Explore Solution' pages.
     :param df:
     :param scenario_name:
     :param table_name:
+    :param aggregate: if True, pre-aggregates the data on the server based on the pivot_config. See `get_pivot_table_data`.
+    :param max_rows: maximum number of rows sent to the browser. If more, uses a random sample.
     :return:
     """
+    df, aggregator_name, vals, _ = get_pivot_table_data(df, pivot_config, aggregate, max_rows)
+    return _get_pivot_table(df, scenario_name, table_name, pivot_config, aggregator_name, vals)
+
+
+def _get_pivot_table(df, scenario_name, table_name, pivot_config, aggregator_name: Optional[str] = None,
+                     vals: Optional[List[str]] = None) -> dash_pivottable.PivotTable:
+    """See `get_pivot_table`. The aggregator_name and vals override the ones in the pivot_config, for pre-aggregated data."""
     if pivot_config is None:
         pivot = dash_pivottable.PivotTable(
             id=f"pivot-{scenario_name}-{table_name}",
@@ -225,33 +470,35 @@ def get_pivot_table(df, scenario_name, table_name, pivot_config) -> dash_pivotta
             rows = pivot_config.rows,
             rowOrder="key_a_to_z",
             rendererName=pivot_config.rendererName,
-            aggregatorName=pivot_config.aggregatorName,
-            vals=pivot_config.vals,
+            aggregatorName=(aggregator_name if aggregator_name is not None else pivot_config.aggregatorName),
+            vals=(vals if vals is not None else pivot_config.vals),
             # valueFilter={'Day of Week': {'Thursday': False}}
         )
     return pivot
 
 
 def get_data_table_card_children(df, table_name:str, table_schema: Optional[ScenarioTableSchema] = None,
-                                 editable: bool = False, data_table_id:str=None):
+                                 editable: bool = False, data_table_id:str=None, page_size: Optional[int] = None):
     return [
         dbc.CardHeader(
             table_name
             # title=table_name,
             # fullscreen=True
         ),
-        get_data_table(df, table_schema, editable, data_table_id)
+        get_data_table(df, table_schema, editable, data_table_id, page_size)
     ]
 
 
-def get_pivot_table_card_children(df, scenario_name, table_name, pivot_config: Optional[PivotTableConfig]=None):
+def get_pivot_table_card_children(df, scenario_name, table_name, pivot_config: Optional[PivotTableConfig]=None,
+                                  aggregate: bool = False, max_rows: Optional[int] = None):
+    df, aggregator_name, vals, note = get_pivot_table_data(df, pivot_config, aggregate, max_rows)
     return [
         dbc.CardHeader(
-            table_name
+            table_name if note is None else f"{table_name} - {note}"
             # title=table_name,
             # fullscreen=True
         ),
-        get_pivot_table(df, scenario_name, table_name, pivot_config)
+        _get_pivot_table(df, scenario_name, table_name, pivot_config, aggregator_name, vals)
     ]
 
 #####################################
@@ -379,52 +626,107 @@ def diff_dashtable_mi(data, data_previous, index_columns: List[str] = None,
         :returns changes: A list of dictionaries in form of [{row_idx:, column_name:, current_value:,
         previous_value:, row_index:, table_name:, scenario_name:}]
     """
-    df, df_previous = pd.DataFrame(data=data), pd.DataFrame(data_previous)
-    # df, df_previous = data=data, data_previous
+    if len(data) != len(data_previous):
+        raise ValueError(f"Cannot diff DataTable data with {len(data)} rows against previous data with {len(data_previous)} rows")
+
+    # Compare all cells at once on object arrays (numpy loops over the cells, not a Python loop over the rows).
+    # (The `active_cell` of the DataTable is not sufficient: a paste changes multiple cells
+    # and the row number is relative to the sorted/filtered view, not to `data`.)
+    df = pd.DataFrame(data)
+    if df.shape[0] == 0:
+        return []
+    df_previous = pd.DataFrame(data_previous).reindex(columns=df.columns)
 
     if index_columns is not None and len(index_columns) > 0:
-        assert len(index_columns) > 0
         assert all(index_column in df.columns for index_column in index_columns)
-        df.set_index(index_columns, verify_integrity=True)  # Just to test?
-        df_previous.set_index(index_columns, verify_integrity=True) # Just to test?
     else:
         # Grab all columns
-        index_columns = df.columns
-
-    # Pandas/Numpy says NaN != NaN, so we cannot simply compare the dataframes.  Instead we can either replace the
-    # NaNs with some unique value (which is fastest for very small arrays, but doesn't scale well) or we can do
-    # (from https://stackoverflow.com/a/19322739/5394584):
-    # Mask of elements that have changed, as a dataframe.  Each element indicates True if df!=df_prev
-    df_mask = ~((df == df_previous) | ((df != df) & (df_previous != df_previous)))
+        index_columns = list(df.columns)
 
-    # ...and keep only rows that include a changed value
-    df_mask = df_mask.loc[df_mask.any(axis=1)]
+    # Pandas/Numpy says NaN != NaN, so we cannot simply compare the dataframes with `ne`. Also consider None equal to None/NaN.
+    # Mask of elements that have changed. Each element indicates True if df!=df_prev
+    values = df.to_numpy(dtype=object)
+    previous_values = df_previous.to_numpy(dtype=object)
+    mask = ~((values == previous_values) | (pd.isna(values) & pd.isna(previous_values)))
+    rows, cols = np.nonzero(mask)  # In row-major order
+    columns = list(df.columns)
 
     changes = []
-    # This feels like a place I could speed this up if needed
-    for idx, row in df_mask.iterrows():
-        row_id = row.name
-
-        # Act only on columns that had a change
-        row = row[row.eq(True)]
-
-        #         print(f"row={row}")
-        # for change in row.iteritems():  # Deprecated in Pandas 2.0
-        for change in row.items():
-            change = {
-                "row_idx": row_id,
-                "column_name": change[0],
-                "current_value": df.at[row_id, change[0]],
-                "previous_value": df_previous.at[row_id, change[0]],
-            }
-            if index_columns is not None:
-                change['row_index'] = [{'column': i, 'value': df_previous.at[row_id, i]} for i in index_columns]
-            if table_name is not None:
-                change['table_name'] = table_name
-            if scenario_name is not None:
-                change['scenario_name'] = scenario_name
-            changes.append(change)
+    for row, col in zip(rows, cols):
+        row_idx = int(row)
+        column_name = columns[col]
+        change = {
+            "row_idx": row_idx,
+            "column_name": column_name,
+            "current_value": data[row_idx].get(column_name),
+            "previous_value": data_previous[row_idx].get(column_name),
+        }
+        if index_columns is not None:
+            change['row_index'] = [{'column': i, 'value': data_previous[row_idx].get(i)} for i in index_columns]
+        if table_name is not None:
+            change['table_name'] = table_name
+        if scenario_name is not None:
+            change['scenario_name'] = scenario_name
+        changes.append(change)
 
     return changes
 
 
+def apply_dashtable_diffs(df: pd.DataFrame, diff_store_data: Optional[Dict[str, List[Dict]]],
+                          scenario_name: str, table_name: str) -> pd.DataFrame:
+    """Applies the (uncommitted) changes of a diff store, as created with `diff_dashtable_mi`, to a table.
+    E.g. to show the edits of a DataTable with server-side paging on any page, not only the page where they were made.
+    Rows are matched on the `row_index` of the changes. Changes of other scenarios or tables are ignored.
+    The changes are first resolved to the rows of the table in the DB (following edits of the index columns)
+    and then set per column, with one lookup of the rows on the index.
+
+    :param df: the table as stored in the DB, with the columns of the DataTable
+    :param diff_store_data: dict of timestamp -> list of changes, in order of the edits
+    :param scenario_name: name of scenario
+    :param table_name: name of table
+    :returns: a copy of the table with the changes applied, or the same table if there are no changes
+    """
+    if not diff_store_data:
+        return df
+    pk_columns = None
+    original_keys = {}  # Current index values of an edited row -> its index values in the DB
+    column_values: Dict[str, Dict[tuple, Any]] = {}  # column_name -> {index values in the DB: current value}
+    for changes in diff_store_data.values():
+        # The row_index of each change of one edit (e.g. a paste) is from before the edit: resolve all rows first
+        resolved = []
+        for change in changes:
+            if (change.get('scenario_name') != scenario_name or change.get('table_name') != table_name
+                    or change['column_name'] not in df.columns or not change.get('row_index')):
+                continue
+            change_pk_columns = [pk['column'] for pk in change['row_index']]
+            if pk_columns is None:
+                pk_columns = change_pk_columns
+            if change_pk_columns != pk_columns or any(column not in df.columns for column in pk_columns):
+                continue
+            key = tuple(pk['value'] for pk in change['row_index'])
+            resolved.append((key, original_keys.get(key, key), change))
+        for key, original_key, change in resolved:
+            column_values.setdefault(change['column_name'], {})[original_key] = change['current_value']
+            if change['column_name'] in pk_columns:  # Later edits of the row refer to the new index values
+                new_key = list(key)
+                new_key[pk_columns.index(change['column_name'])] = change['current_value']
+                original_keys[tuple(new_key)] = original_key
+    if len(column_values) == 0:
+        return df
+    index = pd.MultiIndex.from_frame(df[pk_columns])
+    df = df.copy()
+    for column_name, values in column_values.items():
+        positions = index.get_indexer(list(values.keys()))
+        found = positions >= 0
+        if not found.any():
+            continue
+        new_values = [value for value, is_found in zip(values.values(), found) if is_found]
+        j = df.columns.get_loc(column_name)
+        try:
+            df.iloc[positions[found], j] = new_values
+        except (TypeError, ValueError):  # E.g. a text in a numeric column
+            df[column_name] = df[column_name].astype(object)
+            df.iloc[positions[found], j] = new_values
+    return df
+
+
@@ -1,10 +1,14 @@
+import uuid
 from abc import ABC, abstractmethod
 
 # from dse_do_dashboard import DoDashApp
 from dse_do_utils.deployeddomodel import DeployedDOModel
 from dse_do_utils.scenariodbmanager import Inputs, Outputs, ScenarioDbManager
 from dse_do_dashboard.utils.donotebookrunner import DoNotebookRunner
-from typing import NamedTuple
+from dse_do_dashboard.utils.log_buffer import LogRingBuffer
+from dse_do_dashboard.utils.run_progress import RunProgress, DocplexProgressListener
+from dse_do_dashboard.utils.scenariodbmanager_update import update_scenario_output_tables_in_db_diff
+from typing import List, NamedTuple, Optional
 from typing import Type
 
 
@@ -29,12 +33,16 @@ class DoModelRunner(ABC):
             self.dbm = self.create_database_manager_instance()
         else:
             self.dbm = self.dash_app.dbm  # Re-use existing dbm if available:
-            self.dash_app.job_queue.append(self)  # TODO: hack to do a job-queue. Be careful with global variables in Dash!
         self.scenario_name = scenario_name
         self.log = ""
+        self.log_buffer = LogRingBuffer()  # Log lines while running, for runners that stream their log (e.g. a notebook run in a subprocess)
         self.code = ""  # Only applies to DoNotebookRunner
+        self.progress = RunProgress()  # Timings per phase, row counts, solver progress and memory use. Shown on the RunModelPage
         self.run_status: str = "Initializing"
-        self.id = 'my id'  # TODO: generate unique ID
+        self.id = uuid.uuid4().hex  # Replaced by the job_id if run by the DoModelJobScheduler
+        self.table_schemas = None  # ScenarioTableSchema by table name, set by the DoModelJobScheduler (without dash_app)
+        self.preloaded_inputs: Optional[Inputs] = None  # Input tables read from the cache of the app by the DoModelJobScheduler
+        self.changed_output_table_names: Optional[List[str]] = None  # Set by `update_outputs`. None if all output tables were replaced
 
     def create_database_manager_instance(self) -> ScenarioDbManager:
         """Create an instance of a ScenarioDbManager.
@@ -52,16 +60,31 @@ class DoModelRunner(ABC):
         1. Load inputs from DB
         2. Run model
         3. Write outputs back to DB
+        Records the duration of each phase and the row counts in `self.progress`.
         """
         self.run_status = "Loading input data"
+        self.progress.start_phase('load')
         inputs = self.load_inputs()
+        self.progress.set_row_counts('inputs', inputs)
         self.run_status = "Running Model"
+        self.progress.start_phase('solve')
         outputs = self.run_model(inputs)
+        self.progress.set_row_counts('outputs', outputs)
         self.run_status = "Saving output data"
+        self.progress.start_phase('write')
         self.update_outputs(outputs)
+        self.progress.end_phase()
         self.run_status = "Done"
 
     def load_inputs(self) -> Inputs:
+        """Reads the input tables of the scenario.
+        With a dash_app, reads through its cache (see `DoDashApp.read_scenario_input_tables_from_db_cached`),
+        so only the tables that are not cached, or that changed in the DB, are read from the DB.
+        In a job process of the DoModelJobScheduler, uses the `preloaded_inputs` read from the cache of the app, if available."""
+        if self.preloaded_inputs is not None:
+            return self.preloaded_inputs
+        if self.dash_app is not None:
+            return self.dash_app.read_scenario_input_tables_from_db_cached(self.scenario_name)
         return self.dbm.read_scenario_input_tables_from_db(self.scenario_name)
 
     @abstractmethod
@@ -70,12 +93,24 @@ class DoModelRunner(ABC):
         return {}
 
     def update_outputs(self, outputs: Outputs):
+        """Writes the outputs to the DB.
+        With the table schemas of a dash_app (or set by the DoModelJobScheduler), only writes the rows that changed
+        (see `update_scenario_output_tables_in_db_diff`) and records the changed tables in `changed_output_table_names`.
+        With a dash_app, evicts the changed output tables from its cache."""
         # print("Update output tables in DB")
-        self.dbm.update_scenario_output_tables_in_db(scenario_name=self.scenario_name, outputs=outputs)
+        if self.dash_app is not None:
+            self.changed_output_table_names = update_scenario_output_tables_in_db_diff(self.dbm, self.scenario_name, outputs, self.dash_app.table_schemas)
+            self.dash_app.invalidate_scenario_tables_cache(self.scenario_name, self.changed_output_table_names)
+        elif self.table_schemas is not None:
+            self.changed_output_table_names = update_scenario_output_tables_in_db_diff(self.dbm, self.scenario_name, outputs, self.table_schemas)
+        else:
+            self.dbm.update_scenario_output_tables_in_db(scenario_name=self.scenario_name, outputs=outputs)
         # print("Done update output tables in DB")
 
 
 class DoNotebookModelRunner(DoModelRunner):
+    """Runs the code of a notebook, see `DoNotebookRunner`.
+    With `run_in_subprocess`, the notebook runs in a separate process and its log streams into the `log_buffer`."""
     def __init__(self, scenario_name: str, notebook_filepath: str,
                  my_globals, my_locals,
                  dash_app = None,  # DoDashApp, cannot declare due to circular import
@@ -83,6 +118,7 @@ class DoNotebookModelRunner(DoModelRunner):
                  db_credentials = None,
                  schema: str = None,
                  db_echo: bool = False,
+                 run_in_subprocess: bool = False,
                  ):
         super().__init__(scenario_name,
                          dash_app=dash_app,
@@ -94,10 +130,12 @@ class DoNotebookModelRunner(DoModelRunner):
         self.notebook_filepath = notebook_filepath
         self.globals = my_globals
         self.locals = my_locals
+        self.run_in_subprocess = run_in_subprocess
 
     def run_model(self, inputs: Inputs) -> Outputs:
         """TODO"""
-        runner = DoNotebookRunner(self.notebook_filepath, self.globals, self.locals)
+        runner = DoNotebookRunner(self.notebook_filepath, self.globals, self.locals,
+                                  run_in_subprocess=self.run_in_subprocess, log_buffer=self.log_buffer)
         outputs = runner.run(inputs)
         self.log = runner.log
         self.code = runner.code
@@ -126,9 +164,12 @@ class DoClassModelRunner(DoModelRunner):
         self.optimization_engine_class = optimization_engine_class
 
     def run_model(self, inputs: Inputs) -> Outputs:
-        """Run an OptimizationEngine class"""
+        """Run an OptimizationEngine class.
+        If the engine has a docplex Model, its MIP progress is recorded in `self.progress`."""
         dm = self.data_manager_class(inputs=inputs)
         engine = self.optimization_engine_class(data_manager=dm)
+        if hasattr(getattr(engine, 'mdl', None), 'add_progress_listener'):  # I.e. not a CP Optimizer model
+            engine.mdl.add_progress_listener(DocplexProgressListener(self.progress))
         outputs = engine.run()
         return outputs
 
@@ -177,4 +218,5 @@ class DoDeployedModelRunner(DoModelRunner):
 class DoModelRunnerConfig(NamedTuple):
     runner_name: str
     runner_id: str
-    runner_class: Type[DoModelRunner]
\ No newline at end of file
+    runner_class: Type[DoModelRunner]
+    max_concurrent_jobs: Optional[int] = None  # Max number of jobs of this runner running at the same time in the DoModelJobScheduler. None for no limit.
\ No newline at end of file
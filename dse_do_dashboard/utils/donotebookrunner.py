@@ -1,9 +1,16 @@
 from nbformat import read, NO_CONVERT
 from io import StringIO
 from contextlib import redirect_stdout
+import linecache
+import os
 import sys
 import traceback
-from typing import Dict
+from types import CodeType
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from dse_do_dashboard.utils.log_buffer import LogRingBuffer
+from dse_do_dashboard.utils.lru_cache import SizedLRUCache
+from dse_do_dashboard.utils.notebook_subprocess import run_notebook_in_subprocess
 
 
 class InterpreterError(Exception):
@@ -11,7 +18,8 @@ class InterpreterError(Exception):
 
 
 def my_exec(cmd, globals=None, locals=None, description='source string'):
-    """Does an `exec()` with exception handling to get the line-number where the exception has occurred in the extracted code (cmd)."""
+    """Does an `exec()` with exception handling to get the line-number where the exception has occurred in the extracted code (cmd).
+    If `cmd` is a code object, the line-number is taken from the frame in its filename (i.e. not from a frame in a called library)."""
     try:
         exec(cmd, globals, locals)
     except SyntaxError as err:
@@ -20,14 +28,33 @@ def my_exec(cmd, globals=None, locals=None, description='source string'):
         line_number = err.lineno
     except Exception as err:
         error_class = err.__class__.__name__
-        detail = err.args[0]
+        detail = err.args[0] if len(err.args) > 0 else ''
         cl, exc, tb = sys.exc_info()
-        line_number = traceback.extract_tb(tb)[-1][1]
+        frames = traceback.extract_tb(tb)
+        if isinstance(cmd, CodeType):
+            frames = [frame for frame in frames if frame.filename == cmd.co_filename] or frames
+        line_number = frames[-1].lineno
     else:
         return
     raise InterpreterError("%s at line %d of %s: %s" % (error_class, line_number, description, detail))
 
 
+class CompiledNotebookCell(NamedTuple):
+    """Compiled code cell of a notebook. The filename identifies the cell in tracebacks, e.g. `model.ipynb [cell 5]`."""
+    filename: str
+    source: str
+    code: CodeType
+
+
+class CompiledNotebook(NamedTuple):
+    code: str  # Source of all included code cells
+    cells: List[CompiledNotebookCell]
+
+
+compiled_notebook_cache = SizedLRUCache(max_entries=32)
+"""Compiled notebooks by (path, mtime, size, NotebookRunner class). Shared by all NotebookRunners in the process."""
+
+
 class NotebookRunner():
     """Runs the code from a notebook.
     Extracts code from notebook.
@@ -58,12 +85,31 @@ class NotebookRunner():
         """Extracts and runs the notebook.
         Returns the log.
         """
-        self.code = self._get_nb_code()
-        self.log = self._run_code(self.code)
+        compiled_notebook = self.get_compiled_notebook()
+        self.code = compiled_notebook.code
+        self.log = self._run_compiled_cells(compiled_notebook.cells)
         return self.log
 
+    def get_compiled_notebook(self) -> CompiledNotebook:
+        """Returns the extracted and compiled code of the notebook.
+        Cached in `compiled_notebook_cache` by the path and the modification time and size of the notebook file,
+        so repeated runs of an unchanged notebook skip the parsing and compilation."""
+        stat = os.stat(self.notebook_path)
+        key = (os.path.realpath(self.notebook_path), stat.st_mtime_ns, stat.st_size, type(self))
+        compiled_notebook = compiled_notebook_cache.get(key)
+        if compiled_notebook is None:
+            compiled_notebook = self._compile_nb_code_cells(self._get_nb_code_cells())
+            compiled_notebook_cache.remove_if(lambda k: k[0] == key[0] and k[3] == key[3])  # Older versions of the notebook
+            compiled_notebook_cache.put(key, compiled_notebook)
+        return compiled_notebook
+
     def _get_nb_code(self):
-        """
+        """Returns the source of all included code cells."""
+        return "".join(cell_source + "\n" for _, cell_source in self._get_nb_code_cells())
+
+    def _get_nb_code_cells(self) -> List[Tuple[int, str]]:
+        """Returns the (1-based) index in the notebook and the source of the included code cells.
+
         WEIRD: for some crazy unknown reason, typing (lowercase) 'CELLS' causes CPD to fail writing a .py file!
         Anywhere in the file, including comments!
         So below I try to avoid this term, which is why I have to do the:
@@ -73,21 +119,46 @@ class NotebookRunner():
         with open(self.notebook_path) as fp:
             notebook = read(fp, NO_CONVERT)
             cellz = notebook['CELLS'.lower()]
-            code_cellz = [c for c in cellz if c['cell_type'] == 'code']
-            code = ""
-            for cell in code_cellz:
-                cell_source = cell['source']
-                if self.include_code_cell(cell_source):
-                    code += cell_source + "\n"
-        return code
+            code_cellz = []
+            for i, cell in enumerate(cellz):
+                if cell['cell_type'] == 'code':
+                    cell_source = cell['source']
+                    if self.include_code_cell(cell_source):
+                        code_cellz.append((i + 1, cell_source))
+        return code_cellz
+
+    def _compile_nb_code_cells(self, code_cellz: List[Tuple[int, str]]) -> CompiledNotebook:
+        """Compiles each cell with its own filename and registers its source in `linecache`,
+        so tracebacks show the cell and the source line."""
+        cells = []
+        for index, cell_source in code_cellz:
+            filename = f"{self.notebook_path} [cell {index}]"
+            source = cell_source + "\n"
+            linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)  # mtime None: kept by linecache.checkcache
+            cells.append(CompiledNotebookCell(filename, source, compile(source, filename, 'exec')))
+        return CompiledNotebook("".join(cell.source for cell in cells), cells)
 
     def include_code_cell(self, cell_source):
         """Default implementation always returns True.
         To be overridden for custom cell filtering."""
         return True
 
+    def _run_compiled_cells(self, cells: List[CompiledNotebookCell]) -> str:
+        """Runs the compiled cells in order, as one script. Stops at the first exception.
+        Returns the log."""
+        f = StringIO()  # For grabbing the log
+        with redirect_stdout(f):
+            try:
+                for cell in cells:
+                    my_exec(cell.code, self.exec_globals, self.exec_locals, description=cell.filename)
+            except Exception as err:
+                print("Exception")
+                print(err)  # TODO: more info
+        s = f.getvalue()  # get the log
+        return s
+
     def _run_code(self, code):
-        ccode = compile(code, "somefile.py", 'exec')  # Compile the code
+        ccode = compile(code, self.notebook_path, 'exec')  # Compile the code
         f = StringIO()  # For grabbing the log
         with redirect_stdout(f):
             # exec(ccode)
@@ -116,10 +187,24 @@ class DoNotebookRunner(NotebookRunner):
         runner = DoNotebookRunner(notebook_path, globals(), locals())
         outputs = runner.run(inputs)
 
+    With `run_in_subprocess=True`, the code runs in a separate Python process (see `notebook_subprocess`).
+    The globals and locals are not used: the notebook code only sees the `inputs` and needs to do its own imports.
+    The log is streamed line by line into the `log_buffer` while the notebook runs::
+
+        runner = DoNotebookRunner(notebook_path, run_in_subprocess=True, log_buffer=log_buffer)
+        outputs = runner.run(inputs)
+
     """
 
-    #     def __init__(self, notebook_path):
-    #         super().__init__(notebook_path)
+    def __init__(self, notebook_path: str, exec_globals: Dict = {}, exec_locals: Dict = {},
+                 run_in_subprocess: bool = False, log_buffer: Optional[LogRingBuffer] = None):
+        """
+        :param run_in_subprocess: If True, runs the code in a separate process, exchanging the inputs and outputs as Parquet files (requires pyarrow).
+        :param log_buffer: Receives the log line by line when run in a subprocess. If None, creates a new one.
+        """
+        super().__init__(notebook_path, exec_globals, exec_locals)
+        self.run_in_subprocess = run_in_subprocess
+        self.log_buffer = log_buffer if log_buffer is not None else LogRingBuffer()
 
     def run(self, inputs: Dict = {}) -> Dict:
         """Runs the notebook.
@@ -127,11 +212,23 @@ class DoNotebookRunner(NotebookRunner):
         And adds an empty `outputs` to the globals, so that the notebook can add output DataFrames, e.g. `outputs["a"] = xxx`.
         Notebook is also allowed to re-create the outputs Dict, e.g. `outputs = {"a": xxx}`
         """
+        if self.run_in_subprocess:
+            return self._run_in_subprocess(inputs)
         self.exec_globals['inputs'] = inputs
         self.exec_globals['outputs'] = {}
         super().run()
         return self._get_outputs()
 
+    def _run_in_subprocess(self, inputs: Dict) -> Dict:
+        compiled_notebook = self.get_compiled_notebook()
+        self.code = compiled_notebook.code
+        try:
+            outputs = run_notebook_in_subprocess([(cell.filename, cell.source) for cell in compiled_notebook.cells], inputs,
+                                                 log_line=self.log_buffer.append)
+        finally:
+            self.log = self.log_buffer.get_text()
+        return outputs
+
     def include_code_cell(self, cell_source):
         return not cell_source.startswith("#dd-ignore")
 
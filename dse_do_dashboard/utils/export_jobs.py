@@ -0,0 +1,214 @@
+# Copyright IBM All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""Background export jobs and a file cache for scenario downloads.
+
+Exports (e.g. a scenario as .xlsx or all scenarios as a .zip) run in a thread pool instead of inside a Dash callback,
+so they do not block a server worker. Each job reports its progress and writes its file in the `ExportFileCache`.
+The files are addressed by a key derived from the version of the exported scenarios (see `get_export_key`),
+so a repeated download of unchanged scenarios is served from disk without running the export again.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+from dse_do_utils import ScenarioManager
+from dse_do_utils.scenariodbmanager import ScenarioDbManager
+
+ProgressCallback = Callable[[float, str], None]  # (fraction done, message)
+ExportFunction = Callable[[str, ProgressCallback], None]  # (filepath, progress_callback)
+
+
+def get_export_key(*parts) -> str:
+    """Returns a key for the `ExportFileCache`: the sha256 of the JSON of the parts, e.g. the type of export,
+    the scenario names and their version (change tokens)."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class ExportFileCache:
+    """Files on disk by key. Keeps at most `max_files`, evicting the least recently used.
+    Files are written to a temporary file first and then moved in place, so a file in the cache is always complete.
+    """
+    def __init__(self, cache_dir: Optional[str] = None, max_files: int = 32):
+        """
+        :param cache_dir: Directory of the cache. If None, creates a temporary directory,
+        i.e. the cache does not survive a restart of the app (as the scenario versions it is keyed on).
+        :param max_files: Maximum number of files in the cache.
+        """
+        if cache_dir is None:
+            cache_dir = tempfile.mkdtemp(prefix='dse_do_dashboard_exports_')
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.max_files = max_files
+        self.lock = threading.Lock()
+
+    def get_filepath(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the filepath if the key is in the cache, else None."""
+        filepath = self.get_filepath(key)
+        if not os.path.exists(filepath):
+            return None
+        os.utime(filepath)  # Mark as recently used
+        return filepath
+
+    def put(self, key: str, write_file: Callable[[str], None]) -> str:
+        """Writes a file in the cache.
+
+        :param key: key of the file
+        :param write_file: function that writes the file at the filepath given as argument
+        :return: filepath in the cache
+        """
+        filepath = self.get_filepath(key)
+        tmp_filepath = f"{filepath}.{uuid.uuid4().hex}.tmp"
+        try:
+            write_file(tmp_filepath)
+            os.replace(tmp_filepath, filepath)
+        finally:
+            if os.path.exists(tmp_filepath):
+                os.remove(tmp_filepath)
+        self._evict()
+        return filepath
+
+    def _evict(self):
+        with self.lock:
+            filepaths = [os.path.join(self.cache_dir, f) for f in os.listdir(self.cache_dir) if not f.endswith('.tmp')]
+            if len(filepaths) > self.max_files:
+                filepaths.sort(key=os.path.getmtime)
+                for filepath in filepaths[:len(filepaths) - self.max_files]:
+                    os.remove(filepath)
+
+
+class ExportJob:
+    """State of an export job, as shown in the UI."""
+    def __init__(self, key: str, filename: str, description: str, owner: Optional[str] = None):
+        self.job_id = uuid.uuid4().hex
+        self.key = key
+        self.owner = owner  # Id of the browser session that submitted the job
+        self.filename = filename  # Name of the file for the user
+        self.description = description
+        self.status = 'queued'  # 'queued', 'running', 'done' or 'error'
+        self.progress: float = 0  # Fraction done
+        self.message = ''
+        self.filepath: Optional[str] = None  # In the ExportFileCache, when done
+        self.start_time = time.time()
+
+
+class ExportJobManager:
+    """Runs export jobs in a thread pool and keeps their state.
+    A job for a key that is in the `ExportFileCache` is done immediately.
+    A job for a key that is already queued or running for the same owner is not started again.
+    Jobs are scoped to an owner (e.g. a browser session): the UI only shows, and serves the files of, the jobs of its owner.
+    """
+    def __init__(self, file_cache: ExportFileCache, max_workers: int = 1, max_jobs: int = 20):
+        """
+        :param file_cache: ExportFileCache
+        :param max_workers: Number of exports running concurrently.
+        :param max_jobs: Number of (most recent) jobs kept for the UI.
+        """
+        self.file_cache = file_cache
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='export')
+        self.max_jobs = max_jobs
+        self.jobs: Dict[str, ExportJob] = OrderedDict()  # job_id -> ExportJob
+        self.version = 0  # Incremented on any change of the jobs. Allows the UI to skip updates.
+        self.lock = threading.Lock()
+
+    def submit(self, key: str, filename: str, description: str, export_function: ExportFunction,
+               owner: Optional[str] = None) -> ExportJob:
+        """Starts an export job, unless the file is in the cache or a job of the owner for the same key is in progress.
+
+        :param key: key of the file in the ExportFileCache, see `get_export_key`
+        :param filename: name of the file for the user
+        :param description: description of the job for the UI
+        :param export_function: function(filepath, progress_callback) that writes the file
+        :param owner: id of the browser session that submits the job
+        :return: ExportJob
+        """
+        with self.lock:
+            for job in self.jobs.values():
+                if job.key == key and job.owner == owner and job.status in ['queued', 'running']:
+                    return job
+            job = ExportJob(key, filename, description, owner)
+            self.jobs[job.job_id] = job
+            while len(self.jobs) > self.max_jobs:
+                self.jobs.popitem(last=False)
+            self.version += 1
+        filepath = self.file_cache.get(key)
+        if filepath is not None:
+            self._update(job, status='done', progress=1, message='From cache', filepath=filepath)
+        else:
+            self.executor.submit(self._run, job, export_function)
+        return job
+
+    def _run(self, job: ExportJob, export_function: ExportFunction):
+        print(f"Export job {job.description}")
+        self._update(job, status='running')
+        try:
+            def progress_callback(progress: float, message: str = ''):
+                self._update(job, progress=progress, message=message)
+            filepath = self.file_cache.put(job.key, lambda filepath: export_function(filepath, progress_callback))
+            self._update(job, status='done', progress=1, message='', filepath=filepath)
+        except Exception as e:
+            print(f"Export job {job.description} failed: {e}")
+            self._update(job, status='error', message=str(e))
+
+    def _update(self, job: ExportJob, **kwargs):
+        with self.lock:
+            for name, value in kwargs.items():
+                setattr(job, name, value)
+            self.version += 1
+
+    def get_job(self, job_id: str) -> Optional[ExportJob]:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def get_jobs(self, owner: Optional[str] = None) -> List[ExportJob]:
+        """Returns the jobs, most recent first.
+
+        :param owner: If not None, only the jobs of this owner.
+        """
+        with self.lock:
+            return [job for job in reversed(self.jobs.values()) if owner is None or job.owner == owner]
+
+    def has_pending_jobs(self, owner: Optional[str] = None) -> bool:
+        """True if any job (of the owner, if not None) is queued or running."""
+        return any(job.status in ['queued', 'running'] for job in self.get_jobs(owner))
+
+
+#############################################################################
+# Export functions
+#############################################################################
+def export_scenario_to_excel(dbm: ScenarioDbManager, scenario_name: str, filepath: str,
+                             progress_callback: Optional[ProgressCallback] = None):
+    """Writes a scenario as .xlsx, as `HomePageEdit` download scenario."""
+    if progress_callback is not None:
+        progress_callback(0, f"Reading scenario {scenario_name}")
+    inputs, outputs = dbm.read_scenario_from_db(scenario_name)
+    if progress_callback is not None:
+        progress_callback(0.5, f"Writing scenario {scenario_name}")
+    with open(filepath, 'wb') as f, pd.ExcelWriter(f, engine='openpyxl') as writer:  # File object, since the filepath may not end with .xlsx
+        ScenarioManager.write_data_to_excel_s(writer, inputs=inputs, outputs=outputs)
+
+
+def export_scenarios_to_excel_zip(dbm: ScenarioDbManager, scenario_names: List[str], filepath: str,
+                                  progress_callback: Optional[ProgressCallback] = None):
+    """Writes a .zip with a .xlsx per scenario, as `HomePageEdit` download all scenarios."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with zipfile.ZipFile(filepath, 'w') as zip_file:
+            for i, scenario_name in enumerate(scenario_names):
+                if progress_callback is not None:
+                    progress_callback(i / len(scenario_names), f"Scenario {scenario_name}")
+                filename = f'{scenario_name}.xlsx'
+                xlsx_filepath = os.path.join(tmpdir, filename)
+                export_scenario_to_excel(dbm, scenario_name, xlsx_filepath)
+                zip_file.write(xlsx_filepath, arcname=filename, compress_type=zipfile.ZIP_DEFLATED)
+                os.remove(xlsx_filepath)
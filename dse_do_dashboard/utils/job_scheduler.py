@@ -0,0 +1,535 @@
+# Copyright IBM All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""Job scheduler for model runs (DoModelRunner).
+
+Jobs are stored in a local SQLite database, so the queue and the job history survive a restart of the app.
+Each job runs in its own process, so a solve does not hold the GIL against the web server and can be cancelled.
+The processes run the dedicated entry module `dse_do_dashboard.utils.job_worker` in a new interpreter:
+they are not forked from the (multithreaded) web server process, so they do not inherit held locks, thread pools
+or DB connections, and unlike a multiprocessing 'spawn' they do not re-import the `__main__` module of the app.
+Several app processes (e.g. gunicorn workers) can share the jobs database: a worker claims a queued job atomically,
+and only the worker that started a job (its `owner`) runs and terminates its process.
+The number of running jobs is bounded in total (`max_workers`) and per model (`DoModelRunnerConfig.max_concurrent_jobs`).
+While a job runs, the job process stores the lines of its `DoModelRunner.log_buffer` and its `DoModelRunner.progress`
+in the jobs database, so they can be read from any app process (see `get_job_log_lines` and `get_job_progress`).
+"""
+import inspect
+import json
+import os
+import pickle
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from dse_do_dashboard.utils.domodelrunner import DoModelRunnerConfig
+from dse_do_dashboard.utils.log_buffer import LogRingBuffer
+
+JOB_STATUS_QUEUED = 'queued'
+JOB_STATUS_RUNNING = 'running'
+JOB_STATUS_DONE = 'done'
+JOB_STATUS_ERROR = 'error'
+JOB_STATUS_CANCELLED = 'cancelled'
+JOB_FINAL_STATUSES = [JOB_STATUS_DONE, JOB_STATUS_ERROR, JOB_STATUS_CANCELLED]
+
+_JOBS_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    runner_id TEXT NOT NULL,
+    scenario_name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    run_status TEXT,
+    submit_time REAL NOT NULL,
+    start_time REAL,
+    end_time REAL,
+    log TEXT,
+    message TEXT,
+    progress TEXT,
+    owner TEXT,
+    changed_tables TEXT
+)
+"""
+
+_JOB_LOG_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS job_log (
+    job_id TEXT NOT NULL,
+    line_no INTEGER NOT NULL,
+    line TEXT NOT NULL,
+    PRIMARY KEY (job_id, line_no)
+)
+"""
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    """New connection for each operation: safe to use from any thread and from the job processes."""
+    connection = sqlite3.connect(db_path, timeout=30)
+    connection.row_factory = sqlite3.Row
+    return connection
+
+
+def _update_job(db_path: str, job_id: str, where_status_not_in: Optional[List[str]] = None, **values) -> bool:
+    """Updates the columns of a job.
+
+    :param where_status_not_in: if not None, only updates the job if its status is not one of these, e.g. to not overwrite a cancel
+    :return: True if the job was updated
+    """
+    with _connect(db_path) as connection:
+        assignments = ', '.join(f"{name} = ?" for name in values.keys())
+        sql = f"UPDATE jobs SET {assignments} WHERE job_id = ?"
+        parameters = [*values.values(), job_id]
+        if where_status_not_in is not None:
+            sql += f" AND status NOT IN ({', '.join('?' * len(where_status_not_in))})"
+            parameters.extend(where_status_not_in)
+        updated = connection.execute(sql, parameters).rowcount == 1
+    connection.close()
+    return updated
+
+
+def _is_owner_alive(owner: Optional[str]) -> bool:
+    """True if the app process `owner` (see `DoModelJobScheduler.owner`) is running. Assumed for an owner on another host."""
+    if owner is None:
+        return False
+    hostname, _, pid = owner.rpartition(':')
+    if hostname != socket.gethostname():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def _run_job_process(db_path: str, job_id: str, runner_class, scenario_name: str, runner_kwargs: Dict,
+                     table_schemas: Optional[Dict] = None, inputs: Optional[Dict] = None):
+    """Runs the DoModelRunner in the job process (see `job_worker`) and stores the result in the jobs table, unless the job was cancelled.
+    The log lines and progress of the runner are stored in the jobs database while it runs.
+
+    :param table_schemas: ScenarioTableSchema by table name, to write only the changed rows of the outputs (see `DoModelRunner.update_outputs`)
+    :param inputs: the input tables read from the cache of the app, if available (see `DoModelRunner.load_inputs`)
+    """
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(1))  # On cancel, run the cleanup of the runner, e.g. stop a notebook subprocess
+    runner = None
+    writer = _JobEventWriter(db_path, job_id)
+    try:
+        runner = runner_class(scenario_name, **runner_kwargs)
+        runner.table_schemas = table_schemas
+        runner.preloaded_inputs = inputs
+        _run_runner(runner, job_id, writer)
+        writer.close()
+        changed_tables = getattr(runner, 'changed_output_table_names', None)
+        _update_job(db_path, job_id, where_status_not_in=[JOB_STATUS_CANCELLED],
+                    status=JOB_STATUS_DONE, run_status=runner.run_status, end_time=time.time(), log=runner.log,
+                    progress=json.dumps(runner.progress.to_dict()),
+                    changed_tables=json.dumps(changed_tables) if changed_tables is not None else None)
+    except Exception as e:
+        traceback.print_exc()
+        writer.close()
+        _update_job(db_path, job_id, where_status_not_in=[JOB_STATUS_CANCELLED],
+                    status=JOB_STATUS_ERROR, end_time=time.time(), message=str(e),
+                    progress=json.dumps(runner.progress.to_dict()) if runner is not None else None)
+
+
+def _run_runner(runner, job_id: str, writer: '_JobEventWriter'):
+    runner.id = job_id
+    runner.log_buffer.listener = writer.append_line
+    runner.progress.listener = writer.set_progress
+    runner.run()
+
+
+class _JobEventWriter():
+    """In the job process: stores the log lines and the latest progress of the runner in the jobs database,
+    in a background thread at most every `flush_interval` seconds, so the runner is not slowed down by writes."""
+    def __init__(self, db_path: str, job_id: str, flush_interval: float = 0.5, max_lines: int = 10000):
+        """
+        :param max_lines: maximum number of lines kept in the jobs database, as in the LogRingBuffer
+        """
+        self.db_path = db_path
+        self.job_id = job_id
+        self.flush_interval = flush_interval
+        self.max_lines = max_lines
+        self._lines: List[str] = []  # Not yet stored
+        self._num_lines = 0  # Total number of lines appended, i.e. the number of the next line
+        self._progress: Optional[Dict] = None  # Not yet stored
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._flush_loop, name='job_events', daemon=True)
+        self._thread.start()
+
+    def append_line(self, line: str):
+        with self._lock:
+            self._lines.append(line)
+
+    def set_progress(self, progress: Dict):
+        with self._lock:
+            self._progress = progress
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            lines, self._lines = self._lines, []
+            progress, self._progress = self._progress, None
+            first_line_no = self._num_lines
+            self._num_lines += len(lines)
+            num_lines = self._num_lines
+        if len(lines) == 0 and progress is None:
+            return
+        try:
+            with _connect(self.db_path) as connection:
+                connection.executemany("INSERT INTO job_log (job_id, line_no, line) VALUES (?, ?, ?)",
+                                       [(self.job_id, first_line_no + i, line) for i, line in enumerate(lines)])
+                connection.execute("DELETE FROM job_log WHERE job_id = ? AND line_no < ?", [self.job_id, num_lines - self.max_lines])
+                if progress is not None:
+                    connection.execute("UPDATE jobs SET progress = ? WHERE job_id = ? AND status = ?",
+                                       [json.dumps(progress), self.job_id, JOB_STATUS_RUNNING])
+            connection.close()
+        except sqlite3.Error as e:  # The log is only informative, do not fail the run
+            print(f"Cannot store log of job {self.job_id}: {e}")
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self.flush()
+
+
+class DoModelJobScheduler:
+    """Schedules model runs. Used by the RunModelPage.
+
+    Usage::
+
+        job_id = dash_app.job_scheduler.submit(runner_id, scenario_name)
+        jobs = dash_app.job_scheduler.get_jobs()
+        dash_app.job_scheduler.cancel(job_id)
+
+    The runner is created in the job process as `runner_class(scenario_name)`, i.e. the runner creates its own
+    ScenarioDbManager (as for a long-running callback).
+    If the `__init__` of the runner_class has the parameters `database_manager_class`, `db_credentials`, `schema` and/or `db_echo`
+    (as the DoModelRunner), these are set from the dash_app. The runner gets the table schemas of the dash_app, to only write
+    the output rows that changed, and the input tables if they are in the cache of the dash_app.
+    The runner_class must be importable from a module, i.e. not defined in a notebook nor in the script that starts the app (`__main__`).
+    """
+    def __init__(self, dash_app, runner_configs: List[DoModelRunnerConfig], db_path: Optional[str] = None,
+                 max_workers: int = 2, max_job_history: int = 100, poll_interval: float = 0.5):
+        """
+        :param dash_app: DoDashApp
+        :param runner_configs: The model runners, see `DoDashApp.get_do_model_runner_configs`
+        :param db_path: Path of the SQLite database with the jobs. If None, a database in a new temporary directory
+        :param max_workers: Maximum number of jobs running at the same time
+        :param max_job_history: Number of finished jobs kept
+        :param poll_interval: Seconds between checks of the running jobs
+        """
+        self.dash_app = dash_app
+        self.runner_config_dict: Dict[str, DoModelRunnerConfig] = {config.runner_id: config for config in runner_configs}
+        self.db_path = db_path if db_path is not None else os.path.join(tempfile.mkdtemp(prefix='dse_do_jobs_'), 'jobs.sqlite')
+        self.max_workers = max_workers
+        self.max_job_history = max_job_history
+        self.poll_interval = poll_interval
+        self.processes: Dict[str, subprocess.Popen] = {}  # job_id -> process of the jobs started by this process
+        self.log_buffers: Dict[str, LogRingBuffer] = {}  # job_id -> log of the jobs running in-line in this process
+        self.job_progress: Dict[str, Dict] = {}  # job_id -> latest `RunProgress.to_dict()` of the jobs running in-line in this process
+        self.lock = threading.RLock()
+        self.monitor_thread: Optional[threading.Thread] = None
+        self.initialized = False
+
+    @property
+    def owner(self) -> str:
+        """Identifies this app process in the `owner` column of the jobs it started.
+        Evaluated on each use, since the scheduler can be created before a server forks its workers."""
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Creates the jobs table on first use. Running jobs of app processes that no longer run are marked as error.
+        Queued jobs are started again."""
+        if not self.initialized:
+            with self.lock:
+                if not self.initialized:
+                    if os.path.dirname(self.db_path) != '':
+                        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+                    with _connect(self.db_path) as connection:
+                        connection.execute("PRAGMA journal_mode=WAL")  # The job processes write their log while the app reads it
+                        connection.execute(_JOBS_TABLE_DDL)
+                        connection.execute(_JOB_LOG_TABLE_DDL)
+                        columns = [row['name'] for row in connection.execute("PRAGMA table_info(jobs)")]
+                        if 'progress' not in columns:  # Jobs database of an earlier version
+                            connection.execute("ALTER TABLE jobs ADD COLUMN progress TEXT")
+                        if 'owner' not in columns:
+                            connection.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+                        if 'changed_tables' not in columns:
+                            connection.execute("ALTER TABLE jobs ADD COLUMN changed_tables TEXT")
+                        running = connection.execute("SELECT job_id, owner FROM jobs WHERE status = ?", [JOB_STATUS_RUNNING]).fetchall()
+                        for job_id, owner in running:
+                            if not _is_owner_alive(owner):  # Not a job of another worker that is still running
+                                connection.execute("UPDATE jobs SET status = ?, message = ?, end_time = ? WHERE job_id = ? AND status = ?",
+                                                   [JOB_STATUS_ERROR, 'Interrupted by restart of the app', time.time(), job_id, JOB_STATUS_RUNNING])
+                    connection.close()
+                    self.initialized = True
+                    self._start_monitor()
+        return _connect(self.db_path)
+
+    def submit(self, runner_id: str, scenario_name: str) -> str:
+        """Adds a job to the queue.
+
+        :param runner_id: DoModelRunnerConfig.runner_id
+        :param scenario_name: Name of scenario
+        :return: job_id
+        """
+        if runner_id not in self.runner_config_dict:
+            raise ValueError(f"Unknown model runner '{runner_id}'")
+        job_id = uuid.uuid4().hex
+        connection = self._get_connection()
+        with connection:
+            connection.execute("INSERT INTO jobs (job_id, runner_id, scenario_name, status, submit_time) VALUES (?, ?, ?, ?, ?)",
+                               [job_id, runner_id, scenario_name, JOB_STATUS_QUEUED, time.time()])
+        connection.close()
+        print(f"Job {job_id} queued: {runner_id} with scenario {scenario_name}")
+        self._dispatch()
+        self._start_monitor()
+        return job_id
+
+    def run_inline(self, runner_id: str, runner) -> str:
+        """Runs a DoModelRunner in the current thread and records it as a job.
+
+        :param runner_id: DoModelRunnerConfig.runner_id
+        :param runner: DoModelRunner
+        :return: job_id
+        """
+        job_id = uuid.uuid4().hex
+        runner.id = job_id
+        now = time.time()
+        connection = self._get_connection()
+        with connection:
+            connection.execute("INSERT INTO jobs (job_id, runner_id, scenario_name, status, run_status, submit_time, start_time, owner) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                               [job_id, runner_id, runner.scenario_name, JOB_STATUS_RUNNING, 'in-line', now, now, self.owner])
+        connection.close()
+        self.log_buffers[job_id] = runner.log_buffer
+        runner.progress.listener = lambda progress: self.job_progress.__setitem__(job_id, progress)
+        try:
+            runner.run()
+            _update_job(self.db_path, job_id, status=JOB_STATUS_DONE, run_status=runner.run_status, end_time=time.time(), log=runner.log,
+                        progress=json.dumps(runner.progress.to_dict()))
+        except Exception as e:
+            _update_job(self.db_path, job_id, status=JOB_STATUS_ERROR, end_time=time.time(), message=str(e),
+                        progress=json.dumps(runner.progress.to_dict()))
+            raise
+        finally:
+            self.log_buffers.pop(job_id, None)
+            self.job_progress.pop(job_id, None)
+            self._prune_history()
+        return job_id
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancels a queued or running job. A running job is terminated:
+        by this process if it started the job, otherwise by its owner, which polls for cancelled jobs (see `_monitor`).
+
+        :return: True if the job was cancelled, False if it had already finished
+        """
+        self._get_connection().close()  # Creates the jobs table if needed
+        with self.lock:
+            if not _update_job(self.db_path, job_id, where_status_not_in=JOB_FINAL_STATUSES,
+                               status=JOB_STATUS_CANCELLED, end_time=time.time()):
+                return False
+            self._terminate_job(job_id)
+        print(f"Job {job_id} cancelled")
+        self._dispatch()
+        return True
+
+    def _terminate_job(self, job_id: str):
+        """Terminates the process of the job, if started by this process."""
+        process = self.processes.pop(job_id, None)
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        connection = self._get_connection()
+        row = connection.execute("SELECT * FROM jobs WHERE job_id = ?", [job_id]).fetchone()
+        connection.close()
+        return dict(row) if row is not None else None
+
+    def get_job_log_lines(self, job_id: str, start: int = 0) -> Optional[Tuple[List[str], int]]:
+        """Returns the log lines of a running job from line number `start`, and the number of the next line.
+        See `LogRingBuffer.get_lines`.
+        Returns None if the job is not running, e.g. when it has finished. Then the log is in the jobs table.
+        """
+        log_buffer = self.log_buffers.get(job_id)
+        if log_buffer is not None:  # Running in-line in this process
+            return log_buffer.get_lines(start)
+        connection = self._get_connection()
+        job = connection.execute("SELECT status FROM jobs WHERE job_id = ?", [job_id]).fetchone()
+        if job is None or job['status'] != JOB_STATUS_RUNNING:
+            connection.close()
+            return None
+        rows = connection.execute("SELECT line_no, line FROM job_log WHERE job_id = ? AND line_no >= ? ORDER BY line_no",
+                                  [job_id, start]).fetchall()
+        connection.close()
+        return [row['line'] for row in rows], (rows[-1]['line_no'] + 1 if len(rows) > 0 else start)
+
+    def get_job_progress(self, job_id: str) -> Optional[Dict]:
+        """Returns the progress of a job, as `RunProgress.to_dict()`: the latest progress while the job runs,
+        else the final progress stored in the jobs table. None if not available."""
+        progress = self.job_progress.get(job_id)  # Running in-line in this process
+        if progress is None:
+            job = self.get_job(job_id)
+            if job is not None and job['progress'] is not None:
+                progress = json.loads(job['progress'])
+        return progress
+
+    def get_jobs(self, limit: int = 100) -> List[Dict]:
+        """Returns the most recent jobs, most recent first, as dicts with the columns of the jobs table."""
+        connection = self._get_connection()
+        rows = connection.execute("SELECT * FROM jobs ORDER BY submit_time DESC LIMIT ?", [limit]).fetchall()
+        connection.close()
+        return [dict(row) for row in rows]
+
+    def _dispatch(self):
+        """Starts queued jobs, in order of submission, as long as the concurrency limits allow.
+        The limits are checked and the jobs claimed in one write transaction, so other app processes sharing
+        the jobs database cannot claim the same job, nor exceed the limits."""
+        with self.lock:
+            claimed = []
+            connection = self._get_connection()
+            try:
+                connection.execute("BEGIN IMMEDIATE")  # Other processes wait for the commit
+                queued = connection.execute("SELECT job_id, runner_id, scenario_name FROM jobs WHERE status = ? ORDER BY submit_time",
+                                            [JOB_STATUS_QUEUED]).fetchall()
+                running = connection.execute("SELECT runner_id, COUNT(*) FROM jobs WHERE status = ? GROUP BY runner_id",
+                                             [JOB_STATUS_RUNNING]).fetchall()
+                running_per_runner = {runner_id: count for runner_id, count in running}
+                num_running = sum(running_per_runner.values())
+                for job_id, runner_id, scenario_name in queued:
+                    if num_running >= self.max_workers:
+                        break
+                    config = self.runner_config_dict.get(runner_id)
+                    if config is None:
+                        connection.execute("UPDATE jobs SET status = ?, message = ? WHERE job_id = ? AND status = ?",
+                                           [JOB_STATUS_ERROR, f"Unknown model runner '{runner_id}'", job_id, JOB_STATUS_QUEUED])
+                        continue
+                    if config.max_concurrent_jobs is not None and running_per_runner.get(runner_id, 0) >= config.max_concurrent_jobs:
+                        continue
+                    cursor = connection.execute("UPDATE jobs SET status = ?, owner = ?, start_time = ? WHERE job_id = ? AND status = ?",
+                                                [JOB_STATUS_RUNNING, self.owner, time.time(), job_id, JOB_STATUS_QUEUED])
+                    if cursor.rowcount != 1:  # Claimed or cancelled in the meantime
+                        continue
+                    claimed.append((job_id, config, scenario_name))
+                    running_per_runner[runner_id] = running_per_runner.get(runner_id, 0) + 1
+                    num_running += 1
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+            finally:
+                connection.close()
+            for job_id, config, scenario_name in claimed:
+                self._start_job(job_id, config, scenario_name)
+
+    def _start_job(self, job_id: str, config: DoModelRunnerConfig, scenario_name: str):
+        """Starts the process of a job claimed by this process.
+        The arguments of `_run_job_process` are passed in a pickle file, see `job_worker`."""
+        print(f"Job {job_id} start: {config.runner_id} with scenario {scenario_name}")
+        try:
+            if config.runner_class.__module__ == '__main__':
+                raise ValueError(f"Runner class {config.runner_class.__name__} is defined in the __main__ module. Move it to an importable module.")
+            args = dict(db_path=self.db_path, job_id=job_id, runner_class=config.runner_class, scenario_name=scenario_name,
+                        runner_kwargs=self._get_runner_kwargs(config.runner_class),
+                        table_schemas=self.dash_app.table_schemas, inputs=self._get_cached_inputs(scenario_name))
+            fd, args_filepath = tempfile.mkstemp(prefix=f"job_{job_id}_", suffix='.pickle')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(sys.path, f)  # Unpickled first, so the job process can import the modules of the runner_class
+                pickle.dump(args, f)
+            process = subprocess.Popen([sys.executable, '-m', 'dse_do_dashboard.utils.job_worker', args_filepath])
+        except Exception as e:
+            _update_job(self.db_path, job_id, where_status_not_in=JOB_FINAL_STATUSES,
+                        status=JOB_STATUS_ERROR, end_time=time.time(), message=f"Cannot start job process: {e}")
+            return
+        self.processes[job_id] = process
+
+    def _get_cached_inputs(self, scenario_name: str) -> Optional[Dict]:
+        """The input tables of the scenario through the cache of the dash_app (see `DoDashApp.read_scenario_input_tables_from_db_cached`).
+        None if the dash_app does not cache the scenario tables: then the job process reads them from the DB."""
+        if not hasattr(self.dash_app.read_scenario_table_from_db_callback, 'uncached'):
+            return None
+        try:
+            with self.dash_app.app.server.app_context():
+                return self.dash_app.read_scenario_input_tables_from_db_cached(scenario_name)
+        except Exception as e:
+            print(f"Cannot read the inputs of scenario {scenario_name} from the cache: {e}")
+            return None
+
+    def _get_runner_kwargs(self, runner_class) -> Dict:
+        """The DB connection settings of the dash_app for the parameters of the `__init__` of the runner_class, if it has them."""
+        settings = {'database_manager_class': self.dash_app.database_manager_class,
+                    'db_credentials': self.dash_app.db_credentials,
+                    'schema': self.dash_app.schema,
+                    'db_echo': self.dash_app.db_echo}
+        parameters = inspect.signature(runner_class.__init__).parameters
+        return {name: value for name, value in settings.items() if name in parameters and value is not None}
+
+    def _start_monitor(self):
+        with self.lock:
+            if self.monitor_thread is None or not self.monitor_thread.is_alive():
+                self.monitor_thread = threading.Thread(target=self._monitor, name='job_scheduler', daemon=True)
+                self.monitor_thread.start()
+
+    def _monitor(self):
+        """Checks the running jobs. When a job finishes, invalidates the cached outputs of its scenario.
+        Starts the queued jobs when the concurrency limits allow.
+        Stops when there are no running or queued jobs, and is started again by `submit`."""
+        while True:
+            time.sleep(self.poll_interval)
+            with self.lock:
+                for job_id in self._get_cancelled_job_ids(list(self.processes.keys())):  # Cancelled from another process
+                    print(f"Job {job_id} cancelled")
+                    self._terminate_job(job_id)
+                finished = [job_id for job_id, process in self.processes.items() if process.poll() is not None]
+                for job_id in finished:
+                    process = self.processes.pop(job_id)
+                    job = self.get_job(job_id)
+                    if job['status'] == JOB_STATUS_RUNNING:  # Process ended without storing a result
+                        _update_job(self.db_path, job_id, where_status_not_in=JOB_FINAL_STATUSES,
+                                    status=JOB_STATUS_ERROR, end_time=time.time(),
+                                    message=f"Job process ended with exit code {process.returncode}")
+                    if job['status'] == JOB_STATUS_DONE:
+                        changed_tables = (json.loads(job['changed_tables']) if job['changed_tables'] is not None
+                                          else self.dash_app.get_output_table_names())
+                        with self.dash_app.app.server.app_context():
+                            self.dash_app.invalidate_scenario_tables_cache(job['scenario_name'], changed_tables)
+                if len(finished) > 0:
+                    self._prune_history()
+                self._dispatch()
+                if len(self.processes) == 0 and not self._has_queued_jobs():
+                    self.monitor_thread = None
+                    return
+
+    def _get_cancelled_job_ids(self, job_ids: List[str]) -> List[str]:
+        if len(job_ids) == 0:
+            return []
+        connection = self._get_connection()
+        rows = connection.execute(f"SELECT job_id FROM jobs WHERE status = ? AND job_id IN ({', '.join('?' * len(job_ids))})",
+                                  [JOB_STATUS_CANCELLED, *job_ids]).fetchall()
+        connection.close()
+        return [row['job_id'] for row in rows]
+
+    def _has_queued_jobs(self) -> bool:
+        connection = self._get_connection()
+        row = connection.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", [JOB_STATUS_QUEUED]).fetchone()
+        connection.close()
+        return row[0] > 0
+
+    def _prune_history(self):
+        """Deletes the oldest finished jobs, keeping `max_job_history`, and the log lines of the jobs that are not running."""
+        connection = self._get_connection()
+        with connection:
+            connection.execute(f"""DELETE FROM jobs WHERE status IN ({', '.join('?' * len(JOB_FINAL_STATUSES))}) AND job_id NOT IN (
+                                   SELECT job_id FROM jobs ORDER BY submit_time DESC LIMIT ?)""",
+                               [*JOB_FINAL_STATUSES, self.max_job_history])
+            connection.execute("DELETE FROM job_log WHERE job_id NOT IN (SELECT job_id FROM jobs WHERE status = ?)", [JOB_STATUS_RUNNING])
+        connection.close()
@@ -0,0 +1,30 @@
+# Copyright IBM All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""Entry point of the job processes of the DoModelJobScheduler::
+
+    python -m dse_do_dashboard.utils.job_worker <args_filepath>
+
+A dedicated module instead of a multiprocessing 'spawn' process: 'spawn' re-imports the `__main__` module of the app
+in every job process, i.e. would create the DoDashApp again if the app script creates it at module level.
+"""
+import os
+import pickle
+import sys
+
+from dse_do_dashboard.utils.job_scheduler import _run_job_process
+
+
+def main(args_filepath: str):
+    """Runs a job with the arguments of `_run_job_process` pickled by `DoModelJobScheduler._start_job`.
+    The file starts with the `sys.path` of the app, so the modules of the runner_class can be imported. The file is deleted."""
+    with open(args_filepath, 'rb') as f:
+        for path in pickle.load(f):
+            if path not in sys.path:
+                sys.path.append(path)
+        args = pickle.load(f)
+    os.remove(args_filepath)
+    _run_job_process(**args)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1])
@@ -0,0 +1,54 @@
+# Copyright IBM All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Bounded, line-based log of a model run that can be read incrementally while the run is in progress.
+"""
+import threading
+from collections import deque
+from typing import Callable, List, Optional, Tuple
+
+
+class LogRingBuffer():
+    """Thread-safe ring buffer of log lines. Keeps the last `max_lines` lines.
+    Lines are numbered from the start of the log, so a reader can poll for the lines it has not seen yet.
+
+    Usage::
+
+        log_buffer = LogRingBuffer()
+        log_buffer.append('Solving\\n')
+        lines, next_line = log_buffer.get_lines(0)
+        ...
+        lines, next_line = log_buffer.get_lines(next_line)  # Only the new lines
+
+    """
+    def __init__(self, max_lines: int = 10000):
+        """
+        :param max_lines: maximum number of lines kept. Older lines are dropped.
+        """
+        self.max_lines = max_lines
+        self._lines: deque = deque(maxlen=max_lines)
+        self._num_lines = 0  # Total number of lines appended, i.e. the number of the next line
+        self._lock = threading.Lock()
+        self.listener: Optional[Callable[[str], None]] = None  # Called with each appended line, e.g. to forward to another process
+
+    def append(self, line: str):
+        """Appends a line. The line should include the newline."""
+        with self._lock:
+            self._lines.append(line)
+            self._num_lines += 1
+        if self.listener is not None:
+            self.listener(line)
+
+    def get_lines(self, start: int = 0) -> Tuple[List[str], int]:
+        """Returns the lines from line number `start` and the number of the next line.
+        If lines from `start` have already been dropped, returns all the lines that are kept."""
+        with self._lock:
+            first = self._num_lines - len(self._lines)  # Number of the oldest line kept
+            lines = list(self._lines)[max(start - first, 0):]
+            return lines, self._num_lines
+
+    def get_text(self) -> str:
+        """Returns the lines that are kept as one string."""
+        lines, _ = self.get_lines(0)
+        return "".join(lines)
@@ -0,0 +1,117 @@
+# Copyright IBM All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+In-process LRU cache for objects that cannot be stored in the Flask cache, e.g. a prepared DataManager or PlotlyManager.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+import pandas as pd
+
+
+def estimate_data_size(obj: Any, max_depth: int = 3) -> int:
+    """Approximate memory size in bytes of all DataFrames reachable from `obj`.
+    Follows dicts, lists/tuples and object attributes (e.g. the DataFrames of a DataManager, or the `dm` of a PlotlyManager).
+    Each DataFrame is counted once, even if referenced multiple times.
+
+    :param obj: DataFrame, collection or object with DataFrame attributes
+    :param max_depth: maximum nesting to follow
+    :return: size in bytes
+    """
+    seen = set()
+
+    def _size(o, depth: int) -> int:
+        if id(o) in seen or depth > max_depth:
+            return 0
+        seen.add(id(o))
+        if isinstance(o, (pd.DataFrame, pd.Series)):
+            usage = o.memory_usage(deep=True)
+            return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+        if isinstance(o, dict):
+            return sum(_size(v, depth + 1) for v in o.values())
+        if isinstance(o, (list, tuple)):
+            return sum(_size(v, depth + 1) for v in o)
+        if hasattr(o, '__dict__') and not isinstance(o, type):
+            return sum(_size(v, depth + 1) for v in vars(o).values())
+        return 0
+
+    return _size(obj, 0)
+
+
+class SizedLRUCache():
+    """Thread-safe least-recently-used cache, bounded by number of entries and by total (estimated) size in bytes.
+    Values are kept as Python objects, i.e. not serialized. So the cache is local to the process.
+
+    Usage::
+
+        cache = SizedLRUCache(max_entries=16, max_bytes=512 * 1024 * 1024)
+        value = cache.get(key)
+        if value is None:
+            value = create_value()
+            cache.put(key, value, estimate_data_size(value))
+
+    """
+    def __init__(self, max_entries: int = 16, max_bytes: Optional[int] = None):
+        """
+        :param max_entries: maximum number of entries. If 0, the cache is disabled.
+        :param max_bytes: maximum total size of the entries. If None, no size limit.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()  # key -> (value, size)
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable):
+        return key in self._entries
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Returns the value and marks it as most recently used, or None if not in cache."""
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key: Hashable, value: Any, size: int = 0):
+        """Adds the value. Evicts the least recently used entries until within the limits.
+        A value larger than `max_bytes` is not cached at all."""
+        if not self.enabled or (self.max_bytes is not None and size > self.max_bytes):
+            return
+        with self._lock:
+            self.remove(key)
+            self._entries[key] = (value, size)
+            self._total_bytes += size
+            while len(self._entries) > self.max_entries or (self.max_bytes is not None and self._total_bytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_size
+
+    def remove(self, key: Hashable):
+        with self._lock:
+            if key in self._entries:
+                _, size = self._entries.pop(key)
+                self._total_bytes -= size
+
+    def remove_if(self, predicate: Callable[[Hashable], bool]):
+        """Removes all entries for which `predicate(key)` is True."""
+        with self._lock:
+            for key in [k for k in self._entries.keys() if predicate(k)]:
+                self.remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
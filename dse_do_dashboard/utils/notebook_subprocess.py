@@ -0,0 +1,123 @@
+# Copyright IBM All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""Runs the code cells of a notebook in a separate Python process.
+
+Used by `DoNotebookRunner` with `run_in_subprocess=True`, instead of executing the notebook code in the web server process
+under `redirect_stdout` (which redirects stdout of all threads and only gives the log at the end):
+
+- The input and output DataFrames are exchanged as Parquet files in a temporary directory,
+  or as pickle files if pyarrow is not installed.
+- The stdout and stderr of the process are read line by line, e.g. into a `LogRingBuffer`, so the log can be shown while the notebook runs.
+
+The process runs this file as a script (i.e. without importing the dse_do_dashboard package, which keeps the start-up fast),
+with the path of a JSON file with the job: the code cells, the input files and the output directory.
+"""
+import json
+import linecache
+import os
+import subprocess
+import sys
+import tempfile
+import traceback
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+
+def run_notebook_in_subprocess(cells: List[Tuple[str, str]], inputs: Dict[str, pd.DataFrame],
+                               log_line: Optional[Callable[[str], None]] = None) -> Dict[str, pd.DataFrame]:
+    """Runs code cells in a new Python process. The cells see the `inputs` and add DataFrames to (or re-assign) `outputs`,
+    as in `DoNotebookRunner.run`. An exception in a cell stops the run and is printed in the log, like an in-process run.
+
+    :param cells: (filename, source) of the code cells, in order. The filename is shown in tracebacks.
+    :param inputs: input DataFrames by table name
+    :param log_line: called with each line of the stdout and stderr of the process, e.g. `LogRingBuffer.append`. If None, printed.
+    :return: output DataFrames by table name
+    """
+    file_format = get_dataframe_file_format()
+    if log_line is None:
+        log_line = lambda line: print(line, end='')
+    with tempfile.TemporaryDirectory(prefix='dse_do_notebook_') as work_dir:
+        input_dir = os.path.join(work_dir, 'inputs')
+        output_dir = os.path.join(work_dir, 'outputs')
+        os.makedirs(input_dir)
+        os.makedirs(output_dir)
+        input_files = {}
+        for i, (table_name, df) in enumerate(inputs.items()):
+            input_files[table_name] = os.path.join(input_dir, f"{i}.{file_format}")
+            _write_dataframe(df, input_files[table_name], file_format)
+        job_path = os.path.join(work_dir, 'job.json')
+        with open(job_path, 'w') as f:
+            json.dump({'cells': cells, 'input_files': input_files, 'output_dir': output_dir, 'file_format': file_format}, f)
+
+        process = subprocess.Popen([sys.executable, '-u', os.path.abspath(__file__), job_path],
+                                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                   text=True, errors='replace', bufsize=1)
+        try:
+            for line in process.stdout:
+                log_line(line)
+            process.wait()
+        finally:
+            if process.poll() is None:  # E.g. the job was cancelled
+                process.kill()
+                process.wait()
+            process.stdout.close()
+        if process.returncode != 0:
+            raise RuntimeError(f"Notebook process ended with exit code {process.returncode}")
+
+        with open(os.path.join(output_dir, 'outputs.json')) as f:
+            output_files = json.load(f)
+        return {table_name: _read_dataframe(filepath, file_format) for table_name, filepath in output_files.items()}
+
+
+def get_dataframe_file_format() -> str:
+    """Returns 'parquet' if pyarrow can be imported, else 'pickle'."""
+    try:
+        import pyarrow  # Optional dependency, for the Parquet files
+        return 'parquet'
+    except ImportError:
+        return 'pickle'
+
+
+def _write_dataframe(df: pd.DataFrame, filepath: str, file_format: str):
+    if file_format == 'parquet':
+        df.to_parquet(filepath)
+    else:
+        df.to_pickle(filepath)
+
+
+def _read_dataframe(filepath: str, file_format: str) -> pd.DataFrame:
+    if file_format == 'parquet':
+        return pd.read_parquet(filepath)
+    return pd.read_pickle(filepath)
+
+
+def _run_job(job_path: str):
+    """Entry point of the process. Loads the inputs, runs the cells and writes the outputs."""
+    with open(job_path) as f:
+        job = json.load(f)
+    file_format = job['file_format']
+    inputs = {table_name: _read_dataframe(filepath, file_format) for table_name, filepath in job['input_files'].items()}
+    exec_globals = {'__name__': '__main__', 'inputs': inputs, 'outputs': {}}
+    try:
+        for filename, source in job['cells']:
+            linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+            exec(compile(source, filename, 'exec'), exec_globals)
+    except Exception:
+        print("Exception")
+        traceback.print_exc(file=sys.stdout)
+
+    outputs = exec_globals.get('outputs', {})
+    output_files = {}
+    for i, (table_name, df) in enumerate(outputs.items()):
+        if not isinstance(df, pd.DataFrame):
+            print(f"Output {table_name} is not a DataFrame. Skipped.")
+            continue
+        output_files[table_name] = os.path.join(job['output_dir'], f"{i}.{file_format}")
+        _write_dataframe(df, output_files[table_name], file_format)
+    with open(os.path.join(job['output_dir'], 'outputs.json'), 'w') as f:
+        json.dump(output_files, f)
+
+
+if __name__ == '__main__':
+    _run_job(sys.argv[1])
@@ -0,0 +1,54 @@
+# Copyright IBM All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Coalescing of identical concurrent requests, e.g. two callbacks that need the same PlotlyManager at the same time.
+"""
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable, TypeVar
+
+T = TypeVar('T')
+
+
+class RequestCoalescer():
+    """Runs at most one computation per key at a time.
+    A call with the key of a computation in progress waits for it and gets the same result (or exception),
+    instead of doing the same work (e.g. DB reads and data preparation) again.
+    Does not keep results: combine with a cache, and check the cache in the computation.
+
+    Usage::
+
+        pm = cache.get(key)
+        if pm is None:
+            pm = coalescer.run(key, create_plotly_manager)
+
+    """
+    def __init__(self):
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def run(self, key: Hashable, compute: Callable[[], T]) -> T:
+        """Returns `compute()`, or the result of the computation with the same key that is in progress."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._in_flight[key] = future
+        if not is_owner:
+            return future.result()
+        try:
+            result = compute()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def num_in_flight(self) -> int:
+        with self._lock:
+            return len(self._in_flight)
@@ -0,0 +1,125 @@
+# Copyright IBM All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Progress of a model run: timings per phase, row counts, solver progress and memory use.
+A DoModelRunner pushes its progress into a `RunProgress`, which the Run Model page shows while the run is in progress.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+from docplex.mp.progress import ProgressListener
+
+try:
+    import resource  # Not available on Windows
+except ImportError:
+    resource = None
+
+
+def get_memory_high_water_mark_mb() -> Optional[float]:
+    """Returns the peak resident memory in MB of this process, or of a child process (e.g. a notebook run in a subprocess),
+    whichever is larger. None if not available on this platform."""
+    if resource is None:
+        return None
+    max_rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return max_rss / 1024  # ru_maxrss is in KB on Linux
+
+
+class RunProgress():
+    """Thread-safe progress of a model run. Serializes to a dict (see `to_dict`) for a dcc.Store or the job scheduler.
+
+    Usage::
+
+        progress.start_phase('load')
+        progress.set_row_counts('inputs', inputs)
+        progress.start_phase('solve')
+        progress.set_solver_progress(objective=1234.5, best_bound=1200, gap=0.028)
+        progress.end_phase()
+
+    """
+    def __init__(self, notify_interval: float = 0.5):
+        """
+        :param notify_interval: minimum number of seconds between calls of the `listener` for solver progress.
+        Phase changes are always notified.
+        """
+        self.notify_interval = notify_interval
+        self.listener: Optional[Callable[[Dict], None]] = None  # Called with `to_dict()` on a change, e.g. to forward to another process
+        self._phases: List[Dict[str, Any]] = []  # name, start, duration (None while running)
+        self._row_counts: Dict[str, Dict[str, int]] = {}
+        self._solver: Dict[str, Any] = {}
+        self._memory_mb: Optional[float] = None
+        self._last_notify_time = 0
+        self._lock = threading.Lock()
+
+    def start_phase(self, name: str):
+        """Ends the current phase (if any) and starts a new phase, e.g. 'load', 'solve' or 'write'."""
+        with self._lock:
+            self._end_phase()
+            self._phases.append({'name': name, 'start': time.time(), 'duration': None})
+        self._notify(force=True)
+
+    def end_phase(self):
+        with self._lock:
+            self._end_phase()
+        self._notify(force=True)
+
+    def _end_phase(self):
+        if len(self._phases) > 0 and self._phases[-1]['duration'] is None:
+            self._phases[-1]['duration'] = time.time() - self._phases[-1]['start']
+        self._memory_mb = get_memory_high_water_mark_mb()
+
+    def set_row_counts(self, category: str, dfs: Dict[str, pd.DataFrame]):
+        """Records the number of rows of the tables, e.g. of the 'inputs' or 'outputs'."""
+        with self._lock:
+            self._row_counts[category] = {table_name: int(df.shape[0]) for table_name, df in dfs.items() if isinstance(df, pd.DataFrame)}
+        self._notify(force=True)
+
+    def set_solver_progress(self, objective: Optional[float] = None, best_bound: Optional[float] = None,
+                            gap: Optional[float] = None, solve_time: Optional[float] = None):
+        """Records the latest progress of the solver, e.g. from a `DocplexProgressListener`."""
+        with self._lock:
+            self._solver = {'objective': objective, 'best_bound': best_bound, 'gap': gap, 'solve_time': solve_time,
+                            'updates': self._solver.get('updates', 0) + 1}
+        self._notify()
+
+    def to_dict(self) -> Dict:
+        """Returns the progress as a JSON-serializable dict, with the duration of a running phase up to now."""
+        with self._lock:
+            now = time.time()
+            phases = [{'name': phase['name'],
+                       'duration': phase['duration'] if phase['duration'] is not None else now - phase['start'],
+                       'running': phase['duration'] is None}
+                      for phase in self._phases]
+            return {'phases': phases,
+                    'row_counts': {category: dict(row_counts) for category, row_counts in self._row_counts.items()},
+                    'solver': dict(self._solver),
+                    'memory_mb': self._memory_mb if self._memory_mb is not None else get_memory_high_water_mark_mb()}
+
+    def _notify(self, force: bool = False):
+        if self.listener is None:
+            return
+        now = time.time()
+        if force or now - self._last_notify_time >= self.notify_interval:
+            self._last_notify_time = now
+            self.listener(self.to_dict())
+
+
+class DocplexProgressListener(ProgressListener):
+    """Pushes the MIP progress of a docplex Model (objective, best bound, gap) into a RunProgress.
+
+    Usage::
+
+        mdl.add_progress_listener(DocplexProgressListener(progress))
+
+    """
+    def __init__(self, progress: RunProgress):
+        super().__init__()
+        self.progress = progress
+
+    def notify_progress(self, progress_data):
+        self.progress.set_solver_progress(objective=progress_data.current_objective if progress_data.has_incumbent else None,
+                                          best_bound=progress_data.best_bound,
+                                          gap=progress_data.mip_gap if progress_data.has_incumbent else None,
+                                          solve_time=progress_data.time)
@@ -0,0 +1,115 @@
+# Copyright IBM All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""Fast export of all scenarios as a zip archive with one CSV or Parquet file per table.
+
+Each file contains the rows of all scenarios, with a `scenario_name` column, and is read with one query per table
+(instead of one query per scenario per table as in `ScenarioDbManager.read_scenario_from_db`).
+The archive is generated as a stream of bytes while the tables are read, so it can be sent to the client as it is built.
+"""
+import io
+import zipfile
+from typing import Iterator, List
+
+import pandas as pd
+import sqlalchemy
+from dse_do_utils.scenariodbmanager import ScenarioDbManager, ScenarioDbTable
+
+EXPORT_FILE_FORMATS = ['csv', 'parquet']
+EXPORT_CHUNK_SIZE = 100000  # Number of rows
+
+
+class _ZipStreamBuffer(io.RawIOBase):
+    """Write-only, non-seekable file for a `zipfile.ZipFile`. The bytes written so far are taken with `pop`.
+    Because it is not seekable, the ZipFile writes data descriptors after each member instead of seeking back."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def pop(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def get_all_scenarios_table_select(dbm: ScenarioDbManager, db_table: ScenarioDbTable):
+    """Returns a select of the rows of all scenarios of a table, with a `scenario_name` column (and no `scenario_seq`)."""
+    t: sqlalchemy.Table = db_table.get_sa_table()
+    if dbm.enable_scenario_seq:
+        s = dbm.get_scenario_sa_table()
+        columns = [c for c in t.c if c.name != 'scenario_seq']
+        sql = sqlalchemy.select(s.c.scenario_name, *columns).select_from(t.join(s, t.c.scenario_seq == s.c.scenario_seq))
+    else:
+        sql = t.select()
+    return sql
+
+
+def iter_all_scenarios_zip(dbm: ScenarioDbManager, file_format: str = 'csv', chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+    """Generates a zip archive with one file per scenario table (`<table name>.csv` or `<table name>.parquet`) with the rows of all scenarios.
+    Yields the bytes of the archive while it is built, i.e. after each chunk of rows.
+    Rows are fetched from the DB in chunks (`stream_results`), so memory use is in the order of one chunk.
+
+    Usage (Flask)::
+
+        return flask.Response(iter_all_scenarios_zip(dbm, 'csv'), mimetype='application/zip')
+
+    :param dbm: ScenarioDbManager
+    :param file_format: 'csv' or 'parquet'. Parquet requires pyarrow.
+    :param chunk_size: number of rows read from the DB and written at a time
+    """
+    if file_format not in EXPORT_FILE_FORMATS:
+        raise ValueError(f"Unsupported export file format '{file_format}'. Supported are {EXPORT_FILE_FORMATS}")
+    if file_format == 'parquet':
+        import pyarrow  # Optional dependency. Fail before starting the archive.
+
+    buffer = _ZipStreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as zip_file:
+        with dbm.engine.connect() as connection:
+            tables_in_db = sqlalchemy.inspect(connection).get_table_names(schema=dbm.schema)
+            for scenario_table_name, db_table in dbm.db_tables.items():
+                if scenario_table_name == 'Scenario' or db_table.db_table_name not in tables_in_db:
+                    continue
+                print(f"Export table {scenario_table_name}")
+                sql = get_all_scenarios_table_select(dbm, db_table)
+                chunks = pd.read_sql(sql, con=connection.execution_options(stream_results=True), chunksize=chunk_size)
+                with zip_file.open(f"{scenario_table_name}.{file_format}", 'w', force_zip64=True) as f:
+                    if file_format == 'csv':
+                        yield from _write_csv_chunks(chunks, f, buffer)
+                    else:
+                        yield from _write_parquet_chunks(chunks, f, buffer)
+                yield buffer.pop()
+    yield buffer.pop()
+
+
+def _write_csv_chunks(chunks: Iterator[pd.DataFrame], f, buffer: _ZipStreamBuffer) -> Iterator[bytes]:
+    header = True
+    for df in chunks:
+        f.write(df.to_csv(index=False, header=header).encode('utf-8'))
+        header = False
+        yield buffer.pop()
+
+
+def _write_parquet_chunks(chunks: Iterator[pd.DataFrame], f, buffer: _ZipStreamBuffer) -> Iterator[bytes]:
+    """Writes each chunk as a row group. The schema is taken from the first chunk."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    writer = None
+    try:
+        for df in chunks:
+            if writer is None:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                writer = pq.ParquetWriter(f, table.schema)
+            else:
+                table = pa.Table.from_pandas(df, schema=writer.schema, preserve_index=False)
+            writer.write_table(table)
+            yield buffer.pop()
+    finally:
+        if writer is not None:
+            writer.close()
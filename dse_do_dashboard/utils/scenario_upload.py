@@ -0,0 +1,331 @@
+# Copyright IBM All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""Streaming import of scenarios from uploaded .xlsx files into the DB.
+
+Instead of decoding the whole upload into memory, loading all sheets as DataFrames (`ScenarioManager.load_data_from_excel_s`)
+and then inserting the full scenario (`ScenarioDbManager.replace_scenario_in_db`), the upload is spooled to a file on disk,
+the workbook is opened in read-only mode and each sheet is inserted in chunks of rows.
+Peak memory is therefore in the order of one chunk of rows instead of the whole workbook.
+For a zip archive with many .xlsx files, `replace_scenarios_in_db_from_zip` can parse the files in a pool of processes
+into chunk files on disk, while the parsed scenarios are streamed from the chunk files into the DB.
+
+Note that the upload itself (the `contents` of the dcc.Upload, a base64 string) is still received in memory as a whole
+by the Dash callback: only the decoding, parsing and insert are bounded.
+"""
+import base64
+import collections
+import multiprocessing
+import os
+import pathlib
+import shutil
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import openpyxl
+import pandas as pd
+from dse_do_utils.scenariodbmanager import ScenarioDbManager
+
+UPLOAD_DECODE_CHUNK_SIZE = 4 * 1024 * 1024  # Number of base64 characters. Must be a multiple of 4.
+EXCEL_INSERT_CHUNK_SIZE = 10000  # Number of rows
+
+
+class ScenarioUploadResult(NamedTuple):
+    """Result of the upload of one file (e.g. a member of a zip archive)."""
+    filename: str
+    scenario_name: str
+    status: str  # 'uploaded', 'skipped' or 'error'
+    message: str
+
+
+class ScenarioUploadProgress(NamedTuple):
+    """Progress of an upload (e.g. of a zip archive), as shown while it runs."""
+    in_progress: bool
+    results: List[ScenarioUploadResult]  # Results of the files processed so far
+
+
+def decode_upload_contents_to_file(content_string: str, file) -> None:
+    """Base64-decodes the contents of a dcc.Upload in chunks and writes them to a (temporary) file.
+    Avoids holding a second, decoded, copy of the whole upload in memory.
+
+    :param content_string: base64 part of the `contents` of the dcc.Upload, i.e. after the ','
+    :param file: binary file object to write to
+    """
+    for i in range(0, len(content_string), UPLOAD_DECODE_CHUNK_SIZE):
+        file.write(base64.b64decode(content_string[i:i + UPLOAD_DECODE_CHUNK_SIZE]))
+    file.flush()
+
+
+def _iter_sheet_rows(ws) -> Iterator[tuple]:
+    """Iterates over the non-empty rows of a (read-only) worksheet as tuples of values."""
+    for row in ws.iter_rows(values_only=True):
+        if any(value is not None for value in row):
+            yield row
+
+
+def read_excel_table_index(wb, table_index_sheet: str = '_table_index_') -> Dict[str, Tuple[str, str]]:
+    """Reads the table index sheet of a workbook, as written by `ScenarioManager.write_data_to_excel_s`.
+
+    :return: dict of sheet_name -> (table_name, category). Empty if there is no table index sheet.
+    """
+    table_index = {}
+    if (table_index_sheet is not None) and (table_index_sheet in wb.sheetnames):
+        rows = _iter_sheet_rows(wb[table_index_sheet])
+        header = next(rows, None)
+        if header is not None:
+            columns = list(header)
+            for row in rows:
+                values = dict(zip(columns, row))
+                sheet_name = values.get('sheet_name')
+                table_name = values.get('table_name', sheet_name)
+                category = values.get('category', 'input')
+                table_index[sheet_name] = (table_name, category)
+    return table_index
+
+
+def iter_excel_sheet_chunks(ws, chunk_size: int = EXCEL_INSERT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Iterates over a (read-only) worksheet in DataFrames of at most `chunk_size` rows.
+    The first row is the header. Empty rows are skipped.
+    """
+    rows = _iter_sheet_rows(ws)
+    header = next(rows, None)
+    if header is None:
+        return
+    columns = list(header)
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield pd.DataFrame(chunk, columns=columns)
+            chunk = []
+    if len(chunk) > 0:
+        yield pd.DataFrame(chunk, columns=columns)
+
+
+def replace_scenario_in_db_from_excel(dbm: ScenarioDbManager, scenario_name: str, filepath,
+                                      chunk_size: int = EXCEL_INSERT_CHUNK_SIZE,
+                                      table_index_sheet: str = '_table_index_') -> Tuple[List[str], List[str]]:
+    """Insert or replace a scenario from an .xlsx file, streaming the sheets in chunks of rows into the DB.
+    Same semantics as `ScenarioManager.load_data_from_excel_s` followed by `dbm.replace_scenario_in_db`:
+    sheets are mapped to tables via the table index sheet, only tables defined in `dbm.db_tables` are inserted,
+    in the order of the `db_tables` (i.e. respecting FK constraints).
+    Runs in one transaction if `dbm.enable_transactions`.
+
+    :param dbm: ScenarioDbManager
+    :param scenario_name: Name of scenario
+    :param filepath: path of .xlsx file
+    :param chunk_size: max number of rows per bulk insert
+    :param table_index_sheet: Name of table index sheet
+    :return: tuple of the names of the input tables and output tables in the file
+    """
+    wb = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        sheets, input_table_names, output_table_names = _get_excel_table_sheets(wb, table_index_sheet)
+        table_chunks = {table_name: (lambda sheet_name=sheet_name: iter_excel_sheet_chunks(wb[sheet_name], chunk_size))
+                        for table_name, sheet_name in sheets.items()}
+        replace_scenario_in_db_from_chunks(dbm, scenario_name, table_chunks)
+    finally:
+        wb.close()
+    return input_table_names, output_table_names
+
+
+def _get_excel_table_sheets(wb, table_index_sheet: str = '_table_index_') -> Tuple[Dict[str, str], List[str], List[str]]:
+    """Maps the sheets of a workbook to tables via the table index sheet.
+
+    :return: tuple of a dict of table_name -> sheet_name, the names of the input tables and of the output tables
+    """
+    table_index = read_excel_table_index(wb, table_index_sheet)
+    sheets = {}  # table_name -> sheet_name
+    input_table_names = []
+    output_table_names = []
+    for sheet_name in wb.sheetnames:
+        if sheet_name != table_index_sheet:
+            table_name, category = table_index.get(sheet_name, (sheet_name, 'input'))
+            sheets[table_name] = sheet_name
+            if category == 'output':
+                output_table_names.append(table_name)
+            else:
+                input_table_names.append(table_name)
+    print("Input tables: {}".format(", ".join(input_table_names)))
+    print("Output tables: {}".format(", ".join(output_table_names)))
+    return sheets, input_table_names, output_table_names
+
+
+def replace_scenario_in_db_from_chunks(dbm: ScenarioDbManager, scenario_name: str,
+                                       table_chunks: Dict[str, Callable[[], Iterator[pd.DataFrame]]]):
+    """Insert or replace a scenario, inserting each table from an iterator of DataFrames (chunks of rows).
+    Only tables defined in `dbm.db_tables` are inserted, in the order of the `db_tables` (i.e. respecting FK constraints).
+    Runs in one transaction if `dbm.enable_transactions`.
+
+    :param dbm: ScenarioDbManager
+    :param scenario_name: Name of scenario
+    :param table_chunks: dict of table_name -> function returning the iterator of the chunks of the table
+    """
+    if dbm.enable_transactions:
+        print("Replacing scenario within transaction")
+    with dbm.engine.begin() as connection:  # Also without transactions: a Connection of SQLAlchemy 1.4 has no commit()
+        _replace_scenario_in_db_from_chunks(dbm, connection, scenario_name, table_chunks)
+
+
+def _replace_scenario_in_db_from_chunks(dbm: ScenarioDbManager, connection, scenario_name: str,
+                                        table_chunks: Dict[str, Callable[[], Iterator[pd.DataFrame]]]):
+    """See `replace_scenario_in_db_from_chunks` and `ScenarioDbManager._replace_scenario_in_db_transaction`."""
+    dbm._delete_scenario_from_db(scenario_name, connection=connection)
+
+    scenario_seq: Optional[int] = None
+    if dbm.enable_scenario_seq:
+        scenario_seq = dbm._get_or_create_scenario_in_scenario_table(scenario_name, connection)
+    else:
+        sa_scenario_table = dbm.get_scenario_db_table().get_sa_table()
+        connection.execute(sa_scenario_table.insert().values(scenario_name=scenario_name))
+
+    for scenario_table_name, db_table in dbm.db_tables.items():
+        if scenario_table_name == 'Scenario':
+            continue
+        if scenario_table_name not in table_chunks:
+            print(f"No table named {scenario_table_name} in inputs or outputs")
+            continue
+        num_rows = 0
+        for chunk in table_chunks[scenario_table_name]():
+            if scenario_seq is not None:
+                chunk = ScenarioDbManager.add_scenario_seq_to_dfs(scenario_seq, {scenario_table_name: chunk})[scenario_table_name]
+            else:
+                chunk = ScenarioDbManager.add_scenario_name_to_dfs(scenario_name, {scenario_table_name: chunk})[scenario_table_name]
+            db_table.insert_table_in_db_bulk(df=chunk, mgr=dbm, connection=connection)
+            num_rows += chunk.shape[0]
+        print(f"Inserted {num_rows} rows in {scenario_table_name}")
+
+
+def parse_excel_file_to_chunk_files(filepath, chunk_dir, chunk_size: int = EXCEL_INSERT_CHUNK_SIZE,
+                                    table_index_sheet: str = '_table_index_') -> Dict[str, List[str]]:
+    """Parses an .xlsx file in chunks of rows (see `iter_excel_sheet_chunks`) and pickles each chunk to a file in the chunk_dir.
+    Module level function, so it can run in a worker process. Memory use is in the order of one chunk.
+
+    :return: dict of table_name -> paths of the chunk files of the table, in order
+    """
+    os.makedirs(chunk_dir, exist_ok=True)
+    wb = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        sheets, _, _ = _get_excel_table_sheets(wb, table_index_sheet)
+        chunk_files = {}
+        for i, (table_name, sheet_name) in enumerate(sheets.items()):
+            chunk_files[table_name] = []
+            for j, chunk in enumerate(iter_excel_sheet_chunks(wb[sheet_name], chunk_size)):
+                chunk_filepath = os.path.join(chunk_dir, f"table_{i}_chunk_{j}.pickle")
+                chunk.to_pickle(chunk_filepath)
+                chunk_files[table_name].append(chunk_filepath)
+    finally:
+        wb.close()
+    return chunk_files
+
+
+def _iter_chunk_files(chunk_filepaths: List[str]) -> Iterator[pd.DataFrame]:
+    """Loads the chunk files written by `parse_excel_file_to_chunk_files` one at a time."""
+    for chunk_filepath in chunk_filepaths:
+        yield pd.read_pickle(chunk_filepath)
+
+
+def replace_scenarios_in_db_from_zip(dbm: ScenarioDbManager, zip_filepath, work_dir, max_workers: int = 1,
+                                     progress_callback: Optional[Callable[[ScenarioUploadResult], None]] = None) -> List[ScenarioUploadResult]:
+    """Insert or replace the scenarios of all .xlsx files in a zip archive. Other files are skipped.
+    The name of the .xlsx file is used as the scenario name.
+
+    If `max_workers` <= 1, the files are processed one at a time with `replace_scenario_in_db_from_excel`.
+    Otherwise, parsing (CPU-bound) and writing to the DB (I/O-bound) overlap:
+    the .xlsx files are parsed in a pool of `max_workers` processes (started with 'spawn') into chunk files on disk
+    (`parse_excel_file_to_chunk_files`), while the calling thread streams the parsed scenarios from the chunk files
+    into the DB in the order of the archive. Memory use is in the order of one chunk of rows per process.
+    At most 2 * `max_workers` files are extracted or parsed ahead of the DB writer, which bounds the disk use.
+    Like any 'spawn' process, the worker processes import the `__main__` module of the app: create the app
+    under `if __name__ == '__main__':` in the script that starts it, or the worker processes create the app as well.
+    An error in one file is reported in its result and does not stop the other files.
+
+    :param dbm: ScenarioDbManager
+    :param zip_filepath: path of .zip file
+    :param work_dir: directory to extract the .xlsx files to
+    :param max_workers: number of processes parsing the .xlsx files
+    :param progress_callback: called with the result of each file when done, in the order of the archive
+    :return: results, in the order of the archive
+    """
+    results = []
+
+    def report(result: ScenarioUploadResult):
+        print(f"{result.filename}: {result.status} {result.message}")
+        results.append(result)
+        if progress_callback is not None:
+            progress_callback(result)
+
+    with zipfile.ZipFile(zip_filepath) as zip_file:
+        infos = zip_file.infolist()
+        if max_workers <= 1:
+            for info in infos:
+                scenario_name = pathlib.Path(info.filename).stem
+                if pathlib.Path(info.filename).suffix != '.xlsx':
+                    report(ScenarioUploadResult(info.filename, scenario_name, 'skipped', 'Not a .xlsx'))
+                    continue
+                try:
+                    filepath = _extract_zip_member(zip_file, info, work_dir, 0)
+                    replace_scenario_in_db_from_excel(dbm, scenario_name, filepath)
+                    report(ScenarioUploadResult(info.filename, scenario_name, 'uploaded', ''))
+                except Exception as e:
+                    report(ScenarioUploadResult(info.filename, scenario_name, 'error', str(e)))
+                finally:
+                    _remove_zip_member_files(work_dir, 0)
+            return results
+
+        max_pending = 2 * max_workers
+        pending = collections.deque()  # Bounded queue of (info, index, future or error) between the parse and the DB write stage
+        members = iter(enumerate(infos))
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            while True:
+                # Parse stage: keep the queue filled
+                while len(pending) < max_pending:
+                    i, info = next(members, (None, None))
+                    if info is None:
+                        break
+                    if pathlib.Path(info.filename).suffix != '.xlsx':
+                        pending.append((info, i, None))
+                        continue
+                    try:
+                        filepath = _extract_zip_member(zip_file, info, work_dir, i)
+                        pending.append((info, i, executor.submit(parse_excel_file_to_chunk_files, filepath,
+                                                                 os.path.join(work_dir, f"member_{i}_chunks"))))
+                    except Exception as e:  # E.g. a corrupt member
+                        pending.append((info, i, e))
+                if len(pending) == 0:
+                    break
+                # DB write stage: write the oldest scenario
+                info, i, future = pending.popleft()
+                scenario_name = pathlib.Path(info.filename).stem
+                if future is None:
+                    report(ScenarioUploadResult(info.filename, scenario_name, 'skipped', 'Not a .xlsx'))
+                    continue
+                try:
+                    if isinstance(future, Exception):
+                        raise future
+                    chunk_files = future.result()
+                    replace_scenario_in_db_from_chunks(dbm, scenario_name,
+                                                       {table_name: (lambda paths=paths: _iter_chunk_files(paths))
+                                                        for table_name, paths in chunk_files.items()})
+                    report(ScenarioUploadResult(info.filename, scenario_name, 'uploaded', ''))
+                except Exception as e:
+                    report(ScenarioUploadResult(info.filename, scenario_name, 'error', str(e)))
+                finally:
+                    _remove_zip_member_files(work_dir, i)
+    return results
+
+
+def _extract_zip_member(zip_file: zipfile.ZipFile, info: zipfile.ZipInfo, work_dir, index: int) -> str:
+    """Extracts one member of a zip archive to a uniquely named file in the work_dir (streaming, i.e. not in memory)."""
+    filepath = os.path.join(work_dir, f"member_{index}.xlsx")
+    with zip_file.open(info) as src, open(filepath, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    return filepath
+
+
+def _remove_zip_member_files(work_dir, index: int):
+    """Removes the extracted file and the chunk files of a member of a zip archive, if any."""
+    filepath = os.path.join(work_dir, f"member_{index}.xlsx")
+    if os.path.exists(filepath):
+        os.remove(filepath)
+    shutil.rmtree(os.path.join(work_dir, f"member_{index}_chunks"), ignore_errors=True)
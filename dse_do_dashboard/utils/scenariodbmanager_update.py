@@ -7,10 +7,61 @@ import pandas as pd
 import sqlalchemy
 from dse_do_utils.scenariodbmanager import ScenarioDbManager, ScenarioDbTable, DbCellUpdate
 
+from dse_do_dashboard.utils.dash_common_utils import ScenarioTableSchema
+
 #  Typing aliases
 Inputs = Dict[str, pd.DataFrame]
 Outputs = Dict[str, pd.DataFrame]
 
+
+def read_scenario_tables_from_db_batched(dbm: ScenarioDbManager, scenario_name: str,
+                                         scenario_table_names: List[str]) -> Dict[str, pd.DataFrame]:
+    """Reads a set of tables of one scenario in one round of statements on a single connection (and transaction, if enabled).
+    Compared to calling `dbm.read_scenario_table_from_db` per table, this avoids a connection checkout and transaction per table,
+    and, with `enable_scenario_seq`, resolves the `scenario_seq` once instead of joining the scenario table in every query.
+    Works with any ScenarioDbManager, so can be used by the DoDashApp regardless of the database_manager_class.
+
+    :param dbm: ScenarioDbManager
+    :param scenario_name: Name of scenario
+    :param scenario_table_names: Names of scenario tables (not the DB table names)
+    :return: dict of scenario table name -> DataFrame, same as `read_scenario_table_from_db` would return
+    """
+    for scenario_table_name in scenario_table_names:
+        if scenario_table_name not in dbm.db_tables:
+            raise ValueError(f"Scenario table name '{scenario_table_name}' unknown. Cannot load data from DB.")
+
+    if dbm.enable_transactions:
+        with dbm.engine.begin() as connection:
+            dfs = _read_scenario_tables_from_db_batched(dbm, connection, scenario_name, scenario_table_names)
+    else:
+        with dbm.engine.connect() as connection:
+            dfs = _read_scenario_tables_from_db_batched(dbm, connection, scenario_name, scenario_table_names)
+    return dfs
+
+
+def _read_scenario_tables_from_db_batched(dbm: ScenarioDbManager, connection, scenario_name: str,
+                                          scenario_table_names: List[str]) -> Dict[str, pd.DataFrame]:
+    if dbm.enable_scenario_seq:
+        key_column = 'scenario_seq'
+        key_value = dbm._get_scenario_seq(scenario_name, connection)
+    else:
+        key_column = 'scenario_name'
+        key_value = scenario_name
+
+    dfs = {}
+    for scenario_table_name in scenario_table_names:
+        db_table: ScenarioDbTable = dbm.db_tables[scenario_table_name]
+        t: sqlalchemy.Table = db_table.get_sa_table()
+        if key_value is None:  # Scenario doesn't exist: return empty table with the proper columns
+            sql = t.select().where(sqlalchemy.false())
+        else:
+            sql = t.select().where(t.c[key_column] == key_value)
+        df = pd.read_sql(sql, con=connection)
+        if db_table.db_table_name != 'scenario':
+            df = df.drop(columns=[key_column])
+        dfs[scenario_table_name] = df
+    return dfs
+
 #########################################
 # Added to dse-do-utils v 0.5.3.2b
 #########################################
@@ -24,6 +75,216 @@ Outputs = Dict[str, pd.DataFrame]
 #     row_idx: int  # Not used for DB operation
 
 
+def update_cell_changes_in_db_bulk(dbm: ScenarioDbManager, db_cell_updates: List[DbCellUpdate]):
+    """Bulk version of `dbm.update_cell_changes_in_db`. Applies all cell updates in one transaction.
+    1. Multiple updates of the same cell are collapsed to the last (i.e. final) value
+    2. Updates of the same row are combined into one UPDATE
+    3. Rows of the same table with the same set of updated columns are updated with one `executemany`
+    Works with any ScenarioDbManager.
+
+    If one of the updates changes a primary-key column, the order of the updates matters.
+    In that case, the updates are applied one by one (but still in one transaction).
+
+    :param dbm: ScenarioDbManager
+    :param db_cell_updates: ordered list of cell updates, e.g. from the diff store of the PrepareDataPageEdit
+    """
+    if len(db_cell_updates) == 0:
+        return
+    with dbm.engine.begin() as connection:
+        if any(u.column_name in [pk['column'] for pk in u.row_index] for u in db_cell_updates):
+            dbm._update_cell_changes_in_db(db_cell_updates, connection=connection)
+        else:
+            _update_cell_changes_in_db_bulk(dbm, connection, db_cell_updates)
+
+
+def _update_cell_changes_in_db_bulk(dbm: ScenarioDbManager, connection, db_cell_updates: List[DbCellUpdate]):
+    # Collapse to one dict of column -> final value per row. A row is identified by (scenario, table, primary-key values)
+    row_updates: Dict[tuple, Dict[str, Any]] = {}
+    for u in db_cell_updates:
+        row_key = (u.scenario_name, u.table_name, tuple((pk['column'], pk['value']) for pk in u.row_index))
+        row_updates.setdefault(row_key, {})[u.column_name] = u.current_value
+
+    # Group rows by table, primary-key columns and updated columns, i.e. rows that can share one UPDATE statement
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    scenario_keys: Dict[str, Any] = {}
+    for (scenario_name, table_name, row_index), values in row_updates.items():
+        if scenario_name not in scenario_keys:
+            scenario_keys[scenario_name] = (dbm._get_scenario_seq(scenario_name, connection) if dbm.enable_scenario_seq else scenario_name)
+        if scenario_keys[scenario_name] is None:
+            print(f"Scenario '{scenario_name}' not found. Skipped cell updates.")
+            continue
+        pk_columns = tuple(column for column, _ in row_index)
+        value_columns = tuple(sorted(values.keys()))
+        params = {'b_scenario_key': scenario_keys[scenario_name]}
+        params.update({f'b_pk_{i}': value for i, (_, value) in enumerate(row_index)})
+        params.update({f'b_value_{i}': values[column] for i, column in enumerate(value_columns)})
+        groups.setdefault((table_name, pk_columns, value_columns), []).append(params)
+
+    key_column_name = 'scenario_seq' if dbm.enable_scenario_seq else 'scenario_name'
+    for (table_name, pk_columns, value_columns), params_list in groups.items():
+        db_table: ScenarioDbTable = dbm.db_tables[table_name]
+        t: sqlalchemy.Table = db_table.get_sa_table()
+        pk_conditions = [(db_table.get_sa_column(column) == sqlalchemy.bindparam(f'b_pk_{i}')) for i, column in enumerate(pk_columns)]
+        sql = (t.update()
+               .where(sqlalchemy.and_((t.c[key_column_name] == sqlalchemy.bindparam('b_scenario_key')), *pk_conditions))
+               .values({db_table.get_sa_column(column): sqlalchemy.bindparam(f'b_value_{i}') for i, column in enumerate(value_columns)}))
+        print(f"Update {len(params_list)} rows in {table_name} ({', '.join(value_columns)})")
+        connection.execute(sql, params_list)  # executemany
+
+
+def update_scenario_output_tables_in_db_diff(dbm: ScenarioDbManager, scenario_name: str, outputs: Outputs,
+                                             table_schemas: Optional[Dict[str, ScenarioTableSchema]] = None) -> List[str]:
+    """Differential version of `dbm.update_scenario_output_tables_in_db`, with the same end result.
+    Compares the new outputs with the output tables stored in the DB, matching rows on the `index_columns` of the
+    ScenarioTableSchema of the table, and only deletes, updates and inserts the rows that differ.
+    All in one transaction (if enabled). For large outputs where a re-solve changes few rows, this is much faster than
+    deleting and inserting all rows.
+    Output tables without a ScenarioTableSchema (or with duplicate index values, or index columns that cannot be compared
+    with the DB, e.g. of another type) are deleted and inserted as before.
+    Output tables not in the outputs are deleted. Columns of the DB table that are not in the output are set to NULL.
+
+    :param dbm: ScenarioDbManager
+    :param scenario_name: Name of scenario
+    :param outputs: the new output tables
+    :param table_schemas: ScenarioTableSchema by table name, see `DoDashApp.get_table_schemas`
+    :return: names of the output tables that changed in the DB, e.g. to evict them from a cache
+    """
+    if table_schemas is None:
+        table_schemas = {}
+    with dbm.engine.begin() as connection:  # Also without transactions: a Connection of SQLAlchemy 1.4 has no commit()
+        changed = _update_scenario_output_tables_in_db_diff(dbm, connection, scenario_name, outputs, table_schemas)
+    return changed
+
+
+class _OutputTableDiff(NamedTuple):
+    """Changes to one output table. If `replace`, all rows are deleted and the `inserts` are all rows."""
+    replace: bool
+    pk_columns: List[str]
+    deletes: pd.DataFrame  # pk columns
+    updates: pd.DataFrame  # pk and value columns
+    inserts: pd.DataFrame  # all columns
+
+
+def _update_scenario_output_tables_in_db_diff(dbm: ScenarioDbManager, connection, scenario_name: str, outputs: Outputs,
+                                              table_schemas: Dict[str, ScenarioTableSchema]) -> List[str]:
+    if dbm.enable_scenario_seq:
+        key_column = 'scenario_seq'
+        key_value = dbm._get_scenario_seq(scenario_name, connection)
+    else:
+        key_column = 'scenario_name'
+        key_value = scenario_name
+
+    # 1. Compare
+    diffs: Dict[str, _OutputTableDiff] = {}
+    for scenario_table_name, db_table in dbm.output_db_tables.items():
+        if scenario_table_name == 'Scenario':
+            continue
+        t: sqlalchemy.Table = db_table.get_sa_table()
+        db_columns = [c.name for c in t.columns if c.name != key_column]
+        if scenario_table_name in outputs:
+            df = outputs[scenario_table_name]
+            if dbm.enable_astype:
+                df = db_table._set_df_column_types(df)
+            missing_columns = [c for c in db_columns if c not in df.columns and c not in t.primary_key.columns.keys()]
+            df = df.assign(**{c: None for c in missing_columns})  # NULL, as after a delete and insert
+            df = df[[c for c in db_columns if c in df.columns]]
+        else:
+            df = pd.DataFrame(columns=db_columns)
+
+        table_schema = table_schemas.get(scenario_table_name)
+        pk_columns = list(table_schema.index_columns) if table_schema is not None else []
+        diff = None
+        if len(pk_columns) > 0 and all(c in df.columns for c in pk_columns) and not df.duplicated(pk_columns).any():
+            old_df = pd.read_sql(t.select().where(t.c[key_column] == key_value), con=connection).drop(columns=[key_column])
+            try:
+                diff = _get_output_table_diff(old_df, df, pk_columns)
+            except (TypeError, ValueError) as e:  # E.g. values that cannot be compared
+                print(f"Cannot compare {scenario_table_name} with the DB ({e}). Replace all rows.")
+        if diff is None:
+            diff = _OutputTableDiff(True, pk_columns, df.iloc[0:0], df.iloc[0:0], df)
+        diffs[scenario_table_name] = diff
+
+    # 2. Delete, in reverse order to avoid FK violations
+    for scenario_table_name, db_table in reversed(dbm.output_db_tables.items()):
+        if scenario_table_name not in diffs:
+            continue
+        diff = diffs[scenario_table_name]
+        if diff.replace:
+            db_table._delete_scenario_table_from_db(scenario_name, connection)
+        elif diff.deletes.shape[0] > 0:
+            t = db_table.get_sa_table()
+            pk_conditions = [(t.c[column] == sqlalchemy.bindparam(f'b_pk_{i}')) for i, column in enumerate(diff.pk_columns)]
+            sql = t.delete().where(sqlalchemy.and_((t.c[key_column] == sqlalchemy.bindparam('b_scenario_key')), *pk_conditions))
+            print(f"Delete {diff.deletes.shape[0]} rows in {scenario_table_name}")
+            connection.execute(sql, _get_bind_params(diff.deletes, key_value, pk_columns=diff.pk_columns))
+
+    # 3. Update and insert
+    for scenario_table_name, db_table in dbm.output_db_tables.items():
+        if scenario_table_name not in diffs:
+            continue
+        diff = diffs[scenario_table_name]
+        if diff.updates.shape[0] > 0:
+            t = db_table.get_sa_table()
+            value_columns = [c for c in diff.updates.columns if c not in diff.pk_columns]
+            pk_conditions = [(t.c[column] == sqlalchemy.bindparam(f'b_pk_{i}')) for i, column in enumerate(diff.pk_columns)]
+            sql = (t.update()
+                   .where(sqlalchemy.and_((t.c[key_column] == sqlalchemy.bindparam('b_scenario_key')), *pk_conditions))
+                   .values({t.c[column]: sqlalchemy.bindparam(f'b_value_{i}') for i, column in enumerate(value_columns)}))
+            print(f"Update {diff.updates.shape[0]} rows in {scenario_table_name}")
+            connection.execute(sql, _get_bind_params(diff.updates, key_value, pk_columns=diff.pk_columns, value_columns=value_columns))
+        if diff.inserts.shape[0] > 0:
+            print(f"Insert {diff.inserts.shape[0]} rows in {scenario_table_name}")
+            inserts = diff.inserts.copy()
+            inserts[key_column] = key_value
+            db_table.insert_table_in_db_bulk(df=inserts, mgr=dbm, connection=connection, enable_astype=dbm.enable_astype)
+    return [scenario_table_name for scenario_table_name, diff in diffs.items()
+            if diff.replace or diff.deletes.shape[0] > 0 or diff.updates.shape[0] > 0 or diff.inserts.shape[0] > 0]
+
+
+def _get_output_table_diff(old_df: pd.DataFrame, df: pd.DataFrame, pk_columns: List[str]) -> Optional[_OutputTableDiff]:
+    """Compares the rows of an output table in the DB (`old_df`) with the new rows (`df`), matching rows on the pk_columns.
+    The pk columns of `df` are cast to the dtypes of the pk columns read from the DB.
+
+    :return: the diff, or None if a pk column cannot be cast without changing its values
+    """
+    df_keys = df[pk_columns].copy()
+    for c in pk_columns:
+        if df_keys[c].dtype != old_df[c].dtype:
+            cast = df_keys[c].astype(old_df[c].dtype)
+            if not ((cast.astype(df_keys[c].dtype) == df_keys[c]) | df_keys[c].isna()).all():  # Not lossless, e.g. float to int
+                print(f"Index column {c} of type {df_keys[c].dtype} cannot be compared with the DB type {old_df[c].dtype}")
+                return None
+            df_keys[c] = cast
+    value_columns = [c for c in df.columns if c not in pk_columns and c in old_df.columns]
+    new_df = pd.concat([df_keys, df[value_columns]], axis=1).assign(_position=range(df.shape[0]))
+    merged = old_df[pk_columns + value_columns].merge(new_df, on=pk_columns, how='outer',
+                                                      suffixes=('_old', ''), indicator=True)
+    both = merged[merged['_merge'] == 'both']
+    changed = pd.Series(False, index=both.index)
+    for c in value_columns:
+        old_values, new_values = both[f'{c}_old'], both[c]
+        changed |= ~((old_values == new_values) | (old_values.isna() & new_values.isna()))
+    return _OutputTableDiff(
+        replace=False,
+        pk_columns=pk_columns,
+        deletes=merged.loc[merged['_merge'] == 'left_only', pk_columns],
+        updates=both.loc[changed, pk_columns + value_columns],
+        inserts=df.iloc[merged.loc[merged['_merge'] == 'right_only', '_position'].astype(int)],
+    )
+
+
+def _get_bind_params(df: pd.DataFrame, scenario_key, pk_columns: List[str], value_columns: List[str] = []) -> List[Dict[str, Any]]:
+    """Parameters for an executemany with bindparams `b_scenario_key`, `b_pk_<i>` and `b_value_<i>`.
+    Converts to Python types, and NaN to None."""
+    df = df.astype(object).where(df.notna(), None)
+    names = {**{column: f'b_pk_{i}' for i, column in enumerate(pk_columns)},
+             **{column: f'b_value_{i}' for i, column in enumerate(value_columns)}}
+    params = df[pk_columns + value_columns].rename(columns=names).to_dict('records')
+    for p in params:
+        p['b_scenario_key'] = scenario_key
+    return params
+
+
 class ScenarioDbManagerUpdate(ScenarioDbManager):
     """
     DEPRECATED - was used to develop DB features that are now migrated to dse-do-utils
@@ -37,6 +298,25 @@ class ScenarioDbManagerUpdate(ScenarioDbManager):
                  enable_transactions: bool = True, enable_sqlite_fk: bool = True):
         super().__init__(input_db_tables, output_db_tables, credentials, schema, echo, multi_scenario, enable_transactions, enable_sqlite_fk)
 
+    ############################################################################################
+    # Batched read and update
+    ############################################################################################
+    def read_scenario_tables_from_db_batched(self, scenario_name: str, scenario_table_names: List[str]) -> Dict[str, pd.DataFrame]:
+        """Read a set of tables of one scenario using a single connection/transaction.
+        See `read_scenario_tables_from_db_batched`."""
+        return read_scenario_tables_from_db_batched(self, scenario_name, scenario_table_names)
+
+    def update_cell_changes_in_db_bulk(self, db_cell_updates: List[DbCellUpdate]):
+        """Update a set of cells in the DB in one transaction, using executemany.
+        See `update_cell_changes_in_db_bulk`."""
+        update_cell_changes_in_db_bulk(self, db_cell_updates)
+
+    def update_scenario_output_tables_in_db_diff(self, scenario_name: str, outputs: Outputs,
+                                                 table_schemas: Optional[Dict[str, ScenarioTableSchema]] = None) -> List[str]:
+        """Update the output tables, only writing the rows that changed.
+        See `update_scenario_output_tables_in_db_diff`."""
+        return update_scenario_output_tables_in_db_diff(self, scenario_name, outputs, table_schemas)
+
 
     ############################################################################################
     # Update scenario
@@ -0,0 +1,167 @@
+# Copyright IBM All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""Snapshot of the schema information that the DoDashApp derives at start-up from the ScenarioDbManager.
+
+The table schemas, pivot table configurations and the names of the input and output tables only depend on the code
+(the ScenarioDbTable and ScenarioDbManager classes and the DoDashApp subclass) and on the arguments of the app that
+change the tables (e.g. `db_manager_kwargs`), not on the data.
+They are stored in a local file, keyed by a hash of the source files of these classes and of the arguments. The snapshot lists the classes
+that the ScenarioDbManager used, so the key can be checked without creating it. On the next start,
+if the key matches, the snapshot is loaded and the ScenarioDbManager (i.e. the DB connection) is only created
+when a request needs data.
+Classes without a source file (e.g. defined in a notebook) cannot be checked: then no snapshot is used.
+"""
+import hashlib
+import importlib
+import os
+import pickle
+import sys
+import uuid
+from typing import Any, Dict, List, NamedTuple, Optional, Set
+
+import dse_do_utils
+import sqlalchemy
+from dse_do_utils.scenariodbmanager import ScenarioDbManager, ScenarioDbTable
+
+from dse_do_dashboard.utils.dash_common_utils import ScenarioTableSchema, PivotTableConfig
+from dse_do_dashboard.version import __version__
+
+
+class SchemaSnapshot(NamedTuple):
+    key: str  # See `get_schema_snapshot_key`
+    class_paths: List[str]  # The classes of the key: the DoDashApp subclass, the ScenarioDbManager class and the classes of its tables
+    table_schemas: Dict[str, ScenarioTableSchema]
+    pivot_table_configs: Dict[str, PivotTableConfig]
+    input_table_names: List[str]  # Keys of `dbm.input_db_tables`, including 'Scenario'
+    output_table_names: List[str]  # Keys of `dbm.output_db_tables`
+
+
+def get_class_path(cls: type) -> str:
+    """Returns 'module:qualname' of the class, see `resolve_class_path`."""
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def resolve_class_path(class_path: str) -> Optional[type]:
+    """Returns the class for a path of `get_class_path`, importing its module if needed. None if it cannot be found."""
+    module_name, _, qualname = class_path.partition(':')
+    try:
+        obj = importlib.import_module(module_name)
+        for name in qualname.split('.'):
+            obj = getattr(obj, name)
+    except Exception:
+        return None
+    return obj if isinstance(obj, type) else None
+
+
+def get_arguments_signature(value: Any) -> Optional[str]:
+    """Returns a string that identifies the value of an argument that changes the tables (e.g. the `db_manager_kwargs`
+    of the DoDashApp), for `get_schema_snapshot_key`. ScenarioDbTables passed as argument are described by their columns and constraints.
+
+    :return: the signature, or None if the value has no stable description, i.e. its repr includes its memory address
+    """
+    if isinstance(value, dict):
+        items = [(get_arguments_signature(k), get_arguments_signature(v)) for k, v in value.items()]
+        if any(k is None or v is None for k, v in items):
+            return None
+        return '{' + ', '.join(f"{k}: {v}" for k, v in items) + '}'
+    if isinstance(value, (list, tuple)):
+        items = [get_arguments_signature(v) for v in value]
+        return None if any(v is None for v in items) else '[' + ', '.join(items) + ']'
+    if isinstance(value, type):
+        return get_class_path(value)
+    if isinstance(value, ScenarioDbTable):
+        return get_arguments_signature([get_class_path(type(value)), value.db_table_name, value.columns_metadata, value.constraints_metadata])
+    if isinstance(value, sqlalchemy.Column):
+        return (f"Column({value.name}, {value.type!r}, primary_key={value.primary_key}, nullable={value.nullable}, "
+                f"foreign_keys={sorted(fk.target_fullname for fk in value.foreign_keys)})")
+    if isinstance(value, sqlalchemy.ForeignKeyConstraint):
+        return f"ForeignKeyConstraint({list(value.column_keys)}, {[element.target_fullname for element in value.elements]})"
+    signature = repr(value)
+    return None if ' at 0x' in signature else signature
+
+
+def get_schema_snapshot_key(*classes: type, arguments: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """Returns a key for a SchemaSnapshot: the sha256 of the source files that define
+    the classes and their base classes (e.g. the DoDashApp subclass, the ScenarioDbManager class and the ScenarioDbTable classes),
+    of the arguments that change the tables (see `DoDashApp.get_schema_snapshot_arguments`),
+    and the versions of dse_do_utils and dse_do_dashboard.
+    Changing any of these files or arguments changes the key.
+
+    :param arguments: dict of name -> value, see `get_arguments_signature`
+    :return: the key, or None if a class has no source file (e.g. a class defined in a notebook)
+    or an argument has no stable description, i.e. a snapshot cannot be checked
+    """
+    arguments_signature = get_arguments_signature(arguments if arguments is not None else {})
+    if arguments_signature is None:
+        print("No schema snapshot: the arguments of the app cannot be compared between runs")
+        return None
+    filepaths: Set[str] = set()
+    for cls in classes:
+        for base_class in cls.__mro__:
+            if base_class.__module__ == 'builtins':
+                continue
+            module = sys.modules.get(base_class.__module__)
+            filepath = getattr(module, '__file__', None)
+            if filepath is None or not os.path.isfile(filepath):
+                print(f"No schema snapshot: class {get_class_path(base_class)} has no source file")
+                return None
+            filepaths.add(os.path.abspath(filepath))
+    sha = hashlib.sha256()
+    sha.update(f"{dse_do_utils.__version__}|{__version__}|{arguments_signature}".encode('utf-8'))
+    for filepath in sorted(filepaths):
+        sha.update(filepath.encode('utf-8'))
+        with open(filepath, 'rb') as f:
+            sha.update(f.read())
+    return sha.hexdigest()
+
+
+def get_schema_snapshot_classes(app_class: type, dbm: ScenarioDbManager) -> List[type]:
+    """The classes of the key of a SchemaSnapshot (see `SchemaSnapshot.class_paths`), from the ScenarioDbManager."""
+    classes = [app_class, type(dbm)]
+    for db_table in dbm.db_tables.values():
+        if type(db_table) not in classes:
+            classes.append(type(db_table))
+    return classes
+
+
+def load_schema_snapshot(filepath: str, app_class: type, database_manager_class: Optional[type] = None,
+                         arguments: Optional[Dict[str, Any]] = None) -> Optional[SchemaSnapshot]:
+    """Returns the SchemaSnapshot in the file, or None if the file does not exist, cannot be read or does not match the code.
+    Imports the classes listed in the snapshot and checks the key against their source files and the arguments.
+
+    :param app_class: the DoDashApp subclass
+    :param database_manager_class: the ScenarioDbManager class, if known
+    :param arguments: the arguments of the app that change the tables, see `get_schema_snapshot_key`
+    """
+    if not os.path.exists(filepath):
+        return None
+    try:
+        with open(filepath, 'rb') as f:
+            snapshot = pickle.load(f)
+    except Exception as e:
+        print(f"Cannot read schema snapshot {filepath}: {e}")
+        return None
+    if not isinstance(snapshot, SchemaSnapshot) or len(snapshot.class_paths) < 2:
+        return None
+    if snapshot.class_paths[0] != get_class_path(app_class):
+        return None
+    if database_manager_class is not None and snapshot.class_paths[1] != get_class_path(database_manager_class):
+        return None
+    classes = [resolve_class_path(class_path) for class_path in snapshot.class_paths]
+    if any(cls is None for cls in classes) or get_schema_snapshot_key(*classes, arguments=arguments) != snapshot.key:
+        return None
+    return snapshot
+
+
+def save_schema_snapshot(filepath: str, snapshot: SchemaSnapshot):
+    """Writes the snapshot to a temporary file first and then moves it in place, so concurrent workers never read a partial file."""
+    if os.path.dirname(filepath) != '':
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    tmp_filepath = f"{filepath}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_filepath, 'wb') as f:
+            pickle.dump(snapshot, f)
+        os.replace(tmp_filepath, filepath)
+    finally:
+        if os.path.exists(tmp_filepath):
+            os.remove(tmp_filepath)
@@ -1,5 +1,4 @@
-from abc import abstractmethod
-from typing import List
+from typing import Callable, List, Optional
 
 from dash import dcc
 import dash_bootstrap_components as dbc
@@ -14,10 +13,16 @@ from dse_do_utils.plotlymanager import PlotlyManager
 
 
 class Plotly1ColumnVisualizationPage(VisualizationPage):
+    """Creates a 1 column layout of Plotly Figures. Override the method `get_plotly_figures`.
+
+    With `enable_incremental_figures`, override `get_plotly_figure_functions` instead.
+    The page then shows a placeholder for each figure and each figure is created by its own callback.
+    """
     def __init__(self, dash_app, page_name:str='Default', page_id:str='default', url:str='default',
                  input_table_names: List[str] = [], output_table_names: List[str] = [],
                  enable_reference_scenario: bool = False,
-                 enable_multi_scenario: bool = False):
+                 enable_multi_scenario: bool = False,
+                 enable_incremental_figures: bool = False):
         super().__init__(dash_app=dash_app,
                          page_name=page_name,
                          page_id=page_id,
@@ -27,10 +32,29 @@ class Plotly1ColumnVisualizationPage(VisualizationPage):
                          enable_reference_scenario=enable_reference_scenario,
                          enable_multi_scenario=enable_multi_scenario
                          )
+        self.enable_incremental_figures = enable_incremental_figures
 
-    @abstractmethod
     def get_plotly_figures(self, pm: PlotlyManager) -> List[Figure]:
-        return []
+        """Override this method or `get_plotly_figure_functions`. By default, calls the `get_plotly_figure_functions`."""
+        figure_functions = self.get_plotly_figure_functions()
+        if figure_functions is None:
+            raise NotImplementedError(f"Visualization page {self.page_id} needs to override get_plotly_figures or get_plotly_figure_functions")
+        return [figure_function(pm) for figure_function in figure_functions]
+
+    def get_plotly_figure_functions(self) -> Optional[List[Callable[[PlotlyManager], Figure]]]:
+        """Functions that each create one figure from the PlotlyManager, e.g. `[MyPlotlyManager.plotly_demand_pie]`.
+        Required for `enable_incremental_figures`, where each figure is created on its own."""
+        return None
+
+    def validate_async_figures(self):
+        """Also checks that the page overrides `get_plotly_figures` or `get_plotly_figure_functions`.
+
+        :raises ValueError: if the page overrides neither
+        """
+        super().validate_async_figures()
+        if (type(self).get_plotly_figures is Plotly1ColumnVisualizationPage.get_plotly_figures
+                and type(self).get_plotly_figure_functions is Plotly1ColumnVisualizationPage.get_plotly_figure_functions):
+            raise ValueError(f"Visualization page {self.page_id} does not override get_plotly_figures or get_plotly_figure_functions")
 
     def get_layout_children(self, pm: PlotlyManager):
         """Automatic 1 Column layout of all Plotly Figures.
@@ -39,22 +63,40 @@ class Plotly1ColumnVisualizationPage(VisualizationPage):
         :param pm:
         :return:
         """
+        return self.get_column_layout_children([
+            dcc.Graph(
+                figure=fig,
+                # style={'height': '100vh', 'width': '79vw'},
+            )
+            for fig in self.get_plotly_figures(pm)
+        ])
+
+    def get_column_layout_children(self, graphs: List) -> List:
+        """Puts each graph in a dbc.Card in its own dbc.Row."""
         layout_children = [
             dbc.Row(
                 dbc.Col(
                     dbc.Card([
                         ##       dbc.CardHeader(""),
                         dbc.CardBody(
-                            dcc.Graph(
-                                figure=fig,
-                                # style={'height': '100vh', 'width': '79vw'},
-                            )
+                            graph
                         )
                     ])
                     # , width=12
                 )
             )
-            for fig in self.get_plotly_figures(pm)
+            for graph in graphs
         ]
 
         return layout_children
+
+    def get_incremental_layout_children(self, scenario_name: str,
+                                        reference_scenario_name: str = None, multi_scenario_names: List[str] = None) -> Optional[List]:
+        """With `enable_incremental_figures`, a placeholder for each figure."""
+        if not self.enable_incremental_figures:
+            return None
+        return self.get_column_layout_children([
+            self.get_async_figure_graph(index, scenario_name, reference_scenario_name=reference_scenario_name,
+                                        multi_scenario_names=multi_scenario_names)
+            for index in range(len(self.get_plotly_figure_functions()))
+        ])
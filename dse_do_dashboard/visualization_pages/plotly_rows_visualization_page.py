@@ -2,8 +2,7 @@
 # SPDX-License-Identifier: Apache-2.0
 from __future__ import annotations
 
-from abc import abstractmethod
-from typing import List, NamedTuple
+from typing import Callable, List, NamedTuple, Optional
 
 from dash import dcc
 import dash_bootstrap_components as dbc
@@ -13,16 +12,23 @@ from dse_do_dashboard.do_dash_app import DoDashApp
 from dse_do_dashboard.visualization_pages.visualization_page import VisualizationPage
 from dse_do_utils.plotlymanager import PlotlyManager
 
+FigureFunction = Callable[[PlotlyManager], go.Figure]
+
 
 class PlotlyRowsVisualizationPage(VisualizationPage):
     """Abstract class. Creates a layout of Plotly Figures in a row format.
     Each row can contain a variable set of figures.
     Override the method `get_plotly_figures`.
+
+    With `enable_incremental_figures`, override `get_plotly_figure_functions` instead.
+    The page then shows a placeholder for each figure and each figure is created by its own callback,
+    so the figures are computed concurrently and a slow figure does not hold up the others.
     """
     def __init__(self, dash_app: DoDashApp, page_name: str = 'Default', page_id: str = 'default', url: str = 'default',
                  input_table_names: List[str] = [], output_table_names: List[str] = [],
                  enable_reference_scenario: bool = False,
-                 enable_multi_scenario: bool = False):
+                 enable_multi_scenario: bool = False,
+                 enable_incremental_figures: bool = False):
         super().__init__(dash_app=dash_app,
                          page_name=page_name,
                          page_id=page_id,
@@ -32,37 +38,72 @@ class PlotlyRowsVisualizationPage(VisualizationPage):
                          enable_reference_scenario=enable_reference_scenario,
                          enable_multi_scenario=enable_multi_scenario,
                          )
+        self.enable_incremental_figures = enable_incremental_figures
 
-    @abstractmethod
     def get_plotly_figures(self, pm: PlotlyManager) -> List[List[go.Figure] | go.Figure]:
         """
         Update 20240323: if row with one Figure, can also return Figure instead of list with one Figure.
         This makes this compatible with Plotly1ColumnVisualizationPage
+        Override this method or `get_plotly_figure_functions`. By default, calls the `get_plotly_figure_functions`.
         :returns List of Lists of Plotly Figures. One for each row.
         """
-        rows=[]
-        return rows
+        figure_functions = self.get_plotly_figure_functions()
+        if figure_functions is None:
+            raise NotImplementedError(f"Visualization page {self.page_id} needs to override get_plotly_figures or get_plotly_figure_functions")
+        return [[figure_function(pm) for figure_function in row] if isinstance(row, list) else row(pm)
+                for row in figure_functions]
+
+    def get_plotly_figure_functions(self) -> Optional[List[List[FigureFunction] | FigureFunction]]:
+        """Functions that each create one figure from the PlotlyManager, in the same rows as `get_plotly_figures`.
+        Required for `enable_incremental_figures`, where each figure is created on its own.
+
+        Usage::
+
+            def get_plotly_figure_functions(self):
+                return [
+                    MyPlotlyManager.plotly_demand_pie,
+                    [MyPlotlyManager.plotly_kpi_gauge_1, lambda pm: pm.plotly_kpi_gauge(kpi_name='Cost')],
+                ]
+
+        """
+        return None
+
+    def validate_async_figures(self):
+        """Also checks that the page overrides `get_plotly_figures` or `get_plotly_figure_functions`.
+
+        :raises ValueError: if the page overrides neither
+        """
+        super().validate_async_figures()
+        if (type(self).get_plotly_figures is PlotlyRowsVisualizationPage.get_plotly_figures
+                and type(self).get_plotly_figure_functions is PlotlyRowsVisualizationPage.get_plotly_figure_functions):
+            raise ValueError(f"Visualization page {self.page_id} does not override get_plotly_figures or get_plotly_figure_functions")
 
     def get_layout_children(self, pm: PlotlyManager):
         """Creates a layout for KPI gauges with multiple rows and columns.
         Each row can contain any number of columns.
         """
         figures = self.get_plotly_figures(pm=pm)
+        return self.get_rows_layout_children(figures, lambda figure: dcc.Graph(
+            # style=figure_style,  # VT_20240323: disabled style
+            figure=figure
+        ))
 
+    def get_rows_layout_children(self, rows: List, get_graph: Callable) -> List:
+        """Creates a dbc.Row for each row, with each figure in a dbc.Card.
+        :param rows: list of rows. A row is a list of items or a single item.
+        :param get_graph: creates the graph component from an item, e.g. a dcc.Graph from a Figure
+        """
         # figure_style = {'height': '20vh', 'width': '20vw', 'margin-left': 'auto', 'margin-right': 'auto',
         #                'display': 'block'}
         layout_childen = []
 
-        for figure_row in figures:
+        for figure_row in rows:
             if isinstance(figure_row, list):  # VT-20240323:
                 row_layout = dbc.Row([
                     dbc.Col(
                         dbc.Card([
                             dbc.CardBody(
-                                dcc.Graph(
-                                    # style=figure_style,  # VT_20240323: disabled style
-                                    figure=figure
-                                )
+                                get_graph(figure)
                             )
                         ])
                     )
@@ -74,9 +115,7 @@ class PlotlyRowsVisualizationPage(VisualizationPage):
                     dbc.Col(
                         dbc.Card([
                             dbc.CardBody(
-                                dcc.Graph(
-                                    figure=figure,
-                                )
+                                get_graph(figure)
                             )
                         ])
                         # , width=12
@@ -85,3 +124,20 @@ class PlotlyRowsVisualizationPage(VisualizationPage):
             layout_childen.append(row_layout)
 
         return layout_childen
+
+    def get_incremental_layout_children(self, scenario_name: str,
+                                        reference_scenario_name: str = None, multi_scenario_names: List[str] = None) -> Optional[List]:
+        """With `enable_incremental_figures`, the rows with a placeholder for each figure, numbered in row order."""
+        if not self.enable_incremental_figures:
+            return None
+        index = 0
+        index_rows = []
+        for row in self.get_plotly_figure_functions():
+            if isinstance(row, list):
+                index_rows.append(list(range(index, index + len(row))))
+                index += len(row)
+            else:
+                index_rows.append(index)
+                index += 1
+        return self.get_rows_layout_children(index_rows, lambda i: self.get_async_figure_graph(
+            i, scenario_name, reference_scenario_name=reference_scenario_name, multi_scenario_names=multi_scenario_names))
@@ -2,8 +2,10 @@
 # SPDX-License-Identifier: Apache-2.0
 
 from abc import ABC, abstractmethod
-from typing import List, Optional
-from dash import html
+from typing import Callable, List, Optional
+import flask
+from dash import dcc, html
+import plotly.graph_objs as go
 # from dse_do_dashboard.do_dash_app import DoDashApp
 from dse_do_dashboard.main_pages.not_found import NotFoundPage
 from dse_do_utils.plotlymanager import PlotlyManager
@@ -51,6 +53,10 @@ class VisualizationPage(ABC):
         self.output_table_names = output_table_names  # Names of output tables required for any of the plots in this page
         self.enable_reference_scenario = enable_reference_scenario
         self.enable_multi_scenario = enable_multi_scenario
+        # Use the figure cache of the DoDashApp for the layout. If None, only if the page has no callbacks,
+        # since callbacks of interactive pages typically use `self.pm`, which is not set on a cache hit:
+        self.enable_figure_cache: Optional[bool] = None
+        self._last_pm: Optional[PlotlyManager] = None  # See `pm`
         # if len(input_table_names) == 1 and input_table_names[0] == '*':
         #     self.input_table_names = dash_app.get_input_table_names()
         # else:
@@ -63,18 +69,30 @@ class VisualizationPage(ABC):
         * We are NOT using pattern-matching callback anynore, so the `id` of the Div is no long relevant
         * Do we need 2 Divs? (This is what worked so far)
         """
-        self.pm = self.get_plotly_manager(scenario_name,
-                                          reference_scenario_name=reference_scenario_name,
-                                          multi_scenario_names=multi_scenario_names,
-                                          enable_reference_scenario=self.enable_reference_scenario,
-                                          enable_multi_scenario=self.enable_multi_scenario)
+        layout_children = self.get_incremental_layout_children(scenario_name,
+                                                               reference_scenario_name=reference_scenario_name,
+                                                               multi_scenario_names=multi_scenario_names)
+        if layout_children is not None:
+            pass  # Placeholders only. The figures are loaded by the `async_figure_callback` of the DoDashApp
+        elif self.use_figure_cache():
+            layout_children = self.dash_app.get_visualization_page_children_cached(self, scenario_name,
+                                                                                   reference_scenario_name=reference_scenario_name,
+                                                                                   multi_scenario_names=multi_scenario_names)
+        else:
+            pm = self.get_plotly_manager(scenario_name,
+                                         reference_scenario_name=reference_scenario_name,
+                                         multi_scenario_names=multi_scenario_names,
+                                         enable_reference_scenario=self.enable_reference_scenario,
+                                         enable_multi_scenario=self.enable_multi_scenario)
+            self.pm = pm
+            layout_children = self.get_layout_children(pm)
         layout = html.Div([
             html.Div(
                 id={
                     'type': 'tab_layout',
                     'index': self.page_id
                 },
-                children=self.get_layout_children(self.pm),
+                children=layout_children,
                 # children=self.get_layout_children(self.get_plotly_manager(scenario_name,
                 #                                                           reference_scenario_name=reference_scenario_name,
                 #                                                           multi_scenario_names=multi_scenario_names,
@@ -84,6 +102,26 @@ class VisualizationPage(ABC):
         ])
         return layout
 
+    @property
+    def pm(self) -> Optional[PlotlyManager]:
+        """The PlotlyManager of the `get_layout` of this page in the current request.
+        Outside such a request (e.g. in a later callback of an interactive page), the PlotlyManager of the last `get_layout`
+        in any request, which may be for another user or scenario.
+        In callbacks, prefer `get_plotly_manager` with the scenario from a State: it is served from the `plotly_manager_cache`."""
+        if flask.has_request_context():
+            request_pms = flask.g.get('visualization_page_pms')
+            if request_pms is not None and self.page_id in request_pms:
+                return request_pms[self.page_id]
+        return self._last_pm
+
+    @pm.setter
+    def pm(self, pm: Optional[PlotlyManager]):
+        self._last_pm = pm
+        if flask.has_request_context():
+            if 'visualization_page_pms' not in flask.g:
+                flask.g.visualization_page_pms = {}
+            flask.g.visualization_page_pms[self.page_id] = pm
+
     @abstractmethod
     def get_layout_children(self, pm: PlotlyManager) -> List:
         """Abstract method. To be overridden.
@@ -117,6 +155,67 @@ class VisualizationPage(ABC):
         layout = NotFoundPage().get_layout("Default Visualization Page. Need to override the `get_layout_children` method.")
         return layout
 
+    def get_incremental_layout_children(self, scenario_name: str,
+                                        reference_scenario_name: str = None, multi_scenario_names: List[str] = None) -> Optional[List]:
+        """Returns the layout children with a placeholder (see `get_async_figure_graph`) for each figure,
+        if the page loads its figures incrementally. Then `get_layout` does not create a PlotlyManager.
+        Returns None (default) if the page creates its layout in `get_layout_children`."""
+        return None
+
+    def get_async_figure_graph(self, index: int, scenario_name: str,
+                               reference_scenario_name: str = None, multi_scenario_names: List[str] = None):
+        """Placeholder for figure `index` of the page: a dcc.Graph that is filled in by the `async_figure_callback` of the DoDashApp,
+        which calls `get_async_figure`. Each figure has its own callback request, so the figures are computed concurrently
+        and show as soon as they are done."""
+        request = {'scenario_name': scenario_name,
+                   'reference_scenario_name': reference_scenario_name,
+                   'multi_scenario_names': multi_scenario_names}
+        return html.Div([
+            dcc.Store(id={'type': 'async_figure_request', 'page_id': self.page_id, 'index': index}, data=request),
+            dcc.Loading(dcc.Graph(id={'type': 'async_figure', 'page_id': self.page_id, 'index': index})),
+        ])
+
+    def get_async_figure(self, pm: PlotlyManager, index: int) -> go.Figure:
+        """Creates figure `index` of a page with placeholders (see `get_async_figure_graph`).
+        By default, calls function `index` of `get_async_figure_functions`. Override for other ways to create the figures."""
+        figure_functions = self.get_async_figure_functions()
+        if figure_functions is None or not 0 <= index < len(figure_functions):
+            raise ValueError(f"Visualization page {self.page_id} has no figure function {index} for get_async_figure")
+        return figure_functions[index](pm)
+
+    def get_async_figure_functions(self) -> Optional[List[Callable[[PlotlyManager], go.Figure]]]:
+        """The functions that create the figures of the placeholders, in order of their index.
+        By default, the `get_plotly_figure_functions` of the page (as in the Plotly pages), with rows flattened. None if it has none."""
+        get_plotly_figure_functions = getattr(self, 'get_plotly_figure_functions', None)
+        figure_functions = get_plotly_figure_functions() if get_plotly_figure_functions is not None else None
+        if figure_functions is None:
+            return None
+        flattened = []
+        for row in figure_functions:
+            flattened.extend(row if isinstance(row, list) else [row])
+        return flattened
+
+    def validate_async_figures(self):
+        """Checks that a page with incremental figures (see `get_incremental_layout_children`) can create its figures,
+        i.e. overrides `get_async_figure` or has `get_async_figure_functions`. Called when the page is registered.
+
+        :raises ValueError: if the page cannot create its figures
+        """
+        if (type(self).get_incremental_layout_children is not VisualizationPage.get_incremental_layout_children
+                and getattr(self, 'enable_incremental_figures', True)
+                and type(self).get_async_figure is VisualizationPage.get_async_figure
+                and self.get_async_figure_functions() is None):
+            raise ValueError(f"Visualization page {self.page_id} loads its figures incrementally, "
+                             f"but does not implement get_async_figure or get_plotly_figure_functions")
+
+    def use_figure_cache(self) -> bool:
+        """Returns True if the layout of this page is taken from the figure cache of the DoDashApp (see `enable_figure_cache`)."""
+        if not getattr(self.dash_app, 'enable_figure_cache', False):
+            return False
+        if self.enable_figure_cache is not None:
+            return self.enable_figure_cache
+        return type(self).set_dash_callbacks is VisualizationPage.set_dash_callbacks
+
     def get_input_table_names(self) -> List[str]:
         """Return the specified table-names.
         Does the 'pattern-matching' based on the '*' option to include all tables.
@@ -0,0 +1,142 @@
+# Copyright IBM All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""Registry of the VisualizationPages of a DoDashApp, with lazy import of the pages.
+
+Instead of an instance, a VisualizationPage can be declared with a `VisualizationPageSpec`:
+the dotted path of its class and the page_name, page_id and url that the menus and tabs need.
+The spec is the source of these values: a created page that differs is warned about and gets the values of the spec.
+The module of the page (and whatever it imports, e.g. plotly.express or folium) is only imported,
+and the page only created, on the first navigation to the page.
+
+Dash needs all callbacks to be registered before the app serves its first request.
+So the callbacks of a lazy page are declared in the spec as `VisualizationPageCallbackStub`s.
+The registry registers these at start-up, and they call a method of the page, creating it if needed.
+
+Usage::
+
+    visualization_pages = [
+        VisualizationPageSpec('my_app.visualization_pages.kpi_page.KpiPage', page_name='KPIs', page_id='kpi_tab', url='kpi'),
+        VisualizationPageSpec('my_app.visualization_pages.demand_page.DemandPage', page_name='Demand', page_id='demand_tab', url='demand',
+                              callback_stubs=[
+                                  VisualizationPageCallbackStub('update_demand_graph_callback',
+                                                                outputs=Output('demand_graph', 'figure'),
+                                                                inputs=[Input('demand_product_drpdwn', 'value')]),
+                              ]),
+    ]
+
+"""
+import importlib
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Union
+
+from dse_do_dashboard.visualization_pages.visualization_page import VisualizationPage
+
+
+class VisualizationPageCallbackStub(NamedTuple):
+    """A Dash callback of a lazily created VisualizationPage.
+    Registered at start-up. Calls the method `method_name` of the page with the values of the inputs and states."""
+    method_name: str
+    outputs: Any  # Output or list of Outputs
+    inputs: Any  # Input or list of Inputs
+    states: Optional[List] = None  # List of States
+    prevent_initial_call: Optional[bool] = None
+
+
+class VisualizationPageSpec(NamedTuple):
+    """Declaration of a VisualizationPage that is imported and created on first use."""
+    class_path: str  # Dotted path of the VisualizationPage subclass, e.g. 'my_app.visualization_pages.kpi_page.KpiPage'
+    page_name: str  # As shown in the menu and tab. Overrides the page_name of the page.
+    page_id: str  # Overrides the page_id of the page
+    url: str  # Overrides the url of the page
+    kwargs: Optional[Dict[str, Any]] = None  # Additional keyword arguments for the constructor of the page
+    callback_stubs: Optional[List[VisualizationPageCallbackStub]] = None
+
+
+VisualizationPageEntry = Union[VisualizationPage, VisualizationPageSpec]
+
+
+def import_from_dotted_path(dotted_path: str):
+    """Returns the class (or other attribute of a module) for a dotted path 'package.module.ClassName'.
+    Also accepts 'package.module:ClassName'."""
+    if ':' in dotted_path:
+        module_name, attr_name = dotted_path.split(':', 1)
+    else:
+        module_name, attr_name = dotted_path.rsplit('.', 1)
+    module = importlib.import_module(module_name)
+    return getattr(module, attr_name)
+
+
+class VisualizationPageRegistry():
+    """The VisualizationPages of a DoDashApp by page_id and url.
+    Entries are VisualizationPage instances or VisualizationPageSpecs. A spec is replaced by its page on first use (thread-safe).
+    """
+    def __init__(self, dash_app, visualization_pages: List[VisualizationPageEntry]):
+        """
+        :param dash_app: DoDashApp
+        :param visualization_pages: VisualizationPage instances and/or VisualizationPageSpecs, in menu order.
+        """
+        self.dash_app = dash_app
+        self.entries: List[VisualizationPageEntry] = list(visualization_pages)
+        self.entries_by_page_id: Dict[str, VisualizationPageEntry] = {entry.page_id: entry for entry in self.entries}
+        self.entries_by_url: Dict[str, VisualizationPageEntry] = {entry.url: entry for entry in self.entries}
+        self._pages: Dict[str, VisualizationPage] = {entry.page_id: entry for entry in self.entries
+                                                     if not isinstance(entry, VisualizationPageSpec)}
+        for page in self._pages.values():
+            page.validate_async_figures()
+        self._lock = threading.Lock()
+
+    def get_page(self, page_id: str) -> Optional[VisualizationPage]:
+        """Returns the VisualizationPage, importing and creating it if it was declared by a spec. None if the page_id is unknown."""
+        page = self._pages.get(page_id)
+        if page is None and page_id in self.entries_by_page_id:
+            with self._lock:
+                page = self._pages.get(page_id)
+                if page is None:
+                    page = self._create_page(self.entries_by_page_id[page_id])
+                    self._pages[page_id] = page
+        return page
+
+    def get_page_by_url(self, url: str) -> Optional[VisualizationPage]:
+        """Returns the VisualizationPage for the url (without the 'visualization/' prefix). None if unknown."""
+        entry = self.entries_by_url.get(url)
+        return self.get_page(entry.page_id) if entry is not None else None
+
+    def is_loaded(self, page_id: str) -> bool:
+        return page_id in self._pages
+
+    def _create_page(self, spec: VisualizationPageSpec) -> VisualizationPage:
+        start_time = time.time()
+        page_class = import_from_dotted_path(spec.class_path)
+        page = page_class(self.dash_app, **(spec.kwargs or {}))
+        page.validate_async_figures()
+        print(f"Created visualization page {spec.page_id} ({spec.class_path}) in {time.time() - start_time:.2f} sec")
+        if (page.page_name, page.page_id, page.url) != (spec.page_name, spec.page_id, spec.url):
+            print(f"Warning: page_name, page_id and url of {spec.class_path} ({page.page_name}, {page.page_id}, {page.url}) "
+                  f"do not match its VisualizationPageSpec ({spec.page_name}, {spec.page_id}, {spec.url}). Using the values of the spec.")
+            # The menus, tabs and routing were built from the spec before the page existed:
+            page.page_name, page.page_id, page.url = spec.page_name, spec.page_id, spec.url
+        if not spec.callback_stubs and type(page).set_dash_callbacks is not VisualizationPage.set_dash_callbacks:
+            print(f"Warning: {spec.class_path} defines set_dash_callbacks, which is not called for a page declared with a VisualizationPageSpec. "
+                  f"Declare its callbacks in the `callback_stubs` of the spec.")
+        if spec.callback_stubs and page.enable_figure_cache is None:
+            page.enable_figure_cache = False  # Its callbacks may use `page.pm`, see `VisualizationPage.use_figure_cache`
+        return page
+
+    def set_dash_callbacks(self):
+        """Registers the callbacks of the VisualizationPage instances and the callback stubs of the specs.
+        Does not import any page."""
+        for entry in self.entries:
+            if isinstance(entry, VisualizationPageSpec):
+                for callback_stub in (entry.callback_stubs or []):
+                    self._set_callback_stub(entry.page_id, callback_stub)
+            else:
+                entry.set_dash_callbacks()
+
+    def _set_callback_stub(self, page_id: str, callback_stub: VisualizationPageCallbackStub):
+        app = self.dash_app.app
+
+        @app.callback(callback_stub.outputs, callback_stub.inputs, callback_stub.states or [],
+                      prevent_initial_call=callback_stub.prevent_initial_call)
+        def page_callback(*args):
+            return getattr(self.get_page(page_id), callback_stub.method_name)(*args)
@@ -54,8 +54,8 @@ setuptools.setup(
     url="https://github.com/IBM/dse-do-dashboard",
     packages=setuptools.find_packages(),
     install_requires=[
-        'dse-do-utils>=0.5.4.2',
-        'dash',
+        'dse-do-utils~=0.5.8.1',  # Uses private methods of the ScenarioDbManager
+        'dash>=2.9',  # dash.Patch
         'flask_caching',
         'dash_bootstrap_components',
         'dash-bootstrap-templates',
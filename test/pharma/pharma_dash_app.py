@@ -6,34 +6,21 @@ from dse_do_dashboard.main_pages.main_page import MainPage
 from dse_do_dashboard.main_pages.prepare_data_page_edit import PrepareDataPageEdit
 from dse_do_dashboard.main_pages.run_model_page import RunModelPage
 from dse_do_dashboard.main_pages.visualization_tabs_page import VisualizationTabsPage
-from pharma.visualization_pages.capacity_page import CapacityPage
-from pharma.visualization_pages.demand_fulfillment_page import DemandFulfillmentPage
-from pharma.visualization_pages.demand_fulfillment_scroll_page import DemandFulfillmentScrollPage
-from pharma.visualization_pages.demand_page import DemandPage
-from pharma.visualization_pages.inventory_dos_page import InventoryDosPage
-from pharma.visualization_pages.inventory_page import InventoryPage
-from pharma.visualization_pages.kpi_page import KpiPage
-from pharma.visualization_pages.maps_page import MapsPage
-from pharma.visualization_pages.planned_production_page import PlannedProductionPage
-from pharma.visualization_pages.production_page import ProductionPage
-from pharma.visualization_pages.supply_page import SupplyPage
-from pharma.visualization_pages.transportation_page import TransportationPage
-from pharma.visualization_pages.utilization_page import UtilizationPage
 from dse_do_dashboard.do_dash_app import DoDashApp
 from dse_do_dashboard.utils.dash_common_utils import PivotTableConfig, ScenarioTableSchema, ForeignKeySchema
-from supply_chain.pharma.pharmadatamanager import PharmaDataManager
-from supply_chain.pharma.pharmaplotlymanager import PharmaPlotlyManager
+from dse_do_dashboard.visualization_pages.visualization_page_registry import VisualizationPageSpec
 from supply_chain.pharma.pharmascenariodbtables import PharmaScenarioDbManager
 
 """
 How-To create a DO Dashboard:
 1. Subclass DoDashApp
 2. In the `__init__()`, specify:
-   - visualization_pages: a list of instances of subclasses of VisualizationPage.
+   - visualization_pages: a list of instances of subclasses of VisualizationPage,
+     or of VisualizationPageSpecs to import the page modules on first use.
    - logo_file_name (optional) - Needs to be located in the Dash `assets` folder
    - database_manager_class (required) - Subclass of ScenarioDbManager
-   - data_manager_class (required) - Subclass of DataManager
-   - plotly_manager_class (required) - Subclass of PlotlyManager
+   - data_manager_class (required) - Subclass of DataManager (or its dotted path)
+   - plotly_manager_class (required) - Subclass of PlotlyManager (or its dotted path)
 3. Specify pivot-table configurations and table-schemas by overriding the methods:
    - get_pivot_table_configs (optional)
    - get_table_schemas (optional)
@@ -46,26 +33,27 @@ How-To create a DO Dashboard:
 class PharmaDashApp(DoDashApp):
     def __init__(self, db_credentials: Dict, schema: str = None, db_echo: bool = False, cache_config: Dict = None,
                  port: int = 8050, dash_debug: bool = False, host_env: str = None):
+        # Page modules (and the plotly.express/folium imports of the PharmaPlotlyManager) are imported on first use:
         visualization_pages = [
-            KpiPage(self),
-            DemandPage(self),
-            CapacityPage(self),
-            ProductionPage(self),
-            PlannedProductionPage(self),
-            SupplyPage(self),
-            DemandFulfillmentPage(self),
-            DemandFulfillmentScrollPage(self),
-            InventoryPage(self),
-            InventoryDosPage(self),
-            UtilizationPage(self),
-            TransportationPage(self),
-            MapsPage(self),
+            VisualizationPageSpec('pharma.visualization_pages.kpi_page.KpiPage', 'KPIs', 'kpi_tab', 'kpi'),
+            VisualizationPageSpec('pharma.visualization_pages.demand_page.DemandPage', 'Demand', 'demand_tab', 'demand'),
+            VisualizationPageSpec('pharma.visualization_pages.capacity_page.CapacityPage', 'Capacity', 'capacity_tab', 'capacity'),
+            VisualizationPageSpec('pharma.visualization_pages.production_page.ProductionPage', 'Production', 'production_tab', 'production'),
+            VisualizationPageSpec('pharma.visualization_pages.planned_production_page.PlannedProductionPage', 'Planned Production', 'planned_production_tab', 'planned_production'),
+            VisualizationPageSpec('pharma.visualization_pages.supply_page.SupplyPage', 'Supply Flow', 'supply_tab', 'supply'),
+            VisualizationPageSpec('pharma.visualization_pages.demand_fulfillment_page.DemandFulfillmentPage', 'Demand Fulfillment', 'demand_fulfillment_tab', 'demand_fulfillment'),
+            VisualizationPageSpec('pharma.visualization_pages.demand_fulfillment_scroll_page.DemandFulfillmentScrollPage', 'Demand Fulfillment Scroll', 'demand_fulfillment_scroll_tab', 'demand_fulfillment_scroll'),
+            VisualizationPageSpec('pharma.visualization_pages.inventory_page.InventoryPage', 'Inventory', 'inventory_tab', 'inventory'),
+            VisualizationPageSpec('pharma.visualization_pages.inventory_dos_page.InventoryDosPage', 'Inventory Days of Supply', 'inventory_dos_tab', 'inventorydos'),
+            VisualizationPageSpec('pharma.visualization_pages.utilization_page.UtilizationPage', 'Utilization', 'utilization_tab', 'utilization'),
+            VisualizationPageSpec('pharma.visualization_pages.transportation_page.TransportationPage', 'Transportation', 'transportation_tab', 'transportation'),
+            VisualizationPageSpec('pharma.visualization_pages.maps_page.MapsPage', 'Maps', 'maps_tab', 'maps'),
         ]
         logo_file_name = "IBM.png"
 
         database_manager_class = PharmaScenarioDbManager
-        data_manager_class = PharmaDataManager
-        plotly_manager_class = PharmaPlotlyManager
+        data_manager_class = 'supply_chain.pharma.pharmadatamanager.PharmaDataManager'
+        plotly_manager_class = 'supply_chain.pharma.pharmaplotlymanager.PharmaPlotlyManager'
         super().__init__(db_credentials, schema,
                          db_echo = db_echo,
                          logo_file_name=logo_file_name,
@@ -0,0 +1,72 @@
+# Copyright IBM All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""Fixtures for the tests: a ScenarioDbManager on an in-memory SQLite DB with a small scenario."""
+from collections import OrderedDict
+
+import pandas as pd
+import pytest
+from dse_do_utils.scenariodbmanager import ScenarioDbManager, ScenarioDbTable, KpiTable
+from sqlalchemy import Column, Float, Integer, String
+
+from dse_do_dashboard.utils.dash_common_utils import ScenarioTableSchema
+
+
+class ProductTable(ScenarioDbTable):
+    def __init__(self, db_table_name: str = 'product'):
+        columns_metadata = [
+            Column('productName', String(256), primary_key=True),
+            Column('price', Float()),
+        ]
+        super().__init__(db_table_name, columns_metadata)
+
+
+class ProductionTable(ScenarioDbTable):
+    def __init__(self, db_table_name: str = 'production'):
+        columns_metadata = [
+            Column('productName', String(256), primary_key=True),
+            Column('period', Integer(), primary_key=True),
+            Column('quantity', Float()),
+            Column('cost', Float()),
+        ]
+        super().__init__(db_table_name, columns_metadata)
+
+
+class SQLiteScenarioDbManager(ScenarioDbManager):
+    """In-memory SQLite DB, i.e. a new and empty DB for each instance."""
+    def __init__(self, enable_scenario_seq: bool = True):
+        input_db_tables = OrderedDict([('Product', ProductTable())])
+        output_db_tables = OrderedDict([('Production', ProductionTable()), ('kpis', KpiTable())])
+        super().__init__(input_db_tables, output_db_tables, enable_scenario_seq=enable_scenario_seq)
+
+
+def get_inputs():
+    return {'Product': pd.DataFrame({'productName': ['a', 'b', 'c'], 'price': [1.0, 2.0, 3.0]})}
+
+
+def get_outputs():
+    return {
+        'Production': pd.DataFrame({'productName': ['a', 'a', 'b'], 'period': [1, 2, 1],
+                                    'quantity': [10.0, 20.0, 30.0], 'cost': [1.0, 2.0, 3.0]}),
+        'kpis': pd.DataFrame({'NAME': ['Cost'], 'VALUE': [6.0]}),
+    }
+
+
+TABLE_SCHEMAS = {
+    'Production': ScenarioTableSchema('Production', ['productName', 'period'], ['quantity', 'cost'], []),
+    'kpis': ScenarioTableSchema('kpis', ['NAME'], ['VALUE'], []),
+}
+
+
+@pytest.fixture(params=[True, False], ids=['scenario_seq', 'scenario_name'])
+def dbm(request) -> SQLiteScenarioDbManager:
+    """DB with scenario 's1' (and 's2', to check that other scenarios are left alone)."""
+    dbm = SQLiteScenarioDbManager(enable_scenario_seq=request.param)
+    dbm.create_schema()
+    for scenario_name in ['s1', 's2']:
+        dbm.replace_scenario_in_db(scenario_name, inputs=get_inputs(), outputs=get_outputs())
+    return dbm
+
+
+def read_table(dbm: ScenarioDbManager, scenario_name: str, scenario_table_name: str, sort_columns) -> pd.DataFrame:
+    df = dbm.read_scenario_table_from_db(scenario_name, scenario_table_name)
+    return df.sort_values(sort_columns).reset_index(drop=True)
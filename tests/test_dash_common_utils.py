@@ -0,0 +1,87 @@
+# Copyright IBM All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+import pandas as pd
+import pytest
+
+from dse_do_dashboard.utils.dash_common_utils import (diff_dashtable_mi, split_filter_part, filter_dataframe,
+                                                      apply_dashtable_diffs)
+
+
+@pytest.mark.parametrize('filter_part, expected', [
+    ('{price} > 10', ('price', 'gt', 10.0)),
+    ('{price} ge 2.5', ('price', 'ge', 2.5)),
+    ('{name} = apple', ('name', 'eq', 'apple')),
+    ('{name} icontains "Ap"', ('name', 'icontains', 'Ap')),
+    ('{name} scontains "a b"', ('name', 'contains', 'a b')),
+    ('{code} = "10"', ('code', 'eq', '10')),
+    ('{name} != \'it\\\'s\'', ('name', 'ne', "it's")),
+    ('{product name} datestartswith 2024', ('product name', 'datestartswith', 2024.0)),
+    ('not a filter', (None, None, None)),
+])
+def test_split_filter_part(filter_part, expected):
+    assert split_filter_part(filter_part) == expected
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({'name': ['Apple', 'pear', 'Apricot', 'kiwi'], 'price': [1.0, 12.0, 10.0, 5.0],
+                         'code': [10, 20, 10, 30]})
+
+
+@pytest.mark.parametrize('filter_query, expected_names', [
+    (None, ['Apple', 'pear', 'Apricot', 'kiwi']),
+    ('', ['Apple', 'pear', 'Apricot', 'kiwi']),
+    ('{price} > 5', ['pear', 'Apricot']),
+    ('{price} >= 5 && {price} < 12', ['Apricot', 'kiwi']),
+    ('{name} contains Ap', ['Apple', 'Apricot']),
+    ('{name} icontains "ap"', ['Apple', 'Apricot']),
+    ('{name} = pear', ['pear']),
+    ('{code} = 10', ['Apple', 'Apricot']),
+    ('{code} = "10"', ['Apple', 'Apricot']),
+    ('{unknown} = 1 && {code} ne 10', ['pear', 'kiwi']),
+])
+def test_filter_dataframe(df, filter_query, expected_names):
+    assert filter_dataframe(df, filter_query).name.tolist() == expected_names
+
+
+def test_diff_dashtable_mi():
+    data_previous = [{'name': 'a', 'period': 1, 'qty': 1.0, 'note': None},
+                     {'name': 'b', 'period': 1, 'qty': float('nan'), 'note': 'x'}]
+    data = [{'name': 'a', 'period': 1, 'qty': 2.0, 'note': None},
+            {'name': 'c', 'period': 1, 'qty': float('nan'), 'note': 'y'}]
+    changes = diff_dashtable_mi(data, data_previous, index_columns=['name', 'period'], table_name='T', scenario_name='s')
+    assert [(c['row_idx'], c['column_name'], c['current_value'], c['previous_value']) for c in changes] == [
+        (0, 'qty', 2.0, 1.0),
+        (1, 'name', 'c', 'b'),
+        (1, 'note', 'y', 'x'),
+    ]
+    # The row_index has the index values from before the edit, to find the row in the DB:
+    assert changes[1]['row_index'] == [{'column': 'name', 'value': 'b'}, {'column': 'period', 'value': 1}]
+    assert all(c['table_name'] == 'T' and c['scenario_name'] == 's' for c in changes)
+
+
+def test_diff_dashtable_mi_without_changes():
+    data = [{'name': 'a', 'qty': float('nan')}, {'name': None, 'qty': 1}]
+    assert diff_dashtable_mi(data, [dict(row) for row in data]) == []
+    assert diff_dashtable_mi([], []) == []
+    changes = diff_dashtable_mi([{'name': 'a', 'qty': 2}], [{'name': 'a'}])  # Column added, e.g. by a paste
+    assert [(c['column_name'], c['current_value'], c['previous_value']) for c in changes] == [('qty', 2, None)]
+    assert changes[0]['row_index'] == [{'column': 'name', 'value': 'a'}, {'column': 'qty', 'value': None}]
+    with pytest.raises(ValueError):
+        diff_dashtable_mi(data, data[0:1])
+
+
+def test_apply_dashtable_diffs():
+    df = pd.DataFrame({'name': ['a', 'b', 'c'], 'qty': [1.0, 2.0, 3.0]})
+    edit_1 = diff_dashtable_mi([{'name': 'x', 'qty': 1.0}, {'name': 'b', 'qty': 5.0}],
+                               [{'name': 'a', 'qty': 1.0}, {'name': 'b', 'qty': 2.0}],
+                               index_columns=['name'], table_name='T', scenario_name='s')
+    edit_2 = diff_dashtable_mi([{'name': 'x', 'qty': 7.0}], [{'name': 'x', 'qty': 1.0}],
+                               index_columns=['name'], table_name='T', scenario_name='s')
+    diff_store_data = {'1': edit_1, '2': edit_2}
+    result = apply_dashtable_diffs(df, diff_store_data, 's', 'T')
+    assert result.name.tolist() == ['x', 'b', 'c']
+    assert result.qty.tolist() == [7.0, 5.0, 3.0]
+    assert df.name.tolist() == ['a', 'b', 'c']  # Not changed in place
+    assert apply_dashtable_diffs(df, diff_store_data, 'other', 'T').equals(df)
+    assert apply_dashtable_diffs(df, None, 's', 'T') is df
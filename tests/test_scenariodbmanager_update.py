@@ -0,0 +1,107 @@
+# Copyright IBM All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+import pandas as pd
+from dse_do_utils.scenariodbmanager import DbCellUpdate
+
+from dse_do_dashboard.utils.scenariodbmanager_update import (update_cell_changes_in_db_bulk,
+                                                             update_scenario_output_tables_in_db_diff,
+                                                             read_scenario_tables_from_db_batched, _get_output_table_diff)
+from conftest import TABLE_SCHEMAS, get_inputs, get_outputs, read_table
+
+
+def cell_update(column_name, current_value, product_name, scenario_name='s1'):
+    return DbCellUpdate(scenario_name=scenario_name, table_name='Product',
+                        row_index=[{'column': 'productName', 'value': product_name}],
+                        column_name=column_name, current_value=current_value, previous_value=None, row_idx=0)
+
+
+def test_read_scenario_tables_from_db_batched(dbm):
+    dfs = read_scenario_tables_from_db_batched(dbm, 's1', ['Product', 'kpis'])
+    pd.testing.assert_frame_equal(dfs['Product'], dbm.read_scenario_table_from_db('s1', 'Product'))
+    pd.testing.assert_frame_equal(dfs['kpis'], dbm.read_scenario_table_from_db('s1', 'kpis'))
+    assert read_scenario_tables_from_db_batched(dbm, 'unknown', ['Product'])['Product'].shape[0] == 0
+
+
+def test_update_cell_changes_in_db_bulk(dbm):
+    update_cell_changes_in_db_bulk(dbm, [
+        cell_update('price', 5.0, 'a'),
+        cell_update('price', 6.0, 'a'),  # Same cell again: the last value wins
+        cell_update('price', 7.0, 'b'),
+    ])
+    df = read_table(dbm, 's1', 'Product', 'productName')
+    assert df.price.tolist() == [6.0, 7.0, 3.0]
+    assert read_table(dbm, 's2', 'Product', 'productName').price.tolist() == [1.0, 2.0, 3.0]
+
+
+def test_update_cell_changes_in_db_bulk_with_primary_key_edit(dbm):
+    # Renames 'a' to 'x' and then edits the price of the renamed row: needs to be applied in order
+    update_cell_changes_in_db_bulk(dbm, [
+        cell_update('productName', 'x', 'a'),
+        cell_update('price', 8.0, 'x'),
+        cell_update('price', 9.0, 'b'),
+    ])
+    df = read_table(dbm, 's1', 'Product', 'productName')
+    assert df.productName.tolist() == ['b', 'c', 'x']
+    assert df.price.tolist() == [9.0, 3.0, 8.0]
+    assert read_table(dbm, 's2', 'Product', 'productName').productName.tolist() == ['a', 'b', 'c']
+
+
+def test_update_cell_changes_in_db_bulk_unknown_scenario(dbm):
+    update_cell_changes_in_db_bulk(dbm, [cell_update('price', 5.0, 'a', scenario_name='unknown')])
+    assert read_table(dbm, 's1', 'Product', 'productName').price.tolist() == [1.0, 2.0, 3.0]
+
+
+def test_update_scenario_output_tables_in_db_diff(dbm):
+    production = pd.DataFrame({'productName': ['a', 'b', 'c'], 'period': [1, 1, 1],
+                               'quantity': [10.0, 35.0, 40.0], 'cost': [1.0, 3.0, 4.0]})  # Update b, insert c, delete (a, 2)
+    outputs = {'Production': production, 'kpis': get_outputs()['kpis']}
+    changed = update_scenario_output_tables_in_db_diff(dbm, 's1', outputs, table_schemas=TABLE_SCHEMAS)
+    assert changed == ['Production']
+    pd.testing.assert_frame_equal(read_table(dbm, 's1', 'Production', ['productName', 'period']), production)
+    pd.testing.assert_frame_equal(read_table(dbm, 's2', 'Production', ['productName', 'period']),
+                                  get_outputs()['Production'])
+
+
+def test_update_scenario_output_tables_in_db_diff_without_changes(dbm):
+    changed = update_scenario_output_tables_in_db_diff(dbm, 's1', get_outputs(), table_schemas=TABLE_SCHEMAS)
+    assert changed == []
+
+
+def test_update_scenario_output_tables_in_db_diff_without_table_schemas(dbm):
+    # Without a table schema, all rows of each output table are replaced
+    outputs = {'Production': get_outputs()['Production'], 'kpis': pd.DataFrame({'NAME': ['Cost'], 'VALUE': [7.0]})}
+    changed = update_scenario_output_tables_in_db_diff(dbm, 's1', outputs, table_schemas={})
+    assert sorted(changed) == ['Production', 'kpis']
+    assert read_table(dbm, 's1', 'kpis', 'NAME').VALUE.tolist() == [7.0]
+    pd.testing.assert_frame_equal(read_table(dbm, 's1', 'Production', ['productName', 'period']),
+                                  get_outputs()['Production'])
+
+
+def test_get_output_table_diff_lossy_index_cast():
+    old_df = get_outputs()['Production']
+    df = old_df.assign(period=[1.5, 2.0, 1.0])
+    assert _get_output_table_diff(old_df, df, ['productName', 'period']) is None
+    diff = _get_output_table_diff(old_df, old_df.assign(period=[1.0, 2.0, 3.0]), ['productName', 'period'])
+    assert diff.deletes.to_dict('records') == [{'productName': 'b', 'period': 1}]
+    assert diff.inserts.to_dict('records') == [{'productName': 'b', 'period': 3.0, 'quantity': 30.0, 'cost': 3.0}]
+    assert diff.updates.shape[0] == 0
+
+
+def test_update_scenario_output_tables_in_db_diff_casts_index_columns(dbm):
+    production = get_outputs()['Production'].astype({'period': float})
+    production.loc[0, 'quantity'] = 11.0
+    changed = update_scenario_output_tables_in_db_diff(dbm, 's1', {'Production': production, 'kpis': get_outputs()['kpis']},
+                                                       table_schemas=TABLE_SCHEMAS)
+    assert changed == ['Production']
+    df = read_table(dbm, 's1', 'Production', ['productName', 'period'])
+    assert df.period.tolist() == [1, 2, 1]
+    assert df.quantity.tolist() == [11.0, 20.0, 30.0]
+
+
+def test_update_scenario_output_tables_in_db_diff_missing_tables_and_columns(dbm):
+    production = get_outputs()['Production'].drop(columns=['cost'])
+    changed = update_scenario_output_tables_in_db_diff(dbm, 's1', {'Production': production}, table_schemas=TABLE_SCHEMAS)
+    assert sorted(changed) == ['Production', 'kpis']
+    assert read_table(dbm, 's1', 'Production', ['productName', 'period']).cost.isna().all()
+    assert read_table(dbm, 's1', 'kpis', 'NAME').shape[0] == 0
+    assert read_table(dbm, 's1', 'Product', 'productName').equals(get_inputs()['Product'])